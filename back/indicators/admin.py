@@ -7,6 +7,7 @@ from datetime import date, timedelta
 from .models import Unit, Indicator, IndicatorValue, ImportTemplate, UserDictionaryFilter, IndicatorDictionary
 from .generators import generate_test_values
 from .formula_parser import validate_formula_dependencies, parse_formula
+from .versioning import mark_values_deleted
 
 
 class IndicatorValueInline(admin.TabularInline):
@@ -93,8 +94,10 @@ class IndicatorAdmin(admin.ModelAdmin):
         'actions_column'
     ]
     list_filter = ['indicator_type', 'unit', 'created_at']
+    # Количество значений и последняя дата берутся из сводки одним JOIN
+    list_select_related = ['unit', 'stats']
     search_fields = ['name', 'description']
-    readonly_fields = ['created_at', 'updated_at', 'formula_help', 'dependencies_list']
+    readonly_fields = ['created_at', 'updated_at', 'compacted_before', 'formula_help', 'dependencies_list']
     fieldsets = (
         ('Основная информация', {
             'fields': ('name', 'description', 'indicator_type', 'unit')
@@ -108,6 +111,10 @@ class IndicatorAdmin(admin.ModelAdmin):
             'description': 'Укажите минимальное и максимальное значение для генерации тестовых данных. Затем укажите диапазон дат и отметьте чекбокс для генерации.',
             'classes': ('collapse',)
         }),
+        ('Хранение значений', {
+            'fields': ('daily_retention_days', 'compacted_before'),
+            'classes': ('collapse',)
+        }),
         ('Формула (только для агрегатных показателей)', {
             'fields': ('formula', 'formula_help', 'dependencies_list'),
             'description': 'Используйте названия показателей в квадратных скобках, например: [Показатель1] + [Показатель2] / [Показатель3]'
@@ -139,7 +146,7 @@ class IndicatorAdmin(admin.ModelAdmin):
     has_formula.short_description = 'Формула'
     
     def values_count(self, obj):
-        count = obj.values.count()
+        count = obj.stats.values_count if hasattr(obj, 'stats') else 0
         if count > 0:
             url = reverse('admin:indicators_indicatorvalue_changelist')
             return format_html(
@@ -150,13 +157,14 @@ class IndicatorAdmin(admin.ModelAdmin):
             )
         return count
     values_count.short_description = 'Кол-во значений'
+    values_count.admin_order_field = 'stats__values_count'
     
     def last_value_date(self, obj):
-        last_value = obj.values.order_by('-date').first()
-        if last_value:
-            return last_value.date
+        if hasattr(obj, 'stats') and obj.stats.last_date:
+            return obj.stats.last_date
         return '-'
     last_value_date.short_description = 'Последнее значение'
+    last_value_date.admin_order_field = 'stats__last_date'
     
     def formula_help(self, obj):
         if obj.indicator_type == 'aggregate':
@@ -244,6 +252,12 @@ class IndicatorValueAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.select_related('indicator')
+    
+    def delete_queryset(self, request, queryset):
+        """Массовое удаление отмечается в версиях данных затронутых показателей"""
+        deleted = list(queryset.values_list('indicator_id', 'date', 'dimension_key'))
+        super().delete_queryset(request, queryset)
+        mark_values_deleted(deleted=deleted)
 
 
 @admin.register(ImportTemplate)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class IndicatorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'indicators'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import signals  # noqa: F401
+        from .database import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid='indicators_configure_connection')
@@ -0,0 +1,197 @@
+"""Массовая загрузка значений показателей (генерация, импорт)
+
+Значения записываются одной операцией на весь набор вместо поиска и
+сохранения каждой строки. В PostgreSQL строки передаются командой COPY во
+временную таблицу и переносятся в основную двумя запросами (обновление
+существующих и вставка новых вместе со связями с элементами справочников).
+В остальных СУБД используются bulk_update/bulk_create.
+
+Поля, которые при обычном сохранении поддерживают save() и сигналы
+(ключ разреза, статус, версия данных), заполняются здесь же.
+"""
+import io
+from django.db import connection
+from .models import IndicatorValue, IndicatorChangeLog, make_dimension_key
+from .stats import record_values
+from .status import classify_values
+from .versioning import bump_data_version
+from .writer import write_batch
+
+
+# Размер пачки для bulk_create/bulk_update
+BULK_BATCH_SIZE = 1000
+
+COPY_STAGE_TABLE = 'indicatorvalue_stage'
+
+
+def load_values(indicator, rows):
+    """
+    Загружает значения показателя: существующие значения с той же датой и тем же
+    разрезом обновляются, остальные создаются.
+    
+    Запись идет под арендой записи (см. writer.write_batch). Вызов внутри
+    открытой транзакции (действие админки, ATOMIC_REQUESTS, transaction.atomic
+    вызывающего) допустим: загрузка присоединяется к ней и фиксируется или
+    откатывается вместе с ней.
+    
+    Args:
+        indicator: объект Indicator
+        rows: последовательность кортежей (дата, значение Decimal, ID элементов справочников)
+    
+    Returns:
+        int: количество загруженных значений
+    """
+    records = {}
+    for value_date, value, item_ids in rows:
+        # При повторе даты и разреза в наборе побеждает последнее значение
+        records[(value_date, make_dimension_key(item_ids or []))] = value
+    if not records:
+        return 0
+    
+    keys = list(records)
+    statuses = classify_values(indicator, list(records.values()))
+    records = [
+        (value_date, records[(value_date, dimension_key)], dimension_key, int(status))
+        for (value_date, dimension_key), status in zip(keys, statuses)
+    ]
+    
+    with write_batch(f'Загрузка: {indicator.name}') as batch:
+        existing = {}
+        existing_values = {}
+        for value_id, value_date, dimension_key, value in IndicatorValue.objects.filter(
+            indicator=indicator,
+            date__gte=min(key[0] for key in keys),
+            date__lte=max(key[0] for key in keys)
+        ).values_list('pk', 'date', 'dimension_key', 'value').iterator(chunk_size=BULK_BATCH_SIZE):
+            existing.setdefault((value_date, dimension_key), []).append(value_id)
+            existing_values.setdefault((value_date, dimension_key), []).append(value)
+        
+        # Одна версия данных на весь набор: клиенты получат его одним приращением,
+        # а в журнал изменений попадает каждое значение
+        changes = []
+        for value_date, dimension_key in keys:
+            exists = (value_date, dimension_key) in existing
+            op = IndicatorChangeLog.OP_UPDATE if exists else IndicatorChangeLog.OP_INSERT
+            changes.append((op, value_date, dimension_key))
+        version = bump_data_version(indicator.pk, changes=changes)
+        if connection.vendor == 'postgresql':
+            _copy_values(indicator, records, version)
+        else:
+            _bulk_save_values(indicator, records, version, existing)
+        
+        # Сводка по значениям: обновленные значения заменяют прежние
+        added = []
+        removed = []
+        for value_date, value, dimension_key, _ in records:
+            previous = existing_values.get((value_date, dimension_key), [])
+            added.extend([(value_date, dimension_key, value)] * max(len(previous), 1))
+            removed.extend((value_date, dimension_key, old_value) for old_value in previous)
+        record_values(indicator.pk, added=added, removed=removed)
+        batch.step(len(records))
+    
+    return len(records)
+
+
+def _bulk_save_values(indicator, records, version, existing):
+    """Загрузка через ORM (bulk_update существующих, bulk_create новых)"""
+    to_update = []
+    to_create = []
+    for value_date, value, dimension_key, status in records:
+        matches = existing.get((value_date, dimension_key))
+        if matches:
+            to_update.extend(
+                IndicatorValue(pk=value_id, value=value, status=status, data_version=version)
+                for value_id in matches
+            )
+        else:
+            to_create.append(IndicatorValue(
+                indicator=indicator,
+                date=value_date,
+                value=value,
+                dimension_key=dimension_key,
+                status=status,
+                data_version=version
+            ))
+    
+    IndicatorValue.objects.bulk_update(
+        to_update, ['value', 'status', 'data_version'], batch_size=BULK_BATCH_SIZE
+    )
+    IndicatorValue.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    
+    # Связи с элементами справочников только для созданных значений: у обновленных
+    # разрез совпадает по определению. ID перечитываются по версии загрузки, так
+    # как не все СУБД возвращают их из bulk_create.
+    created_keys = {(value_obj.date, value_obj.dimension_key) for value_obj in to_create if value_obj.dimension_key}
+    if created_keys:
+        through = IndicatorValue.dictionary_items.through
+        links = []
+        for value_id, value_date, dimension_key in IndicatorValue.objects.filter(
+            indicator=indicator,
+            data_version=version
+        ).exclude(dimension_key='').values_list('pk', 'date', 'dimension_key').iterator(chunk_size=BULK_BATCH_SIZE):
+            if (value_date, dimension_key) in created_keys:
+                links.extend(
+                    through(indicatorvalue_id=value_id, dictionaryitem_id=int(item_id))
+                    for item_id in dimension_key.split(',')
+                )
+        through.objects.bulk_create(links, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+
+
+def _copy_values(indicator, records, version):
+    """Загрузка в PostgreSQL через COPY во временную таблицу (на время одной загрузки)"""
+    value_table = IndicatorValue._meta.db_table
+    through_table = IndicatorValue.dictionary_items.through._meta.db_table
+    
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {COPY_STAGE_TABLE} ('
+            'date date NOT NULL, value numeric(20, 4) NOT NULL, '
+            'dimension_key varchar(255) NOT NULL, status smallint NOT NULL'
+            ') ON COMMIT DROP'
+        )
+        _copy_rows(cursor.cursor, f'COPY {COPY_STAGE_TABLE} (date, value, dimension_key, status) FROM STDIN', records)
+        
+        cursor.execute(
+            f'UPDATE {value_table} AS v SET value = s.value, status = s.status, data_version = %s '
+            f'FROM {COPY_STAGE_TABLE} AS s '
+            'WHERE v.indicator_id = %s AND v.date = s.date AND v.dimension_key = s.dimension_key',
+            [version, indicator.pk]
+        )
+        # Новые значения и их связи с элементами справочников (ID элементов берутся из ключа разреза)
+        cursor.execute(
+            f'WITH inserted AS ('
+            f'INSERT INTO {value_table} (indicator_id, date, value, created_at, data_version, status, dimension_key) '
+            f'SELECT %s, s.date, s.value, NOW(), %s, s.status, s.dimension_key FROM {COPY_STAGE_TABLE} AS s '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {value_table} AS v '
+            'WHERE v.indicator_id = %s AND v.date = s.date AND v.dimension_key = s.dimension_key) '
+            'RETURNING id, dimension_key'
+            f') INSERT INTO {through_table} (indicatorvalue_id, dictionaryitem_id) '
+            "SELECT id, unnest(string_to_array(dimension_key, ','))::bigint FROM inserted "
+            "WHERE dimension_key <> ''",
+            [indicator.pk, version, indicator.pk]
+        )
+        # Таблица удаляется сразу: следующая загрузка в той же транзакции
+        # (внешний atomic, общая пачка write_batch) создает ее заново
+        cursor.execute(f'DROP TABLE {COPY_STAGE_TABLE}')
+
+
+def _copy_rows(raw_cursor, sql, records):
+    """
+    Передает строки командой COPY (psycopg 3 или psycopg2).
+    
+    Args:
+        raw_cursor: курсор драйвера базы данных
+        sql: команда COPY ... FROM STDIN
+        records: последовательность кортежей значений колонок
+    """
+    if hasattr(raw_cursor, 'copy'):
+        with raw_cursor.copy(sql) as copy:
+            for record in records:
+                copy.write_row(record)
+    else:
+        # Значения - даты, числа и ключи разреза из цифр и запятых, экранирование не требуется
+        buffer = io.StringIO()
+        for record in records:
+            buffer.write('\t'.join(str(column) for column in record) + '\n')
+        buffer.seek(0)
+        raw_cursor.copy_expert(sql, buffer)
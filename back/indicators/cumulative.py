@@ -0,0 +1,37 @@
+"""Нарастающий итог значений показателей"""
+from django.db.models import F, Sum, Window, Case, When, Value, IntegerField
+
+
+def with_cumulative(values_query, segment_start=None):
+    """
+    Добавляет к значениям нарастающий итог cumulative_value.
+    
+    Итог считается в базе данных оконной функцией
+    SUM(value) OVER (PARTITION BY dimension_key ORDER BY date, id) - отдельно
+    для каждой комбинации элементов справочников, поэтому строки разных разрезов
+    не смешиваются. Окно вычисляется до LIMIT, так что при выборке последних N
+    значений итог учитывает все более ранние значения выборки.
+    
+    Args:
+        values_query: QuerySet значений показателя (с уже примененными фильтрами)
+        segment_start: дата, с которой итог начинается заново (например, начало
+                       текущего периода при чтении одним запросом и периода сравнения)
+    
+    Returns:
+        QuerySet с аннотацией cumulative_value (Decimal)
+    """
+    partition_by = [F('dimension_key')]
+    if segment_start:
+        partition_by.append(Case(
+            When(date__gte=segment_start, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        ))
+    
+    return values_query.annotate(
+        cumulative_value=Window(
+            expression=Sum('value'),
+            partition_by=partition_by,
+            order_by=[F('date').asc(), F('pk').asc()]
+        )
+    )
@@ -0,0 +1,54 @@
+"""Настройка соединений с базой данных"""
+from django.conf import settings
+
+
+# Порядок применения важен: journal_mode переключается до остальных параметров
+SQLITE_PRAGMA_ORDER = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store')
+
+
+def get_sqlite_pragmas():
+    """
+    Возвращает параметры PRAGMA для соединений SQLite из настроек проекта.
+    
+    Returns:
+        dict: {имя параметра: значение}, пустой словарь если настройка отключена
+    """
+    if not getattr(settings, 'SQLITE_TUNING_ENABLED', False):
+        return {}
+    return dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    """
+    Применяет параметры PRAGMA к соединению SQLite.
+    
+    Args:
+        cursor: курсор соединения (Django или sqlite3)
+        pragmas: словарь {имя параметра: значение}
+    """
+    names = sorted(pragmas, key=lambda name: (
+        SQLITE_PRAGMA_ORDER.index(name) if name in SQLITE_PRAGMA_ORDER else len(SQLITE_PRAGMA_ORDER)
+    ))
+    for name in names:
+        value = pragmas[name]
+        if value is None:
+            continue
+        # Имена и значения берутся только из настроек, а не из пользовательского ввода
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    Обработчик сигнала connection_created: настраивает новое соединение SQLite.
+    
+    WAL позволяет читателям работать параллельно с записью, synchronous=NORMAL
+    убирает fsync на каждую транзакцию (в режиме WAL это безопасно для целостности),
+    busy_timeout заставляет ждать освобождения блокировки вместо ошибки
+    "database is locked".
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = get_sqlite_pragmas()
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_sqlite_pragmas(cursor, pragmas)
@@ -0,0 +1,80 @@
+"""Фильтрация значений показателей по элементам справочников"""
+from django.db.models import Exists, OuterRef
+from .models import IndicatorValue
+
+
+def compile_dictionary_filters(selected_items_by_dict):
+    """
+    Компилирует фильтры по справочникам в список условий EXISTS.
+    
+    Для каждого справочника строится один коррелированный подзапрос к таблице
+    связи значений с элементами справочников: значение проходит фильтр, если
+    у него есть хотя бы один из выбранных элементов каждого справочника.
+    В отличие от цепочки .filter(dictionary_items__id__in=...) подзапросы не
+    размножают строки, поэтому DISTINCT не нужен, а план использует индекс
+    таблицы связи по (indicatorvalue_id, dictionaryitem_id).
+    
+    Args:
+        selected_items_by_dict: dict вида {dictionary_id: item_ids}, где item_ids -
+                                список ID элементов или QuerySet элементов/их ID
+    
+    Returns:
+        list: Условия для передачи в QuerySet.filter(*conditions)
+    """
+    through = IndicatorValue.dictionary_items.through
+    conditions = []
+    
+    for item_ids in selected_items_by_dict.values():
+        if item_ids is None:
+            continue
+        if isinstance(item_ids, (list, tuple, set)) and not item_ids:
+            continue
+        conditions.append(Exists(
+            through.objects.filter(
+                indicatorvalue_id=OuterRef('pk'),
+                dictionaryitem_id__in=item_ids
+            )
+        ))
+    
+    return conditions
+
+
+def filter_by_dictionary_items(values_query, selected_items_by_dict):
+    """
+    Применяет фильтры по справочникам к QuerySet значений показателей.
+    
+    Args:
+        values_query: QuerySet IndicatorValue
+        selected_items_by_dict: dict вида {dictionary_id: item_ids}
+    
+    Returns:
+        Отфильтрованный QuerySet (без DISTINCT)
+    """
+    conditions = compile_dictionary_filters(selected_items_by_dict)
+    if not conditions:
+        return values_query
+    return values_query.filter(*conditions)
+
+
+def dimension_key_matches(dimension_key, selected_items_by_dict):
+    """
+    Проверяет ключ разреза по фильтрам по справочникам (без запроса к базе).
+    
+    Условие то же, что у compile_dictionary_filters: среди элементов разреза
+    есть хотя бы один из выбранных элементов каждого справочника.
+    
+    Args:
+        dimension_key: ключ разреза (см. IndicatorValue.dimension_key)
+        selected_items_by_dict: dict вида {dictionary_id: список ID элементов}
+    
+    Returns:
+        bool: True, если значения разреза проходят фильтры
+    """
+    if not selected_items_by_dict:
+        return True
+    key_items = {int(item_id) for item_id in dimension_key.split(',') if item_id}
+    return all(
+        key_items.intersection(item_ids)
+        for item_ids in selected_items_by_dict.values()
+        if item_ids
+    )
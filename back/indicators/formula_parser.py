@@ -4,7 +4,11 @@ from decimal import Decimal
 from datetime import date, timedelta
 from dateutil.relativedelta import relativedelta
 from django.core.exceptions import ValidationError
-from .models import Indicator, IndicatorValue
+from .models import Indicator, IndicatorValue, make_dimension_key
+
+
+# Размер порции при потоковом чтении значений за период
+VALUES_CHUNK_SIZE = 2000
 
 
 def parse_formula(formula):
@@ -243,6 +247,7 @@ def calculate_aggregation_function(function_name, indicator_name, period, target
             current_date += timedelta(days=1)
     else:
         # Для атомарных показателей берем значения из БД
+        dimension_key = None
         values_query = IndicatorValue.objects.filter(
             indicator=dep_indicator,
             date__gte=start_date,
@@ -269,17 +274,27 @@ def calculate_aggregation_function(function_name, indicator_name, period, target
                     else:
                         target_items_ids.add(item)
             
-            # Фильтруем значения, у которых dictionary_items совпадает с target_dimension_items
-            filtered_values = []
-            for value_obj in values_query.prefetch_related('dictionary_items'):
-                value_items_ids = set(value_obj.dictionary_items.values_list('id', flat=True))
-                if value_items_ids == target_items_ids:
-                    filtered_values.append(value_obj.value)
-            values = filtered_values
+            # Значения, у которых dictionary_items совпадает с target_dimension_items,
+            # отбираются по ключу разреза в самом запросе
+            dimension_key = make_dimension_key(target_items_ids)
+            values_query = values_query.filter(dimension_key=dimension_key)
+        
+        # Без разреза (базовый показатель не имеет справочников или aggregate_by_dimensions=False)
+        # агрегируются все значения
+        from .retention import get_compacted_day_values, is_compacted
+        from .rollups import ROLLUP_PERIODS, get_rollup_totals
+        if period in ROLLUP_PERIODS:
+            # Период целиком - одна строка итогов на разрез вместо дневных значений
+            totals = get_rollup_totals(dep_indicator.pk, period, start_date, dimension_key)
+            if totals['count']:
+                return apply_rollup_function(function_name, totals)
+            values = []
+        elif is_compacted(dep_indicator, start_date):
+            # Дневные значения сжаты (см. retention) - значения дня по разрезам берутся из итогов месяца
+            values = get_compacted_day_values(dep_indicator, start_date, dimension_key)
         else:
-            # Агрегируем все значения независимо от справочников
-            # (если базовый показатель не имеет справочников или aggregate_by_dimensions=False)
-            values = list(values_query.values_list('value', flat=True))
+            # Значения за период читаются потоком (в PostgreSQL - серверным курсором)
+            values = list(values_query.values_list('value', flat=True).iterator(chunk_size=VALUES_CHUNK_SIZE))
     
     if not values:
         dimension_str = ""
@@ -306,6 +321,60 @@ def calculate_aggregation_function(function_name, indicator_name, period, target
     return result
 
 
+def apply_rollup_function(function_name, totals):
+    """
+    Вычисляет функцию агрегации по итогам периода (см. rollups.get_rollup_totals)
+    
+    Args:
+        function_name: Название функции ('SUM', 'AVG', 'MAX', 'MIN', 'COUNT')
+        totals: dict {'sum', 'count', 'min', 'max'}
+    
+    Returns:
+        Decimal: Результат агрегации
+    """
+    if function_name == 'SUM':
+        return totals['sum']
+    elif function_name == 'AVG':
+        return totals['sum'] / totals['count']
+    elif function_name == 'MAX':
+        return totals['max']
+    elif function_name == 'MIN':
+        return totals['min']
+    elif function_name == 'COUNT':
+        return Decimal(totals['count'])
+    raise ValueError(f"Неподдерживаемая функция: {function_name}")
+
+
+def get_prev_period_date(target_date, period):
+    """
+    Возвращает ту же дату в предыдущем периоде
+    
+    Args:
+        target_date: Текущая дата
+        period: Период ('day', 'week', 'month', 'quarter', 'year')
+    
+    Returns:
+        date: Дата в предыдущем периоде
+    """
+    # Для месячных/квартальных/годовых агрегатов берем ту же дату в предыдущем периоде
+    if period == 'month':
+        # Предыдущий месяц - та же дата в предыдущем месяце
+        return target_date - relativedelta(months=1)
+    elif period == 'quarter':
+        # Предыдущий квартал - та же дата в предыдущем квартале
+        return target_date - relativedelta(months=3)
+    elif period == 'year':
+        # Предыдущий год - та же дата в предыдущем году
+        return target_date - relativedelta(years=1)
+    elif period == 'week':
+        # Предыдущая неделя - тот же день недели
+        return target_date - timedelta(days=7)
+    elif period == 'day':
+        # Предыдущий день
+        return target_date - timedelta(days=1)
+    raise ValueError(f"Неподдерживаемый период: {period}")
+
+
 def calculate_prev_period_value(indicator_name, period, target_date, target_dimension_items=None):
     """
     Получает значение показателя за предыдущий период
@@ -325,21 +394,9 @@ def calculate_prev_period_value(indicator_name, period, target_date, target_dime
         raise ValueError(f"Показатель '{indicator_name}' не найден")
     
     # Вычисляем дату для предыдущего периода
-    # Для месячных/квартальных/годовых агрегатов берем ту же дату в предыдущем периоде
-    if period == 'month':
-        # Предыдущий месяц - та же дата в предыдущем месяце
-        prev_date = target_date - relativedelta(months=1)
-    elif period == 'quarter':
-        # Предыдущий квартал - та же дата в предыдущем квартале
-        prev_date = target_date - relativedelta(months=3)
-    elif period == 'year':
-        # Предыдущий год - та же дата в предыдущем году
-        prev_date = target_date - relativedelta(years=1)
-    elif period == 'day':
-        # Предыдущий день
-        prev_date = target_date - timedelta(days=1)
-    else:
+    if period not in ('day', 'month', 'quarter', 'year'):
         raise ValueError(f"Неподдерживаемый период: {period}")
+    prev_date = get_prev_period_date(target_date, period)
     
     # Получаем значение показателя на эту дату
     # Если указаны разрезы, ищем значение с нужной комбинацией справочников
@@ -379,8 +436,9 @@ def calculate_prev_period_value(indicator_name, period, target_date, target_dime
                     return Decimal('0')
             else:
                 # Для атомарных показателей, если значение отсутствует, возвращаем 0
+                # (или значение месяца, если дневные значения сжаты)
                 # Это нормальная ситуация для первой даты расчета
-                return Decimal('0')
+                return get_prev_compacted_value(dep_indicator, prev_date, make_dimension_key(target_items_ids))
     else:
         # Если разрезы не указаны, берем первое найденное значение
         try:
@@ -402,8 +460,9 @@ def calculate_prev_period_value(indicator_name, period, target_date, target_dime
                         return Decimal('0')
                 else:
                     # Для атомарных показателей, если значение отсутствует, возвращаем 0
+                    # (или значение месяца, если дневные значения сжаты)
                     # Это нормальная ситуация для первой даты расчета
-                    return Decimal('0')
+                    return get_prev_compacted_value(dep_indicator, prev_date)
         except IndicatorValue.MultipleObjectsReturned:
             # Если несколько значений, берем первое
             value_obj = IndicatorValue.objects.filter(
@@ -418,6 +477,16 @@ def calculate_prev_period_value(indicator_name, period, target_date, target_dime
                     return Decimal('0')
 
 
+def get_prev_compacted_value(indicator, prev_date, dimension_key=None):
+    """
+    Значение предыдущего периода, если дневного значения нет: для сжатых дат -
+    среднее за месяц по итогам (см. retention.get_compacted_value), иначе 0
+    """
+    from .retention import get_compacted_value
+    value = get_compacted_value(indicator, prev_date, dimension_key)
+    return value if value is not None else Decimal('0')
+
+
 def calculate_cumulative_value(indicator_name, period, target_date, aggregate_by_dimensions=False, target_dimension_items=None):
     """
     Вычисляет нарастающий итог показателя с начала периода до target_date
@@ -472,6 +541,7 @@ def calculate_cumulative_value(indicator_name, period, target_date, aggregate_by
             current_date += timedelta(days=1)
     else:
         # Для атомарных показателей берем значения из БД
+        dimension_key = None
         values_query = IndicatorValue.objects.filter(
             indicator=dep_indicator,
             date__gte=start_date,
@@ -496,16 +566,26 @@ def calculate_cumulative_value(indicator_name, period, target_date, aggregate_by
                     else:
                         target_items_ids.add(item)
             
-            # Фильтруем значения, у которых dictionary_items совпадает с target_dimension_items
-            filtered_values = []
-            for value_obj in values_query.prefetch_related('dictionary_items').order_by('date'):
-                value_items_ids = set(value_obj.dictionary_items.values_list('id', flat=True))
-                if value_items_ids == target_items_ids:
-                    filtered_values.append(value_obj.value)
-            values = filtered_values
+            # Значения, у которых dictionary_items совпадает с target_dimension_items,
+            # отбираются по ключу разреза в самом запросе
+            dimension_key = make_dimension_key(target_items_ids)
+            values_query = values_query.filter(dimension_key=dimension_key)
+        
+        from .retention import get_compacted_day_values, get_compacted_sum, is_compacted
+        if is_compacted(dep_indicator, start_date):
+            # Дневные значения сжаты (см. retention) - период сжат целиком (граница -
+            # начало года), итог считается по месяцам с точностью до месяца
+            if period == 'day':
+                values = get_compacted_day_values(dep_indicator, start_date, dimension_key)
+            else:
+                total, count = get_compacted_sum(dep_indicator, start_date, end_date, dimension_key)
+                values = [total] if count else []
         else:
-            # Агрегируем все значения независимо от справочников
-            values = list(values_query.order_by('date').values_list('value', flat=True))
+            # Без разреза агрегируются все значения. Значения за период читаются потоком
+            # (в PostgreSQL - серверным курсором)
+            values = list(
+                values_query.order_by('date').values_list('value', flat=True).iterator(chunk_size=VALUES_CHUNK_SIZE)
+            )
     
     if not values:
         dimension_str = ""
@@ -606,6 +686,7 @@ def calculate_aggregate_value(indicator, target_date, target_dimension_items=Non
     indicator_names = parse_formula(formula)
     
     # Создаем словарь значений показателей на целевую дату
+    from .retention import get_compacted_value
     values_dict = {}
     for indicator_name in indicator_names:
         try:
@@ -644,9 +725,15 @@ def calculate_aggregate_value(indicator, target_date, target_dimension_items=Non
                                 dep_indicator, target_date, target_dimension_items=target_dimension_items
                             )
                         else:
-                            raise ValueError(
-                                f"Отсутствует значение для показателя '{indicator_name}' на дату {target_date} с указанным разрезом"
+                            # Дневные значения сжаты (см. retention) - берем значение месяца
+                            found_value = get_compacted_value(
+                                dep_indicator, target_date, make_dimension_key(target_items_ids)
                             )
+                            if found_value is None:
+                                raise ValueError(
+                                    f"Отсутствует значение для показателя '{indicator_name}' на дату {target_date} с указанным разрезом"
+                                )
+                            values_dict[indicator_name] = found_value
                 else:
                     # Берем любое значение (первое найденное) или вычисляем для агрегатного
                     value_obj = IndicatorValue.objects.filter(
@@ -663,9 +750,13 @@ def calculate_aggregate_value(indicator, target_date, target_dimension_items=Non
                                 dep_indicator, target_date, target_dimension_items=target_dimension_items
                             )
                         else:
-                            raise ValueError(
-                                f"Отсутствует значение для показателя '{indicator_name}' на дату {target_date}"
-                            )
+                            # Дневные значения сжаты (см. retention) - берем значение месяца
+                            compacted_value = get_compacted_value(dep_indicator, target_date)
+                            if compacted_value is None:
+                                raise ValueError(
+                                    f"Отсутствует значение для показателя '{indicator_name}' на дату {target_date}"
+                                )
+                            values_dict[indicator_name] = compacted_value
             except IndicatorValue.DoesNotExist:
                 # Если значение отсутствует, пытаемся вычислить для агрегатного
                 if dep_indicator.indicator_type == 'aggregate':
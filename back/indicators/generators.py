@@ -5,6 +5,7 @@ from datetime import date, timedelta
 from itertools import product
 from django.utils import timezone
 from .models import Indicator, IndicatorValue
+from .bulk import load_values
 
 
 def generate_test_values(indicator, start_date, end_date, min_value=None, max_value=None, step='day', dictionary_items=None):
@@ -90,6 +91,8 @@ def generate_test_values(indicator, start_date, end_date, min_value=None, max_va
     # Ключ - tuple из ID элементов справочников, значение - предыдущее значение
     previous_values = {}
     
+    rows = []
+    
     while current_date <= end_date:
         # Генерируем значения для каждой комбинации справочников
         # Для каждой комбинации генерируем ОТДЕЛЬНОЕ случайное значение
@@ -132,39 +135,8 @@ def generate_test_values(indicator, start_date, end_date, min_value=None, max_va
                 # Для дробных значений округляем до 4 знаков после запятой
                 random_value = Decimal(str(final_value)).quantize(Decimal('0.0001'))
         
-            # Получаем множество ID элементов справочников для проверки уникальности
-            dict_items_set = set(item.id for item in dict_items_tuple) if dict_items_tuple else set()
-            
-            # Ищем существующее значение с такой же комбинацией справочников
-            existing_values = IndicatorValue.objects.filter(
-                indicator=indicator,
-                date=current_date
-            ).prefetch_related('dictionary_items')
-            
-            value_obj = None
-            for existing_value in existing_values:
-                existing_items_set = set(item.id for item in existing_value.dictionary_items.all())
-                if existing_items_set == dict_items_set:
-                    value_obj = existing_value
-                    break
-            
-            # Если не нашли, создаем новое значение
-            if value_obj is None:
-                value_obj = IndicatorValue.objects.create(
-                    indicator=indicator,
-                    date=current_date,
-                    value=random_value
-                )
-            else:
-                # Обновляем существующее значение
-                value_obj.value = random_value
-                value_obj.save()
-            
-            # Устанавливаем элементы справочников
-            if dict_items_tuple:
-                value_obj.dictionary_items.set(dict_items_tuple)
-            else:
-                value_obj.dictionary_items.clear()
+            # Значение записывается вместе со всем набором (см. load_values)
+            rows.append((current_date, random_value, list(dict_key)))
             
             # Сохраняем для следующей итерации для ЭТОЙ комбинации справочников
             previous_values[dict_key] = float(final_value)
@@ -182,5 +154,8 @@ def generate_test_values(indicator, start_date, end_date, min_value=None, max_va
             # Шаг по дням (по умолчанию)
             current_date += timedelta(days=1)
     
+    # Одна массовая загрузка вместо поиска и сохранения каждого значения
+    load_values(indicator, rows)
+    
     return created_count
 
@@ -0,0 +1,172 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from indicators.database import apply_sqlite_pragmas, get_sqlite_pragmas
+
+
+# Параметры SQLite по умолчанию (как у соединения Django без настройки)
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+}
+
+# Запрос чтения, типичный для графика дашборда
+READ_QUERY = (
+    'SELECT date, SUM(value) FROM bench_value '
+    'WHERE indicator_id = ? AND date >= ? GROUP BY date ORDER BY date'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность записи и чтения SQLite с параметрами '
+        'по умолчанию и с параметрами из настройки SQLITE_PRAGMAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=2000,
+            help='Количество записываемых значений (по умолчанию 2000)',
+        )
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=2,
+            help='Количество параллельных читателей (по умолчанию 2)',
+        )
+        parser.add_argument(
+            '--indicators',
+            type=int,
+            default=10,
+            help='Количество показателей, по которым распределяются значения (по умолчанию 10)',
+        )
+
+    def handle(self, *args, **options):
+        tuned_pragmas = get_sqlite_pragmas()
+        if not tuned_pragmas:
+            self.stdout.write(self.style.WARNING(
+                'Настройка SQLite отключена (SQLITE_TUNING_ENABLED), сравнивать не с чем.'
+            ))
+            return
+        
+        self.stdout.write('\n' + '='*60)
+        self.stdout.write(self.style.WARNING('Тест производительности SQLite'))
+        self.stdout.write('='*60)
+        self.stdout.write(
+            f'Записей: {options["rows"]}, читателей: {options["readers"]}, '
+            f'показателей: {options["indicators"]}'
+        )
+        self.stdout.write('='*60 + '\n')
+        
+        results = []
+        for title, pragmas in (('По умолчанию', DEFAULT_PRAGMAS), ('С настройкой', tuned_pragmas)):
+            result = self.run_benchmark(pragmas, options['rows'], options['readers'], options['indicators'])
+            results.append(result)
+            self.stdout.write(title + ': ' + ', '.join(f'{name}={value}' for name, value in pragmas.items()))
+            self.stdout.write(f'  Запись: {result["writes_per_sec"]:.0f} строк/с ({result["write_time"]:.2f} с)')
+            self.stdout.write(
+                f'  Чтение: {result["reads_per_sec"]:.0f} запросов/с, '
+                f'макс. задержка {result["max_read_latency"] * 1000:.0f} мс'
+            )
+            errors_style = self.style.ERROR if result['lock_errors'] else self.style.SUCCESS
+            self.stdout.write(errors_style(f'  Ошибок "database is locked": {result["lock_errors"]}\n'))
+        
+        default, tuned = results
+        self.stdout.write('='*60)
+        if default['writes_per_sec']:
+            self.stdout.write(f'Ускорение записи: x{tuned["writes_per_sec"] / default["writes_per_sec"]:.1f}')
+        if default['reads_per_sec']:
+            self.stdout.write(f'Ускорение чтения: x{tuned["reads_per_sec"] / default["reads_per_sec"]:.1f}')
+        self.stdout.write('='*60)
+
+    def run_benchmark(self, pragmas, rows, readers, indicators):
+        """
+        Выполняет запись значений по одному в транзакции при параллельном чтении.
+        
+        Args:
+            pragmas: параметры PRAGMA для всех соединений
+            rows: количество записываемых значений
+            readers: количество потоков чтения
+            indicators: количество показателей
+        
+        Returns:
+            dict: показатели записи и чтения
+        """
+        directory = tempfile.mkdtemp(prefix='benchmark_sqlite_')
+        path = os.path.join(directory, 'benchmark.sqlite3')
+        try:
+            connection = self.connect(path, pragmas)
+            connection.execute(
+                'CREATE TABLE bench_value (id INTEGER PRIMARY KEY, indicator_id INTEGER, '
+                'date TEXT, value REAL, dimension_key TEXT)'
+            )
+            connection.execute('CREATE INDEX bench_value_date_idx ON bench_value (indicator_id, date)')
+            connection.commit()
+            
+            writer_done = threading.Event()
+            read_stats = []
+            start_date = date.today() - timedelta(days=rows)
+            
+            def read_loop():
+                reader = self.connect(path, pragmas)
+                stats = {'reads': 0, 'errors': 0, 'max_latency': 0.0}
+                indicator_id = 0
+                while not writer_done.is_set():
+                    indicator_id = indicator_id % indicators + 1
+                    started = time.perf_counter()
+                    try:
+                        reader.execute(READ_QUERY, (indicator_id, start_date.isoformat())).fetchall()
+                        stats['reads'] += 1
+                    except sqlite3.OperationalError:
+                        stats['errors'] += 1
+                    stats['max_latency'] = max(stats['max_latency'], time.perf_counter() - started)
+                reader.close()
+                read_stats.append(stats)
+            
+            threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+            for thread in threads:
+                thread.start()
+            
+            # Каждое значение - отдельная транзакция, как при сохранении через форму или API
+            write_errors = 0
+            started = time.perf_counter()
+            for index in range(rows):
+                try:
+                    with connection:
+                        connection.execute(
+                            'INSERT INTO bench_value (indicator_id, date, value, dimension_key) '
+                            'VALUES (?, ?, ?, ?)',
+                            (index % indicators + 1, (start_date + timedelta(days=index)).isoformat(), index, '')
+                        )
+                except sqlite3.OperationalError:
+                    write_errors += 1
+            write_time = time.perf_counter() - started
+            
+            writer_done.set()
+            for thread in threads:
+                thread.join()
+            connection.close()
+            
+            reads = sum(stats['reads'] for stats in read_stats)
+            return {
+                'write_time': write_time,
+                'writes_per_sec': (rows - write_errors) / write_time if write_time else 0,
+                'reads_per_sec': reads / write_time if write_time else 0,
+                'max_read_latency': max((stats['max_latency'] for stats in read_stats), default=0.0),
+                'lock_errors': write_errors + sum(stats['errors'] for stats in read_stats),
+            }
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def connect(self, path, pragmas):
+        """Открывает соединение с тем же ожиданием блокировок, что и у Django по умолчанию (5 с)"""
+        connection = sqlite3.connect(path, check_same_thread=False)
+        apply_sqlite_pragmas(connection, pragmas)
+        return connection
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from indicators.models import IndicatorValue
+from indicators.versioning import mark_values_deleted
 
 
 class Command(BaseCommand):
@@ -42,6 +43,8 @@ class Command(BaseCommand):
         try:
             with transaction.atomic():
                 deleted = IndicatorValue.objects.all().delete()
+                # QuerySet.delete() не вызывает delete() модели - отмечаем удаление явно
+                mark_values_deleted()
                 self.stdout.write(
                     self.style.SUCCESS(
                         f'\n✓ Успешно удалено {deleted[0]} значений показателей'
@@ -0,0 +1,66 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from indicators.models import IndicatorChangeLog
+from indicators.outbox import purge_changes, compact_changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживает журнал изменений значений (outbox): удаляет записи старше срока '
+        'хранения и сжимает старые записи до последней записи каждого значения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=None,
+            help='Срок хранения записей в днях (по умолчанию OUTBOX_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--compact-after-hours',
+            type=int,
+            default=None,
+            help='Сжимать записи старше указанного числа часов (по умолчанию OUTBOX_COMPACT_AFTER_HOURS)',
+        )
+        parser.add_argument(
+            '--no-compact',
+            action='store_true',
+            help='Только удалить записи старше срока хранения, без сжатия',
+        )
+
+    def handle(self, *args, **options):
+        retention_days = options['retention_days']
+        if retention_days is None:
+            retention_days = getattr(settings, 'OUTBOX_RETENTION_DAYS', 30)
+        compact_after_hours = options['compact_after_hours']
+        if compact_after_hours is None:
+            compact_after_hours = getattr(settings, 'OUTBOX_COMPACT_AFTER_HOURS', 24)
+        
+        now = timezone.now()
+        total_before = IndicatorChangeLog.objects.count()
+        
+        self.stdout.write('\n' + '='*60)
+        self.stdout.write(self.style.WARNING('Обслуживание журнала изменений'))
+        self.stdout.write('='*60)
+        self.stdout.write(f'Записей в журнале: {total_before}')
+        self.stdout.write(f'Срок хранения: {retention_days} дн.')
+        if not options['no_compact']:
+            self.stdout.write(f'Сжатие записей старше: {compact_after_hours} ч.')
+        self.stdout.write('='*60 + '\n')
+        
+        purged = purge_changes(now - timedelta(days=retention_days))
+        self.stdout.write(f'Удалено по сроку хранения: {purged}')
+        
+        compacted = 0
+        if not options['no_compact']:
+            compacted = compact_changes(now - timedelta(hours=compact_after_hours))
+            self.stdout.write(f'Удалено при сжатии: {compacted}')
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n✓ Журнал обслужен: осталось {total_before - purged - compacted} записей'
+            )
+        )
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from indicators.models import Indicator, IndicatorValue
+from indicators.retention import COMPACT_CHUNK_SIZE, compact_indicator, get_retention_cutoff
+from indicators.writer import lease_wait
+
+
+class Command(BaseCommand):
+    help = 'Сжимает дневные значения показателей старше срока хранения в итоги по месяцам, кварталам и годам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--indicator',
+            type=int,
+            action='append',
+            dest='indicator_ids',
+            help='ID показателя (можно указать несколько раз; по умолчанию - все показатели со сроком хранения)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=COMPACT_CHUNK_SIZE,
+            help=f'Значений, удаляемых одним запросом (по умолчанию {COMPACT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько значений будет сжато',
+        )
+
+    def handle(self, *args, **options):
+        indicators = Indicator.objects.filter(daily_retention_days__gt=0).order_by('pk')
+        if options['indicator_ids']:
+            indicators = indicators.filter(pk__in=options['indicator_ids'])
+        
+        self.stdout.write('='*60)
+        self.stdout.write(self.style.WARNING('Сжатие дневных значений показателей'))
+        self.stdout.write('='*60)
+        
+        total = 0
+        for indicator in indicators:
+            cutoff = get_retention_cutoff(indicator)
+            count = IndicatorValue.objects.filter(indicator=indicator, date__lt=cutoff).count()
+            if not count:
+                self.stdout.write(f'{indicator.name}: значений до {cutoff} нет')
+                continue
+            
+            if options['dry_run']:
+                self.stdout.write(f'{indicator.name}: будет сжато {count} значений до {cutoff}')
+                total += count
+                continue
+            
+            with lease_wait():
+                deleted = compact_indicator(indicator, cutoff, chunk_size=options['chunk_size'])
+            self.stdout.write(f'{indicator.name}: сжато до {cutoff}, удалено {deleted} значений')
+            total += deleted
+        
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.SUCCESS(f'\nБудет сжато значений: {total}')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'\n✓ Сжато значений: {total}')
+            )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from indicators.models import Indicator
+from indicators.rollups import rebuild_rollups
+from indicators.writer import lease_wait, write_batch
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает итоги значений показателей по месяцам, кварталам и годам (IndicatorRollup)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--indicator',
+            type=int,
+            action='append',
+            dest='indicator_ids',
+            help='ID показателя (можно указать несколько раз; по умолчанию - все показатели)',
+        )
+
+    def handle(self, *args, **options):
+        indicators = Indicator.objects.order_by('pk')
+        if options['indicator_ids']:
+            indicators = indicators.filter(pk__in=options['indicator_ids'])
+        
+        total = 0
+        # По показателю за шаг: пачки фиксируются по мере накопления итогов
+        with lease_wait(), write_batch('Пересчет итогов по периодам') as batch:
+            for indicator in indicators:
+                built = rebuild_rollups([indicator.pk])
+                self.stdout.write(f'{indicator.name}: {built} итогов')
+                total += built
+                batch.step(max(built, 1))
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'\n✓ Построено итогов: {total}')
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from indicators.stats import refresh_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводку по значениям показателей (IndicatorStats) по базе'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--indicator',
+            type=int,
+            action='append',
+            dest='indicator_ids',
+            help='ID показателя (можно указать несколько раз; по умолчанию - все показатели)',
+        )
+
+    def handle(self, *args, **options):
+        refreshed = refresh_stats(options['indicator_ids'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Пересчитано сводок: {refreshed}')
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0006_remove_indicator_dictionary_required_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorDataVersion',
+            fields=[
+                ('indicator', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='data_version', serialize=False, to='indicators.indicator', verbose_name='Показатель')),
+                ('version', models.PositiveBigIntegerField(default=0, help_text='Увеличивается при каждом создании, изменении или удалении значений показателя', verbose_name='Версия')),
+                ('reset_version', models.PositiveBigIntegerField(default=0, help_text='Версия, на которой значения показателя удалялись последний раз', verbose_name='Версия последнего удаления')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Версия данных показателя',
+                'verbose_name_plural': 'Версии данных показателей',
+            },
+        ),
+        migrations.AddField(
+            model_name='indicatorvalue',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Версия данных показателя, в которой значение было создано или изменено последним', verbose_name='Версия данных'),
+        ),
+        migrations.AddIndex(
+            model_name='indicatorvalue',
+            index=models.Index(fields=['indicator', 'data_version'], name='indicators__indicat_4b46b0_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0007_indicatordataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(verbose_name='Версия данных')),
+                ('date', models.DateField(blank=True, help_text='Дата измененного значения (пусто - изменения не привязаны к дате)', null=True, verbose_name='Дата изменения')),
+                ('reset', models.BooleanField(default=False, help_text='Значения удалялись или переносились - ряд нужно загрузить заново', verbose_name='Удаление')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('indicator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='change_log', to='indicators.indicator', verbose_name='Показатель')),
+            ],
+            options={
+                'verbose_name': 'Изменение данных показателя',
+                'verbose_name_plural': 'Журнал изменений данных показателей',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:01
+
+from django.db import migrations, models
+
+
+def fill_dimension_keys(apps, schema_editor):
+    """Заполняем ключи разреза существующих значений по таблице связи со справочниками"""
+    IndicatorValue = apps.get_model('indicators', 'IndicatorValue')
+    
+    items_by_value = {}
+    links = IndicatorValue.dictionary_items.through.objects.values_list(
+        'indicatorvalue_id', 'dictionaryitem_id'
+    ).iterator()
+    for value_id, item_id in links:
+        items_by_value.setdefault(value_id, []).append(item_id)
+    
+    values_by_key = {}
+    for value_id, item_ids in items_by_value.items():
+        dimension_key = ','.join(str(item_id) for item_id in sorted(set(item_ids)))
+        values_by_key.setdefault(dimension_key, []).append(value_id)
+    
+    for dimension_key, value_ids in values_by_key.items():
+        for start in range(0, len(value_ids), 500):
+            IndicatorValue.objects.filter(
+                pk__in=value_ids[start:start + 500]
+            ).update(dimension_key=dimension_key)
+
+
+def reverse_fill(apps, schema_editor):
+    """Обратная миграция - поле удаляется вместе с данными"""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0008_indicatorchangelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indicatorvalue',
+            name='dimension_key',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Отсортированные ID элементов справочников значения (поддерживается автоматически)', max_length=255, verbose_name='Ключ разреза'),
+        ),
+        migrations.RunPython(fill_dimension_keys, reverse_fill),
+    ]
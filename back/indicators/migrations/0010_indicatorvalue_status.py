@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:03
+
+from django.db import migrations, models
+from django.db.models import Case, When, Value, IntegerField
+
+
+def fill_statuses(apps, schema_editor):
+    """Рассчитываем статусы существующих значений (одним UPDATE на показатель)"""
+    Indicator = apps.get_model('indicators', 'Indicator')
+    IndicatorValue = apps.get_model('indicators', 'IndicatorValue')
+    
+    indicators = Indicator.objects.filter(
+        unacceptable_value__isnull=False,
+        acceptable_value__isnull=False,
+        good_value__isnull=False
+    )
+    for indicator in indicators:
+        lookup = 'gte' if indicator.direction == 'increasing' else 'lte'
+        IndicatorValue.objects.filter(indicator=indicator).update(status=Case(
+            When(**{f'value__{lookup}': indicator.good_value}, then=Value(1)),
+            When(**{f'value__{lookup}': indicator.acceptable_value}, then=Value(2)),
+            default=Value(3),
+            output_field=IntegerField()
+        ))
+
+
+def reverse_fill(apps, schema_editor):
+    """Обратная миграция - поле удаляется вместе с данными"""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0009_indicatorvalue_dimension_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indicatorvalue',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Не определен'), (1, 'Зеленый'), (2, 'Желтый'), (3, 'Красный')], default=0, editable=False, help_text='Статус значения относительно пороговых значений показателя (поддерживается автоматически)', verbose_name='Статус'),
+        ),
+        migrations.RunPython(fill_statuses, reverse_fill),
+        migrations.AddIndex(
+            model_name='indicatorvalue',
+            index=models.Index(fields=['indicator', 'status', 'date'], name='indicators__indicat_2cd09e_idx'),
+        ),
+    ]
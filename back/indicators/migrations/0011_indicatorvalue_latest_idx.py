@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0010_indicatorvalue_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='indicatorvalue',
+            index=models.Index(fields=['indicator', '-date'], name='indicatorvalue_latest_idx'),
+        ),
+    ]
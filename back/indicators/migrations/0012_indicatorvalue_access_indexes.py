@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0011_indicatorvalue_latest_idx'),
+    ]
+
+    operations = [
+        # Индекс (indicator, date) просматривается и в обратном порядке,
+        # поэтому отдельный индекс по убыванию даты больше не нужен
+        migrations.RemoveIndex(
+            model_name='indicatorvalue',
+            name='indicatorvalue_latest_idx',
+        ),
+        migrations.AddIndex(
+            model_name='indicatorvalue',
+            index=models.Index(fields=['indicator', 'date'], name='indicatorvalue_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='indicatorvalue',
+            index=models.Index(fields=['indicator', 'dimension_key', 'date'], name='indicatorvalue_dim_date_idx'),
+        ),
+        # Таблица связи значений с элементами справочников создается Django
+        # автоматически, поэтому покрывающий индекс по элементу справочника
+        # (выборка значений элемента без обращения к таблице) создается SQL
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS indicatorvalue_items_item_value_idx '
+            'ON indicators_indicatorvalue_dictionary_items (dictionaryitem_id, indicatorvalue_id)',
+            'DROP INDEX IF EXISTS indicatorvalue_items_item_value_idx',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0012_indicatorvalue_access_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WriteLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('owner', models.CharField(blank=True, help_text='Операция, удерживающая аренду (пусто - аренда свободна)', max_length=100, verbose_name='Владелец')),
+                ('expires_at', models.DateTimeField(blank=True, help_text='Аренда, не продленная до этого момента, считается брошенной', null=True, verbose_name='Истекает')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Аренда записи',
+                'verbose_name_plural': 'Аренды записи',
+            },
+        ),
+    ]
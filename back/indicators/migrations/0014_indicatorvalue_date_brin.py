@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:40
+
+from django.db import migrations
+
+
+def create_date_brin_index(apps, schema_editor):
+    """BRIN-индекс по дате (только PostgreSQL): значения добавляются в порядке дат,
+    поэтому компактный индекс по диапазонам страниц заменяет B-tree при сканах по периоду"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS indicatorvalue_date_brin '
+        'ON indicators_indicatorvalue USING BRIN (date)'
+    )
+
+
+def drop_date_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS indicatorvalue_date_brin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0013_writelease'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_date_brin_index, drop_date_brin_index),
+    ]
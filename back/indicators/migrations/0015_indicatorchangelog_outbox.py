@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0014_indicatorvalue_date_brin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indicatorchangelog',
+            name='dimension_key',
+            field=models.CharField(blank=True, default='', help_text='Ключ разреза измененного значения (см. IndicatorValue.dimension_key)', max_length=255, verbose_name='Ключ разреза'),
+        ),
+        migrations.AddField(
+            model_name='indicatorchangelog',
+            name='op',
+            field=models.CharField(choices=[('I', 'Создание'), ('U', 'Изменение'), ('D', 'Удаление')], default='U', help_text='Без даты операция относится ко всем значениям показателя', max_length=1, verbose_name='Операция'),
+        ),
+        migrations.AddField(
+            model_name='indicatorchangelog',
+            name='txn_id',
+            field=models.CharField(blank=True, default='', help_text='Общий идентификатор изменений, зафиксированных одной транзакцией', max_length=32, verbose_name='Транзакция'),
+        ),
+        migrations.AddIndex(
+            model_name='indicatorchangelog',
+            index=models.Index(fields=['created_at'], name='indicators__created_1b2405_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_indicator_stats(apps, schema_editor):
+    """Строим сводку по значениям существующих показателей"""
+    Indicator = apps.get_model('indicators', 'Indicator')
+    IndicatorValue = apps.get_model('indicators', 'IndicatorValue')
+    IndicatorStats = apps.get_model('indicators', 'IndicatorStats')
+    
+    totals = {
+        row['indicator_id']: row
+        for row in IndicatorValue.objects.order_by().values('indicator_id').annotate(
+            values_count=models.Count('pk'),
+            first_date=models.Min('date'),
+            last_date=models.Max('date'),
+            lowest_value=models.Min('value'),
+            highest_value=models.Max('value')
+        )
+    }
+    # Последнее значение разреза - последнее встретившееся при обходе по дате
+    latest = {}
+    for indicator_id, dimension_key, value_date, value in IndicatorValue.objects.order_by(
+        'indicator_id', 'dimension_key', 'date'
+    ).values_list('indicator_id', 'dimension_key', 'date', 'value').iterator(chunk_size=2000):
+        latest.setdefault(indicator_id, {})[dimension_key] = [value_date.isoformat(), str(value)]
+    
+    IndicatorStats.objects.bulk_create([
+        IndicatorStats(
+            indicator_id=indicator_id,
+            values_count=totals.get(indicator_id, {}).get('values_count', 0),
+            first_date=totals.get(indicator_id, {}).get('first_date'),
+            last_date=totals.get(indicator_id, {}).get('last_date'),
+            lowest_value=totals.get(indicator_id, {}).get('lowest_value'),
+            highest_value=totals.get(indicator_id, {}).get('highest_value'),
+            latest_by_dimension=latest.get(indicator_id, {})
+        )
+        for indicator_id in Indicator.objects.values_list('pk', flat=True)
+    ], batch_size=500)
+
+
+def reverse_fill(apps, schema_editor):
+    """Обратная миграция - таблица удаляется вместе с данными"""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0015_indicatorchangelog_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorStats',
+            fields=[
+                ('indicator', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='indicators.indicator', verbose_name='Показатель')),
+                ('values_count', models.PositiveIntegerField(default=0, verbose_name='Количество значений')),
+                ('first_date', models.DateField(blank=True, null=True, verbose_name='Первая дата')),
+                ('last_date', models.DateField(blank=True, null=True, verbose_name='Последняя дата')),
+                ('lowest_value', models.DecimalField(blank=True, decimal_places=4, max_digits=20, null=True, verbose_name='Минимальное значение')),
+                ('highest_value', models.DecimalField(blank=True, decimal_places=4, max_digits=20, null=True, verbose_name='Максимальное значение')),
+                ('latest_by_dimension', models.JSONField(blank=True, default=dict, help_text='{ключ разреза: [дата ISO, значение]} - последнее значение каждого разреза', verbose_name='Последние значения по разрезам')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Сводка по значениям показателя',
+                'verbose_name_plural': 'Сводки по значениям показателей',
+            },
+        ),
+        migrations.RunPython(fill_indicator_stats, reverse_fill),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import date
+
+
+def period_starts(value_date):
+    """Начала месяца, квартала и года, в которые попадает дата"""
+    return (
+        ('month', date(value_date.year, value_date.month, 1)),
+        ('quarter', date(value_date.year, (value_date.month - 1) // 3 * 3 + 1, 1)),
+        ('year', date(value_date.year, 1, 1)),
+    )
+
+
+def fill_rollups(apps, schema_editor):
+    """Строим итоги по периодам для существующих значений"""
+    IndicatorValue = apps.get_model('indicators', 'IndicatorValue')
+    IndicatorRollup = apps.get_model('indicators', 'IndicatorRollup')
+    
+    totals = {}
+    for indicator_id, dimension_key, value_date, value in IndicatorValue.objects.order_by(
+        'indicator_id', 'dimension_key', 'date'
+    ).values_list('indicator_id', 'dimension_key', 'date', 'value').iterator(chunk_size=2000):
+        for period, period_start in period_starts(value_date):
+            key = (indicator_id, dimension_key, period, period_start)
+            if key not in totals:
+                totals[key] = IndicatorRollup(
+                    indicator_id=indicator_id,
+                    dimension_key=dimension_key,
+                    period=period,
+                    period_start=period_start,
+                    value_sum=0,
+                    value_count=0,
+                    value_min=value,
+                    value_max=value
+                )
+            rollup = totals[key]
+            rollup.value_sum += value
+            rollup.value_count += 1
+            rollup.value_min = min(rollup.value_min, value)
+            rollup.value_max = max(rollup.value_max, value)
+            # Значения идут по возрастанию даты - последнее встретившееся и есть последнее
+            rollup.last_date = value_date
+            rollup.last_value = value
+    
+    IndicatorRollup.objects.bulk_create(totals.values(), batch_size=500)
+
+
+def reverse_fill(apps, schema_editor):
+    """Обратная миграция - таблица удаляется вместе с данными"""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0016_indicatorstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension_key', models.CharField(blank=True, default='', help_text='Ключ разреза значений (см. IndicatorValue.dimension_key)', max_length=255, verbose_name='Ключ разреза')),
+                ('period', models.CharField(choices=[('month', 'Месяц'), ('quarter', 'Квартал'), ('year', 'Год')], max_length=10, verbose_name='Период')),
+                ('period_start', models.DateField(verbose_name='Начало периода')),
+                ('value_sum', models.DecimalField(decimal_places=4, default=0, max_digits=30, verbose_name='Сумма')),
+                ('value_count', models.PositiveIntegerField(default=0, verbose_name='Количество значений')),
+                ('value_min', models.DecimalField(blank=True, decimal_places=4, max_digits=20, null=True, verbose_name='Минимум')),
+                ('value_max', models.DecimalField(blank=True, decimal_places=4, max_digits=20, null=True, verbose_name='Максимум')),
+                ('last_date', models.DateField(blank=True, null=True, verbose_name='Дата последнего значения')),
+                ('last_value', models.DecimalField(blank=True, decimal_places=4, max_digits=20, null=True, verbose_name='Последнее значение')),
+                ('indicator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='indicators.indicator', verbose_name='Показатель')),
+            ],
+            options={
+                'verbose_name': 'Итог показателя за период',
+                'verbose_name_plural': 'Итоги показателей за периоды',
+                'unique_together': {('indicator', 'period', 'period_start', 'dimension_key')},
+            },
+        ),
+        migrations.RunPython(fill_rollups, reverse_fill),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicators', '0017_indicatorrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indicator',
+            name='compacted_before',
+            field=models.DateField(blank=True, editable=False, help_text='Значения до этой даты хранятся только в итогах по периодам (IndicatorRollup)', null=True, verbose_name='Дневные значения сжаты до'),
+        ),
+        migrations.AddField(
+            model_name='indicator',
+            name='daily_retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Более старые значения сжимаются до итогов по месяцам командой compact_indicator_values (граница - начало года). Пусто - хранить бессрочно.', null=True, verbose_name='Хранить дневные значения (дней)'),
+        ),
+    ]
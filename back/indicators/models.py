@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from decimal import Decimal
@@ -139,6 +139,21 @@ class Indicator(models.Model):
         help_text='Для агрегатных показателей: если включено, агрегирует только значения с одинаковыми комбинациями справочников. Если выключено, агрегирует все значения независимо от справочников.'
     )
     
+    # Срок хранения дневных значений (см. indicators.retention)
+    daily_retention_days = models.PositiveIntegerField(
+        'Хранить дневные значения (дней)',
+        null=True,
+        blank=True,
+        help_text='Более старые значения сжимаются до итогов по месяцам командой compact_indicator_values (граница - начало года). Пусто - хранить бессрочно.'
+    )
+    compacted_before = models.DateField(
+        'Дневные значения сжаты до',
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Значения до этой даты хранятся только в итогах по периодам (IndicatorRollup)'
+    )
+    
     created_at = models.DateTimeField('Создан', auto_now_add=True)
     updated_at = models.DateTimeField('Обновлен', auto_now=True)
 
@@ -275,9 +290,26 @@ class Indicator(models.Model):
     
     def save(self, *args, **kwargs):
         """Переопределяем save для автоматического добавления справочников из зависимостей"""
+        # Изменение порогов или направления меняет статусы всех значений
+        thresholds_changed = False
+        if self.pk:
+            old_thresholds = Indicator.objects.filter(pk=self.pk).values_list(
+                'direction', 'unacceptable_value', 'acceptable_value', 'good_value'
+            ).first()
+            thresholds_changed = old_thresholds is not None and old_thresholds != (
+                self.direction, self.unacceptable_value, self.acceptable_value, self.good_value
+            )
+        
         # Сохраняем сначала, чтобы получить ID
         super().save(*args, **kwargs)
         
+        if thresholds_changed:
+            from .status import refresh_value_statuses
+            from .versioning import bump_data_version
+            if refresh_value_statuses(self):
+                # Статусы в уже загруженных клиентами рядах устарели
+                bump_data_version(self.pk, reset=True)
+        
         # Для агрегатных показателей автоматически добавляем справочники из зависимостей
         if self.indicator_type == 'aggregate':
             dependencies = self.get_dependencies()
@@ -342,11 +374,39 @@ class IndicatorValue(models.Model):
         help_text='Элементы справочников для этого значения (разрез)'
     )
     created_at = models.DateTimeField('Создано', auto_now_add=True)
+    data_version = models.PositiveBigIntegerField(
+        'Версия данных',
+        default=0,
+        editable=False,
+        help_text='Версия данных показателя, в которой значение было создано или изменено последним'
+    )
+    status = models.PositiveSmallIntegerField(
+        'Статус',
+        choices=[(0, 'Не определен'), (1, 'Зеленый'), (2, 'Желтый'), (3, 'Красный')],
+        default=0,
+        editable=False,
+        help_text='Статус значения относительно пороговых значений показателя (поддерживается автоматически)'
+    )
+    dimension_key = models.CharField(
+        'Ключ разреза',
+        max_length=255,
+        blank=True,
+        default='',
+        editable=False,
+        help_text='Отсортированные ID элементов справочников значения (поддерживается автоматически)'
+    )
 
     class Meta:
         verbose_name = 'Значение показателя'
         verbose_name_plural = 'Значения показателей'
         ordering = ['-date', 'indicator']
+        indexes = [
+            # Диапазон дат показателя (в обе стороны - и для последнего значения)
+            models.Index(fields=['indicator', 'date'], name='indicatorvalue_date_idx'),
+            models.Index(fields=['indicator', 'dimension_key', 'date'], name='indicatorvalue_dim_date_idx'),
+            models.Index(fields=['indicator', 'data_version']),
+            models.Index(fields=['indicator', 'status', 'date']),
+        ]
         # Уникальность определяется комбинацией indicator + date + dictionary_items
         # Это будет обрабатываться через промежуточную модель или логику в save()
 
@@ -357,6 +417,51 @@ class IndicatorValue(models.Model):
             dimension_str = f" ({items})"
         return f"{self.indicator.name}: {self.value} на {self.date}{dimension_str}"
     
+    def save(self, *args, **kwargs):
+        """Переопределяем save для отметки изменения в версии данных показателя и расчета статуса"""
+        from .versioning import bump_data_version
+        from .status import get_status_code
+        from .stats import record_values
+        # Журнал изменений, сводка и итоги пишутся в одной транзакции со значением:
+        # при ошибке сохранения в журнале не остается записей о несостоявшейся записи
+        with transaction.atomic():
+            # Перенос значения на другую дату меняет данные и на старой дате
+            moved = False
+            changes = [(IndicatorChangeLog.OP_INSERT, self.date, self.dimension_key)]
+            old = None
+            if self.pk:
+                old = IndicatorValue.objects.filter(pk=self.pk).values_list('date', 'dimension_key', 'value').first()
+                if old is not None:
+                    moved = old[0] != self.date
+                    changes = [(IndicatorChangeLog.OP_UPDATE, self.date, self.dimension_key)]
+                    if moved:
+                        changes.insert(0, (IndicatorChangeLog.OP_DELETE, old[0], old[1]))
+            self.data_version = bump_data_version(self.indicator_id, reset=moved, changes=changes)
+            self.status = get_status_code(self.indicator, self.value)
+            super().save(*args, **kwargs)
+            record_values(
+                self.indicator_id,
+                added=[(self.date, self.dimension_key, self.value)],
+                removed=[old] if old is not None else []
+            )
+    
+    def delete(self, *args, **kwargs):
+        """Переопределяем delete для отметки удаления в версии данных показателя"""
+        from .versioning import bump_data_version
+        from .stats import record_values
+        indicator_id = self.indicator_id
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            record_values(indicator_id, removed=[(self.date, self.dimension_key, self.value)])
+            bump_data_version(
+                indicator_id,
+                reset=True,
+                value_date=self.date,
+                op=IndicatorChangeLog.OP_DELETE,
+                dimension_key=self.dimension_key
+            )
+        return result
+    
     def get_status_color(self):
         """Возвращает цвет статуса для этого значения"""
         return self.indicator.get_value_status(self.value)
@@ -382,6 +487,262 @@ class IndicatorValue(models.Model):
         return "; ".join(parts)
 
 
+def make_dimension_key(item_ids):
+    """
+    Строит ключ разреза значения из ID элементов справочников.
+    
+    Значения с одинаковым набором элементов (одной комбинацией справочников)
+    получают одинаковый ключ, поэтому по нему можно группировать ряды в SQL.
+    
+    Args:
+        item_ids: итерируемый набор ID элементов справочников
+    
+    Returns:
+        str: ID через запятую в порядке возрастания ('' - без разреза)
+    """
+    return ','.join(str(item_id) for item_id in sorted(set(item_ids)))
+
+
+class IndicatorDataVersion(models.Model):
+    """Счетчик изменений данных показателя (для кэширования и инкрементальной загрузки)"""
+    indicator = models.OneToOneField(
+        Indicator,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Показатель',
+        related_name='data_version'
+    )
+    version = models.PositiveBigIntegerField(
+        'Версия',
+        default=0,
+        help_text='Увеличивается при каждом создании, изменении или удалении значений показателя'
+    )
+    reset_version = models.PositiveBigIntegerField(
+        'Версия последнего удаления',
+        default=0,
+        help_text='Версия, на которой значения показателя удалялись последний раз'
+    )
+    updated_at = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Версия данных показателя'
+        verbose_name_plural = 'Версии данных показателей'
+
+    def __str__(self):
+        return f"{self.indicator.name}: v{self.version}"
+
+
+class IndicatorStats(models.Model):
+    """
+    Сводка по значениям показателя для реестра, админки и редактора дашбордов.
+
+    Поддерживается при каждой записи значений (см. indicators.stats), поэтому
+    списки показателей читают ее одним JOIN вместо подсчета по значениям.
+    """
+    indicator = models.OneToOneField(
+        Indicator,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Показатель',
+        related_name='stats'
+    )
+    values_count = models.PositiveIntegerField('Количество значений', default=0)
+    first_date = models.DateField('Первая дата', null=True, blank=True)
+    last_date = models.DateField('Последняя дата', null=True, blank=True)
+    lowest_value = models.DecimalField(
+        'Минимальное значение',
+        max_digits=20,
+        decimal_places=4,
+        null=True,
+        blank=True
+    )
+    highest_value = models.DecimalField(
+        'Максимальное значение',
+        max_digits=20,
+        decimal_places=4,
+        null=True,
+        blank=True
+    )
+    latest_by_dimension = models.JSONField(
+        'Последние значения по разрезам',
+        default=dict,
+        blank=True,
+        help_text='{ключ разреза: [дата ISO, значение]} - последнее значение каждого разреза'
+    )
+    updated_at = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Сводка по значениям показателя'
+        verbose_name_plural = 'Сводки по значениям показателей'
+
+    def __str__(self):
+        return f"{self.indicator_id}: {self.values_count} значений"
+
+    @property
+    def last_value(self):
+        """Значение на последнюю дату (при нескольких разрезах - первого по ключу)"""
+        if self.last_date is None:
+            return None
+        last_date = self.last_date.isoformat()
+        for dimension_key in sorted(self.latest_by_dimension):
+            value_date, value = self.latest_by_dimension[dimension_key]
+            if value_date == last_date:
+                return Decimal(value)
+        return None
+
+    def get_status_color(self):
+        """Возвращает цвет статуса последнего значения"""
+        last_value = self.last_value
+        if last_value is None:
+            return None
+        return self.indicator.get_value_status(last_value)
+
+
+class IndicatorRollup(models.Model):
+    """
+    Итоги значений показателя за месяц, квартал и год по каждому разрезу.
+
+    Поддерживаются при каждой записи значений (см. indicators.rollups), поэтому
+    функции агрегации за период и агрегированные графики читают по строке на
+    период вместо дневных значений.
+    """
+    PERIOD_CHOICES = [
+        ('month', 'Месяц'),
+        ('quarter', 'Квартал'),
+        ('year', 'Год'),
+    ]
+
+    indicator = models.ForeignKey(
+        Indicator,
+        on_delete=models.CASCADE,
+        verbose_name='Показатель',
+        related_name='rollups'
+    )
+    dimension_key = models.CharField(
+        'Ключ разреза',
+        max_length=255,
+        blank=True,
+        default='',
+        help_text='Ключ разреза значений (см. IndicatorValue.dimension_key)'
+    )
+    period = models.CharField('Период', max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField('Начало периода')
+    value_sum = models.DecimalField('Сумма', max_digits=30, decimal_places=4, default=0)
+    value_count = models.PositiveIntegerField('Количество значений', default=0)
+    value_min = models.DecimalField('Минимум', max_digits=20, decimal_places=4, null=True, blank=True)
+    value_max = models.DecimalField('Максимум', max_digits=20, decimal_places=4, null=True, blank=True)
+    last_date = models.DateField('Дата последнего значения', null=True, blank=True)
+    last_value = models.DecimalField(
+        'Последнее значение',
+        max_digits=20,
+        decimal_places=4,
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Итог показателя за период'
+        verbose_name_plural = 'Итоги показателей за периоды'
+        unique_together = ['indicator', 'period', 'period_start', 'dimension_key']
+
+    def __str__(self):
+        return f"{self.indicator_id}: {self.period} {self.period_start} [{self.dimension_key}]"
+
+
+class IndicatorChangeLog(models.Model):
+    """
+    Журнал изменений данных показателей (outbox): добавляется при каждой записи
+    значений, включая массовые операции. ID записи - монотонная последовательность,
+    по которой читают потребители (открытые дашборды, см. indicators.outbox).
+    """
+    OP_INSERT = 'I'
+    OP_UPDATE = 'U'
+    OP_DELETE = 'D'
+    OP_CHOICES = [
+        (OP_INSERT, 'Создание'),
+        (OP_UPDATE, 'Изменение'),
+        (OP_DELETE, 'Удаление'),
+    ]
+
+    indicator = models.ForeignKey(
+        Indicator,
+        on_delete=models.CASCADE,
+        verbose_name='Показатель',
+        related_name='change_log'
+    )
+    version = models.PositiveBigIntegerField('Версия данных')
+    date = models.DateField(
+        'Дата изменения',
+        null=True,
+        blank=True,
+        help_text='Дата измененного значения (пусто - изменения не привязаны к дате)'
+    )
+    reset = models.BooleanField(
+        'Удаление',
+        default=False,
+        help_text='Значения удалялись или переносились - ряд нужно загрузить заново'
+    )
+    dimension_key = models.CharField(
+        'Ключ разреза',
+        max_length=255,
+        blank=True,
+        default='',
+        help_text='Ключ разреза измененного значения (см. IndicatorValue.dimension_key)'
+    )
+    op = models.CharField(
+        'Операция',
+        max_length=1,
+        choices=OP_CHOICES,
+        default=OP_UPDATE,
+        help_text='Без даты операция относится ко всем значениям показателя'
+    )
+    txn_id = models.CharField(
+        'Транзакция',
+        max_length=32,
+        blank=True,
+        default='',
+        help_text='Общий идентификатор изменений, зафиксированных одной транзакцией'
+    )
+    created_at = models.DateTimeField('Создано', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Изменение данных показателя'
+        verbose_name_plural = 'Журнал изменений данных показателей'
+        ordering = ['id']
+        indexes = [
+            # Очистка журнала по сроку хранения
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.indicator_id}: v{self.version}"
+
+
+class WriteLease(models.Model):
+    """Аренда права записи: тяжелые операции записи выполняются по очереди"""
+    name = models.CharField('Название', max_length=50, unique=True)
+    owner = models.CharField(
+        'Владелец',
+        max_length=100,
+        blank=True,
+        help_text='Операция, удерживающая аренду (пусто - аренда свободна)'
+    )
+    expires_at = models.DateTimeField(
+        'Истекает',
+        null=True,
+        blank=True,
+        help_text='Аренда, не продленная до этого момента, считается брошенной'
+    )
+    updated_at = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Аренда записи'
+        verbose_name_plural = 'Аренды записи'
+
+    def __str__(self):
+        return f"{self.name}: {self.owner or 'свободна'}"
+
+
 class ImportTemplate(models.Model):
     """Шаблон для импорта показателей из Excel"""
     name = models.CharField('Название шаблона', max_length=200, unique=True)
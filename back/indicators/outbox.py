@@ -0,0 +1,213 @@
+"""Журнал изменений значений показателей (outbox) для потребителей
+
+Каждая запись значений - сохранение, удаление, изменение разреза, массовая
+загрузка и массовое удаление - добавляет в IndicatorChangeLog компактные записи
+(показатель, дата, ключ разреза, операция, транзакция). ID записи - монотонная
+последовательность: потребитель (инвалидация кэша, пересчет, выгрузки) хранит
+курсор - ID последней обработанной записи - и читает следующие через
+read_changes или GET /indicators/api/changes/.
+
+Запись без даты относится ко всем значениям показателя (например, удаление
+всех значений или пересчет статусов после изменения порогов).
+"""
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import Exists, Min, OuterRef
+from django.utils import timezone
+from .models import IndicatorChangeLog
+
+
+# Размер пачки при массовой записи журнала
+OUTBOX_BATCH_SIZE = 1000
+# Максимальное количество записей в одном ответе потребителю
+OUTBOX_MAX_LIMIT = 5000
+
+
+def get_txn_id():
+    """
+    Возвращает идентификатор текущей транзакции для записей журнала.
+    
+    Внутри transaction.atomic() идентификатор один на всю транзакцию: он
+    хранится на соединении и сбрасывается обработчиком on_commit при ее
+    фиксации. Обработчик регистрируется при каждом вызове - обработчики из
+    откаченной точки сохранения Django отбрасывает. После отката транзакции
+    идентификатор достается следующей транзакции, но записей с ним к этому
+    моменту нет (они откатились). Вне транзакции - новый на каждый вызов.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return uuid.uuid4().hex
+    
+    txn_id = getattr(connection, 'outbox_txn_id', None)
+    if txn_id is None:
+        txn_id = connection.outbox_txn_id = uuid.uuid4().hex
+    
+    def reset():
+        if getattr(connection, 'outbox_txn_id', None) == txn_id:
+            connection.outbox_txn_id = None
+    
+    transaction.on_commit(reset)
+    return txn_id
+
+
+def get_settle_seconds():
+    """
+    Время, в течение которого пропуск в последовательности считается незафиксированной
+    транзакцией (ID выдаются до фиксации, и в PostgreSQL запись с меньшим ID может
+    стать видимой позже записи с большим).
+    """
+    return getattr(settings, 'OUTBOX_SETTLE_SECONDS', 5)
+
+
+def get_pending_since(using=DEFAULT_DB_ALIAS):
+    """
+    Момент, начиная с которого созданные записи журнала могут стоять после пропуска,
+    который еще заполнит незафиксированная транзакция.
+    
+    В PostgreSQL транзакция, взявшая меньший ID, может зафиксироваться сколь угодно
+    позже записи с большим ID (пачка write_batch, долгий импорт). Такая транзакция
+    началась раньше записи после пропуска, поэтому пропуск ждет, пока открыта
+    любая транзакция, начавшаяся до этой записи (с запасом OUTBOX_SETTLE_SECONDS
+    на расхождение часов приложения и базы). В остальных СУБД пропуск считается
+    незафиксированной транзакцией OUTBOX_SETTLE_SECONDS секунд - в SQLite пишет
+    одна транзакция за раз, и запись с меньшим ID не появляется позже.
+    
+    Args:
+        using: база данных журнала
+    
+    Returns:
+        datetime или None - открытых транзакций нет, пропуски не ждут
+    """
+    margin = timedelta(seconds=get_settle_seconds())
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return timezone.now() - margin
+    
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT MIN(xact_start) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND backend_type = 'client backend' "
+            "AND xact_start IS NOT NULL AND pid <> pg_backend_pid()"
+        )
+        oldest = cursor.fetchone()[0]
+    return oldest - margin if oldest is not None else None
+
+
+def read_changes(cursor=0, limit=1000, indicator_ids=None):
+    """
+    Читает записи журнала после курсора.
+    
+    Чтение останавливается перед пропуском в последовательности ID, который еще
+    может заполнить незафиксированная транзакция (см. get_pending_since), чтобы
+    потребитель не перескочил ее записи. Остальные пропуски (откат транзакции,
+    сжатие журнала) не мешают.
+    
+    Args:
+        cursor: ID последней обработанной записи (0 - с начала журнала)
+        limit: максимальное количество записей
+        indicator_ids: ограничить показателями (список ID) или None - все
+    
+    Returns:
+        dict: {'changes': [{'seq', 'indicator_id', 'date', 'dimension_key', 'op',
+               'txn_id', 'version', 'reset'}], 'cursor': новый курсор,
+               'oldest_seq': ID самой старой хранимой записи (если курсор меньше
+               oldest_seq - 1, часть записей удалена по сроку хранения и
+               потребителю нужна полная синхронизация)}
+    """
+    limit = max(1, min(limit, OUTBOX_MAX_LIMIT))
+    # Открытые транзакции проверяются до чтения: транзакция, завершившаяся позже,
+    # уже видна в следующем запросе
+    using = router.db_for_read(IndicatorChangeLog) or DEFAULT_DB_ALIAS
+    pending_since = get_pending_since(using)
+    
+    # Пропуски ищутся по всему журналу, а не только по выбранным показателям
+    rows = list(IndicatorChangeLog.objects.using(using).filter(pk__gt=cursor).order_by('pk').values(
+        'pk', 'indicator_id', 'date', 'dimension_key', 'op', 'txn_id', 'version', 'reset', 'created_at'
+    )[:limit])
+    
+    changes = []
+    expected = cursor + 1
+    for row in rows:
+        if (row['pk'] != expected and pending_since is not None
+                and row['created_at'] >= pending_since and cursor > 0):
+            break
+        cursor = expected = row['pk']
+        expected += 1
+        if indicator_ids is not None and row['indicator_id'] not in indicator_ids:
+            continue
+        changes.append({
+            'seq': row['pk'],
+            'indicator_id': row['indicator_id'],
+            'date': row['date'].isoformat() if row['date'] else None,
+            'dimension_key': row['dimension_key'],
+            'op': row['op'],
+            'txn_id': row['txn_id'],
+            'version': row['version'],
+            'reset': row['reset'],
+        })
+    
+    oldest_seq = IndicatorChangeLog.objects.using(using).aggregate(oldest=Min('pk'))['oldest'] or 0
+    return {'changes': changes, 'cursor': cursor, 'oldest_seq': oldest_seq}
+
+
+def purge_changes(older_than, chunk_size=OUTBOX_BATCH_SIZE):
+    """
+    Удаляет записи журнала старше срока хранения порциями.
+    
+    Args:
+        older_than: datetime - граница срока хранения
+        chunk_size: записей в одной порции
+    
+    Returns:
+        int: количество удаленных записей
+    """
+    deleted = 0
+    while True:
+        ids = list(IndicatorChangeLog.objects.filter(
+            created_at__lt=older_than
+        ).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += IndicatorChangeLog.objects.filter(pk__in=ids).delete()[0]
+
+
+def compact_changes(older_than, chunk_size=OUTBOX_BATCH_SIZE):
+    """
+    Сжимает журнал: из записей одного значения (показатель, дата, ключ разреза),
+    сделанных до границы, остается только последняя.
+    
+    Args:
+        older_than: datetime - сжимаются только записи до этого момента
+        chunk_size: записей в одной порции удаления
+    
+    Returns:
+        int: количество удаленных записей
+    """
+    old = IndicatorChangeLog.objects.filter(created_at__lt=older_than)
+    later_dated = old.filter(
+        indicator_id=OuterRef('indicator_id'),
+        date=OuterRef('date'),
+        dimension_key=OuterRef('dimension_key'),
+        pk__gt=OuterRef('pk')
+    )
+    later_undated = old.filter(
+        indicator_id=OuterRef('indicator_id'),
+        date__isnull=True,
+        dimension_key=OuterRef('dimension_key'),
+        pk__gt=OuterRef('pk')
+    )
+    superseded = [
+        old.filter(date__isnull=False).filter(Exists(later_dated)),
+        old.filter(date__isnull=True).filter(Exists(later_undated)),
+    ]
+    
+    deleted = 0
+    for queryset in superseded:
+        while True:
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            deleted += IndicatorChangeLog.objects.filter(pk__in=ids).delete()[0]
+    return deleted
@@ -0,0 +1,171 @@
+"""Срок хранения дневных значений показателей
+
+Для показателя с Indicator.daily_retention_days дневные значения старше срока
+удаляются командой compact_indicator_values - за эти периоды остаются только
+итоги по месяцам, кварталам и годам (IndicatorRollup: сумма, количество,
+минимум, максимум). Граница сжатия - начало года, чтобы ни один период итогов
+не делился на сжатую и дневную части; она хранится в Indicator.compacted_before.
+
+Читатели значений до границы переходят на итоги: графики по дням получают
+по одной точке на месяц, функции формул - значения месяца.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from django.utils import timezone
+from .models import Indicator, IndicatorRollup, IndicatorValue
+from .rollups import VALUE_QUANTUM, rebuild_rollups
+from .stats import refresh_stats
+from .versioning import bump_data_version
+from .writer import write_batch
+
+
+# Значений, удаляемых одним запросом
+COMPACT_CHUNK_SIZE = 5000
+
+
+def get_retention_cutoff(indicator, today=None):
+    """
+    Граница сжатия показателя по сроку хранения.
+    
+    Args:
+        indicator: экземпляр Indicator
+        today: текущая дата (по умолчанию - сегодня)
+    
+    Returns:
+        date: начало года, до которого значения сжимаются, или None - срок не задан
+    """
+    if not indicator.daily_retention_days:
+        return None
+    today = today or timezone.localdate()
+    cutoff = date((today - timedelta(days=indicator.daily_retention_days)).year, 1, 1)
+    # Граница не сдвигается назад: сжатые значения уже удалены
+    if indicator.compacted_before is not None:
+        cutoff = max(cutoff, indicator.compacted_before)
+    return cutoff
+
+
+def compact_indicator(indicator, cutoff, chunk_size=COMPACT_CHUNK_SIZE):
+    """
+    Сжимает дневные значения показателя до границы в итоги по периодам.
+    
+    Итоги сжимаемых периодов сначала пересчитываются по дневным значениям,
+    затем граница сохраняется в показателе и значения удаляются пачками
+    (каждая пачка - шаг write_batch).
+    
+    Args:
+        indicator: экземпляр Indicator
+        cutoff: граница сжатия (начало года, см. get_retention_cutoff)
+        chunk_size: значений, удаляемых одним запросом
+    
+    Returns:
+        int: количество удаленных значений
+    """
+    deleted = 0
+    values = IndicatorValue.objects.filter(indicator=indicator, date__lt=cutoff)
+    with write_batch(f'Сжатие значений показателя {indicator.pk}') as batch:
+        rebuild_rollups([indicator.pk], start_from=indicator.compacted_before, start_before=cutoff)
+        indicator.compacted_before = cutoff
+        Indicator.objects.filter(pk=indicator.pk).update(compacted_before=cutoff)
+        batch.step()
+        
+        while True:
+            ids = list(values.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            IndicatorValue.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+            batch.step(len(ids))
+        
+        # Значения в итогах не изменились, но дневных точек до границы больше нет -
+        # клиенты перезагружают данные
+        refresh_stats([indicator.pk])
+        bump_data_version(indicator.pk, reset=True)
+    return deleted
+
+
+def is_compacted(indicator, target_date):
+    """True, если дневные значения показателя на дату сжаты в итоги"""
+    return indicator.compacted_before is not None and target_date < indicator.compacted_before
+
+
+def get_compacted_value(indicator, target_date, dimension_key=None):
+    """
+    Значение показателя на сжатую дату - среднее разреза за месяц по итогам.
+    
+    Args:
+        indicator: экземпляр Indicator
+        target_date: дата
+        dimension_key: ключ разреза или None - первый разрез (как первое найденное
+                       дневное значение, см. get_compacted_day_values)
+    
+    Returns:
+        Decimal: среднее за месяц или None (дата не сжата или значений за месяц нет)
+    """
+    values = get_compacted_day_values(indicator, target_date, dimension_key)
+    return values[0] if values else None
+
+
+def get_compacted_day_values(indicator, target_date, dimension_key=None):
+    """
+    Значения показателя на сжатую дату - по одному на разрез.
+    
+    Дневное значение разреза восстанавливается как его среднее за месяц, поэтому
+    функции за день (SUM, COUNT, ...) по всем разрезам считаются так же, как по
+    дневным значениям: сумма дня - сумма по разрезам, количество - число разрезов.
+    
+    Args:
+        indicator: экземпляр Indicator
+        target_date: дата
+        dimension_key: ключ разреза или None - все разрезы
+    
+    Returns:
+        list: значения Decimal в порядке ключа разреза (пусто - дата не сжата или
+              значений за месяц нет)
+    """
+    if not is_compacted(indicator, target_date):
+        return []
+    rollups = IndicatorRollup.objects.filter(
+        indicator=indicator,
+        period='month',
+        period_start=target_date.replace(day=1),
+        value_count__gt=0
+    )
+    if dimension_key is not None:
+        rollups = rollups.filter(dimension_key=dimension_key)
+    return [
+        (value_sum / value_count).quantize(VALUE_QUANTUM)
+        for value_sum, value_count in rollups.order_by('dimension_key').values_list('value_sum', 'value_count')
+    ]
+
+
+def get_compacted_sum(indicator, start_date, end_date, dimension_key=None):
+    """
+    Сумма и количество значений показателя за сжатые месяцы с start_date по end_date.
+    
+    Месяц учитывается целиком (точность сжатых данных - месяц).
+    
+    Args:
+        indicator: экземпляр Indicator
+        start_date: начальная дата
+        end_date: конечная дата
+        dimension_key: ключ разреза или None - все разрезы
+    
+    Returns:
+        tuple: (сумма Decimal, количество значений)
+    """
+    if not is_compacted(indicator, start_date):
+        return Decimal('0'), 0
+    rollups = IndicatorRollup.objects.filter(
+        indicator=indicator,
+        period='month',
+        period_start__gte=start_date.replace(day=1),
+        period_start__lte=min(end_date, indicator.compacted_before - timedelta(days=1))
+    )
+    if dimension_key is not None:
+        rollups = rollups.filter(dimension_key=dimension_key)
+    total = Decimal('0')
+    count = 0
+    for value_sum, value_count in rollups.values_list('value_sum', 'value_count'):
+        total += value_sum
+        count += value_count
+    return total, count
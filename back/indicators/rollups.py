@@ -0,0 +1,309 @@
+"""Итоги значений показателей за месяц, квартал и год (IndicatorRollup)
+
+Для каждого показателя, разреза и периода хранятся сумма, количество,
+минимум, максимум и последнее значение. Запись значений обновляет итоги
+затронутых периодов приращением (см. stats.record_values); по дневным
+значениям пересчитывается только период, из которого удалено значение,
+державшее минимум, максимум или последнюю дату. Массовые удаления и команда
+rebuild_rollups пересчитывают итоги показателя целиком.
+
+Итоги периодов до Indicator.compacted_before (дневные значения сжаты, см.
+indicators.retention) по дневным значениям не пересчитываются - они
+сохраняются и обновляются только приращением.
+"""
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from .formula_parser import get_period_range
+from .models import Indicator, IndicatorRollup, IndicatorValue
+
+
+# Периоды, для которых хранятся итоги
+ROLLUP_PERIODS = ('month', 'quarter', 'year')
+# Размер пачки при массовой записи итогов
+ROLLUP_BATCH_SIZE = 1000
+
+# Точность значений показателей (IndicatorValue.value, 4 знака после запятой)
+VALUE_QUANTUM = Decimal('0.0001')
+
+ROLLUP_FIELDS = ['value_sum', 'value_count', 'value_min', 'value_max', 'last_date', 'last_value']
+
+
+def _add_value(rollup, value_date, value):
+    """Добавляет значение в итог периода"""
+    rollup.value_sum = (rollup.value_sum or Decimal('0')) + value
+    rollup.value_count = (rollup.value_count or 0) + 1
+    rollup.value_min = value if rollup.value_min is None else min(rollup.value_min, value)
+    rollup.value_max = value if rollup.value_max is None else max(rollup.value_max, value)
+    if rollup.last_date is None or value_date >= rollup.last_date:
+        rollup.last_date = value_date
+        rollup.last_value = value
+
+
+def _apply_changes(rollup, added, removed):
+    """
+    Применяет изменения к итогу периода.
+    
+    Returns:
+        bool: False - итог нужно пересчитать по дневным значениям
+    """
+    lowest, highest = rollup.value_min, rollup.value_max
+    for value_date, value in added:
+        _add_value(rollup, value_date, value)
+    
+    added_dates = {value_date for value_date, _ in added}
+    stale = False
+    for value_date, value in removed:
+        rollup.value_sum -= value
+        rollup.value_count -= 1
+        if value == lowest and not any(item[1] <= value for item in added):
+            stale = True
+        if value == highest and not any(item[1] >= value for item in added):
+            stale = True
+        if value_date == rollup.last_date and value_date not in added_dates:
+            stale = True
+    return not stale and rollup.value_count > 0
+
+
+def _build_rollups(rows, periods=ROLLUP_PERIODS):
+    """
+    Строит итоги по потоку дневных значений.
+    
+    Args:
+        rows: кортежи (ID показателя, ключ разреза, дата, значение) в порядке
+              показателя, ключа разреза и даты
+        periods: периоды итогов
+    
+    Yields:
+        IndicatorRollup: несохраненные итоги (каждый - после его последнего значения)
+    """
+    current = {}
+    for indicator_id, dimension_key, value_date, value in rows:
+        for period in periods:
+            period_start = get_period_range(value_date, period)[0]
+            rollup = current.get(period)
+            if rollup is None or (rollup.indicator_id, rollup.dimension_key, rollup.period_start) != (
+                indicator_id, dimension_key, period_start
+            ):
+                if rollup is not None:
+                    yield rollup
+                rollup = current[period] = IndicatorRollup(
+                    indicator_id=indicator_id,
+                    dimension_key=dimension_key,
+                    period=period,
+                    period_start=period_start,
+                    value_sum=Decimal('0'),
+                    value_count=0
+                )
+            _add_value(rollup, value_date, value)
+    yield from current.values()
+
+
+def record_rollups(indicator_id, added=(), removed=()):
+    """
+    Обновляет итоги периодов после записи значений (вызывается после записи в базу).
+    
+    Args:
+        indicator_id: ID показателя
+        added: список (дата, ключ разреза, значение Decimal) записанных значений
+        removed: список (дата, ключ разреза, значение Decimal) удаленных или замененных значений
+    """
+    changes = {}
+    for position, rows in enumerate((added, removed)):
+        for value_date, dimension_key, value in rows:
+            for period in ROLLUP_PERIODS:
+                bucket = (period, get_period_range(value_date, period)[0], dimension_key)
+                changes.setdefault(bucket, ([], []))[position].append((value_date, value))
+    if not changes:
+        return
+    
+    with transaction.atomic():
+        starts = [bucket[1] for bucket in changes]
+        existing = {}
+        for rollup in IndicatorRollup.objects.select_for_update().filter(
+            indicator_id=indicator_id,
+            period_start__gte=min(starts),
+            period_start__lte=max(starts),
+            dimension_key__in={bucket[2] for bucket in changes}
+        ):
+            existing[(rollup.period, rollup.period_start, rollup.dimension_key)] = rollup
+        
+        to_create = []
+        to_update = []
+        to_delete = []
+        stale = []
+        for bucket, (bucket_added, bucket_removed) in changes.items():
+            rollup = existing.get(bucket)
+            if rollup is None:
+                if bucket_removed:
+                    stale.append(bucket)
+                    continue
+                period, period_start, dimension_key = bucket
+                rollup = IndicatorRollup(
+                    indicator_id=indicator_id,
+                    dimension_key=dimension_key,
+                    period=period,
+                    period_start=period_start,
+                    value_sum=Decimal('0'),
+                    value_count=0
+                )
+                _apply_changes(rollup, bucket_added, [])
+                to_create.append(rollup)
+            elif _apply_changes(rollup, bucket_added, bucket_removed):
+                to_update.append(rollup)
+            elif rollup.value_count <= 0:
+                # Значений за период не осталось - пересчитывать нечего
+                to_delete.append(rollup.pk)
+            else:
+                stale.append(bucket)
+        
+        if stale:
+            # Итоги сжатых периодов пересчитать не по чему - остается приращение
+            compacted_before = Indicator.objects.filter(pk=indicator_id).values_list(
+                'compacted_before', flat=True
+            ).first()
+            if compacted_before is not None:
+                for bucket in [bucket for bucket in stale if bucket[1] < compacted_before]:
+                    stale.remove(bucket)
+                    rollup = existing.get(bucket)
+                    if rollup is None:
+                        continue
+                    if rollup.value_count > 0:
+                        to_update.append(rollup)
+                    else:
+                        rollup.delete()
+        
+        if to_delete:
+            IndicatorRollup.objects.filter(pk__in=to_delete).delete()
+        IndicatorRollup.objects.bulk_create(to_create, batch_size=ROLLUP_BATCH_SIZE)
+        IndicatorRollup.objects.bulk_update(to_update, ROLLUP_FIELDS, batch_size=ROLLUP_BATCH_SIZE)
+        for period, period_start, dimension_key in stale:
+            _rebuild_bucket(indicator_id, period, period_start, dimension_key)
+
+
+def _rebuild_bucket(indicator_id, period, period_start, dimension_key):
+    """Пересчитывает итог одного периода по дневным значениям"""
+    period_end = get_period_range(period_start, period)[1]
+    rows = IndicatorValue.objects.filter(
+        indicator_id=indicator_id,
+        dimension_key=dimension_key,
+        date__gte=period_start,
+        date__lte=period_end
+    ).order_by('date').values_list('indicator_id', 'dimension_key', 'date', 'value')
+    IndicatorRollup.objects.filter(
+        indicator_id=indicator_id,
+        period=period,
+        period_start=period_start,
+        dimension_key=dimension_key
+    ).delete()
+    IndicatorRollup.objects.bulk_create(list(_build_rollups(rows, periods=(period,))))
+
+
+def rebuild_rollups(indicator_ids=None, start_from=None, start_before=None):
+    """
+    Пересчитывает итоги периодов по дневным значениям.
+    
+    Итоги сжатых периодов (до Indicator.compacted_before) сохраняются.
+    Границы диапазона - начало года, чтобы периоды не резались.
+    
+    Args:
+        indicator_ids: список ID показателей или None - все показатели
+        start_from: пересчитать периоды, начинающиеся с этой даты (None - без ограничения)
+        start_before: пересчитать периоды, начинающиеся до этой даты (None - без ограничения)
+    
+    Returns:
+        int: количество построенных итогов
+    """
+    values = IndicatorValue.objects.all()
+    rollups = IndicatorRollup.objects.all()
+    compacted = Indicator.objects.filter(compacted_before__isnull=False)
+    if indicator_ids is not None:
+        values = values.filter(indicator_id__in=indicator_ids)
+        rollups = rollups.filter(indicator_id__in=indicator_ids)
+        compacted = compacted.filter(pk__in=indicator_ids)
+    if start_from is not None:
+        values = values.filter(date__gte=start_from)
+        rollups = rollups.filter(period_start__gte=start_from)
+    if start_before is not None:
+        values = values.filter(date__lt=start_before)
+        rollups = rollups.filter(period_start__lt=start_before)
+    for indicator_id, compacted_before in compacted.values_list('pk', 'compacted_before'):
+        values = values.exclude(indicator_id=indicator_id, date__lt=compacted_before)
+        rollups = rollups.exclude(indicator_id=indicator_id, period_start__lt=compacted_before)
+    
+    rows = values.order_by('indicator_id', 'dimension_key', 'date').values_list(
+        'indicator_id', 'dimension_key', 'date', 'value'
+    ).iterator(chunk_size=ROLLUP_BATCH_SIZE)
+    
+    built = 0
+    with transaction.atomic():
+        rollups.delete()
+        pending = []
+        for rollup in _build_rollups(rows):
+            pending.append(rollup)
+            if len(pending) >= ROLLUP_BATCH_SIZE:
+                IndicatorRollup.objects.bulk_create(pending)
+                built += len(pending)
+                pending = []
+        IndicatorRollup.objects.bulk_create(pending)
+        built += len(pending)
+    return built
+
+
+def get_rollup_totals(indicator_id, period, period_start, dimension_key=None):
+    """
+    Итоги показателя за период по всем разрезам или по одному разрезу.
+    
+    Args:
+        indicator_id: ID показателя
+        period: 'month', 'quarter' или 'year'
+        period_start: первый день периода
+        dimension_key: ключ разреза или None - все разрезы
+    
+    Returns:
+        dict: {'sum', 'count', 'min', 'max'} (count = 0 - значений нет)
+    """
+    rollups = IndicatorRollup.objects.filter(
+        indicator_id=indicator_id,
+        period=period,
+        period_start=period_start
+    )
+    if dimension_key is not None:
+        rollups = rollups.filter(dimension_key=dimension_key)
+    totals = rollups.aggregate(
+        sum=Sum('value_sum'),
+        count=Sum('value_count'),
+        min=Min('value_min'),
+        max=Max('value_max')
+    )
+    totals['count'] = totals['count'] or 0
+    # Агрегаты над DecimalField в SQLite приходят через float - возвращаем точность поля
+    for name in ('sum', 'min', 'max'):
+        if totals[name] is not None:
+            totals[name] = Decimal(str(totals[name])).quantize(VALUE_QUANTUM)
+    return totals
+
+
+def get_rollup_series(indicator_id, period, start_from, start_before=None):
+    """
+    Итоги показателя по периодам и разрезам.
+    
+    Args:
+        indicator_id: ID показателя
+        period: 'month', 'quarter' или 'year'
+        start_from: первый день первого периода
+        start_before: итоги периодов, начинающихся до этой даты (None - без ограничения)
+    
+    Returns:
+        list: кортежи (начало периода, ключ разреза, сумма, количество)
+    """
+    rollups = IndicatorRollup.objects.filter(
+        indicator_id=indicator_id,
+        period=period,
+        period_start__gte=start_from
+    )
+    if start_before is not None:
+        rollups = rollups.filter(period_start__lt=start_before)
+    return list(rollups.order_by('period_start').values_list(
+        'period_start', 'dimension_key', 'value_sum', 'value_count'
+    ))
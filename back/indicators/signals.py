@@ -0,0 +1,120 @@
+"""Сигналы приложения показателей"""
+from django.db.models.signals import m2m_changed, pre_delete, post_delete
+from django.dispatch import receiver
+from dictionaries.models import DictionaryItem
+from .models import IndicatorValue, IndicatorChangeLog, make_dimension_key
+from .versioning import bump_data_version
+from .stats import record_values
+
+
+def refresh_dimension_keys(values):
+    """
+    Пересчитывает ключи разреза значений по таблице связи с элементами справочников.
+    
+    Args:
+        values: QuerySet значений показателей
+    
+    Returns:
+        dict: {ID значения: ключ разреза}
+    """
+    items_by_value = {pk: [] for pk in values.values_list('pk', flat=True)}
+    links = IndicatorValue.dictionary_items.through.objects.filter(
+        indicatorvalue_id__in=list(items_by_value)
+    ).values_list('indicatorvalue_id', 'dictionaryitem_id')
+    for value_id, item_id in links:
+        items_by_value[value_id].append(item_id)
+    
+    # Одно обновление на каждый встретившийся ключ
+    keys = {value_id: make_dimension_key(item_ids) for value_id, item_ids in items_by_value.items()}
+    values_by_key = {}
+    for value_id, dimension_key in keys.items():
+        values_by_key.setdefault(dimension_key, []).append(value_id)
+    for dimension_key, value_ids in values_by_key.items():
+        IndicatorValue.objects.filter(pk__in=value_ids).update(dimension_key=dimension_key)
+    
+    return keys
+
+
+def update_dimensions(values, reset=False):
+    """
+    Пересчитывает ключи разреза значений и отмечает изменение их показателей:
+    в журнал изменений пишется удаление значения со старым ключом и изменение
+    с новым.
+    
+    Args:
+        values: QuerySet значений показателей
+        reset: клиенты должны загрузить ряды показателей заново
+    
+    Returns:
+        dict: {ID значения: новый ключ разреза}
+    """
+    old_keys = list(values.values_list('pk', 'indicator_id', 'date', 'dimension_key', 'value'))
+    keys = refresh_dimension_keys(values)
+    
+    changed = {}
+    for value_id, indicator_id, value_date, old_key, value in old_keys:
+        new_key = keys.get(value_id, '')
+        if new_key != old_key:
+            changed.setdefault(indicator_id, ([], [], [], []))
+            changed[indicator_id][0].append(value_id)
+            changed[indicator_id][1].extend([
+                (IndicatorChangeLog.OP_DELETE, value_date, old_key),
+                (IndicatorChangeLog.OP_UPDATE, value_date, new_key),
+            ])
+            changed[indicator_id][2].append((value_date, new_key, value))
+            changed[indicator_id][3].append((value_date, old_key, value))
+    
+    for indicator_id, (value_ids, changes, added, removed) in changed.items():
+        version = bump_data_version(indicator_id, reset=reset, changes=changes)
+        IndicatorValue.objects.filter(pk__in=value_ids).update(data_version=version)
+        record_values(indicator_id, added=added, removed=removed)
+    return keys
+
+
+@receiver(m2m_changed, sender=IndicatorValue.dictionary_items.through)
+def track_dimension_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Изменение разреза значения - это изменение данных показателя"""
+    if action == 'pre_clear' and reverse:
+        # После очистки связей со стороны элемента справочника значения уже не найти
+        instance._cleared_value_ids = list(
+            sender.objects.filter(dictionaryitem_id=instance.pk).values_list('indicatorvalue_id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    
+    if not reverse:
+        values = IndicatorValue.objects.filter(pk=instance.pk)
+    elif action == 'post_clear':
+        values = IndicatorValue.objects.filter(pk__in=getattr(instance, '_cleared_value_ids', []))
+    elif pk_set:
+        values = IndicatorValue.objects.filter(pk__in=pk_set)
+    else:
+        return
+    
+    keys = update_dimensions(values)
+    if not reverse:
+        instance.dimension_key = keys.get(instance.pk, '')
+
+
+@receiver(pre_delete, sender=DictionaryItem)
+def remember_item_values(sender, instance, **kwargs):
+    """Запоминает значения, связанные с удаляемым элементом справочника"""
+    instance._linked_value_ids = list(
+        IndicatorValue.dictionary_items.through.objects.filter(
+            dictionaryitem_id=instance.pk
+        ).values_list('indicatorvalue_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=DictionaryItem)
+def track_item_delete(sender, instance, **kwargs):
+    """
+    Удаление элемента справочника каскадно удаляет связи без m2m_changed:
+    пересчитываем ключи разреза значений и отмечаем изменение их показателей.
+    """
+    value_ids = getattr(instance, '_linked_value_ids', None)
+    if not value_ids:
+        return
+    # Разрез значений изменился - клиенты должны загрузить ряды заново
+    update_dimensions(IndicatorValue.objects.filter(pk__in=value_ids), reset=True)
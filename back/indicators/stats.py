@@ -0,0 +1,169 @@
+"""Сводка по значениям показателей (IndicatorStats)
+
+Количество значений, первая и последняя даты, минимум и максимум и последнее
+значение каждого разреза обновляются приращением при каждой записи значений
+(сохранение, удаление, массовая загрузка, изменение разреза). По базе
+пересчитывается только то, что приращением не восстановить: граница (дата,
+минимум или максимум), на которой стояло удаленное значение, и последнее
+значение разреза, если удалено именно оно. Массовые удаления пересчитывают
+сводку показателя целиком (см. versioning.mark_values_deleted).
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Exists, Max, Min, OuterRef
+from django.utils import timezone
+from .models import Indicator, IndicatorStats, IndicatorValue
+from .rollups import VALUE_QUANTUM, record_rollups
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _as_decimal(value):
+    # Точность поля значения: так же значение хранится в базе и читается при пересчете
+    value = value if isinstance(value, Decimal) else Decimal(str(value))
+    return value.quantize(VALUE_QUANTUM)
+
+
+def record_values(indicator_id, added=(), removed=()):
+    """
+    Обновляет сводку показателя после записи значений (вызывается после записи в базу).
+    
+    Изменение значения передается как удаление прежнего и добавление нового,
+    изменение разреза - как удаление со старым ключом и добавление с новым.
+    Вместе со сводкой обновляются итоги по периодам (см. rollups.record_rollups).
+    
+    Args:
+        indicator_id: ID показателя
+        added: список (дата, ключ разреза, значение) записанных значений
+        removed: список (дата, ключ разреза, значение) удаленных или замененных значений
+    """
+    added = [(_as_date(value_date), dimension_key, _as_decimal(value)) for value_date, dimension_key, value in added]
+    removed = [(_as_date(value_date), dimension_key, _as_decimal(value)) for value_date, dimension_key, value in removed]
+    if not added and not removed:
+        return
+    # Итоги по периодам (IndicatorRollup) меняются теми же записями
+    record_rollups(indicator_id, added=added, removed=removed)
+    
+    with transaction.atomic():
+        stats, created = IndicatorStats.objects.select_for_update().get_or_create(indicator_id=indicator_id)
+        if created:
+            # Первая запись показателя (или сводка еще не строилась) - считаем по базе
+            refresh_stats([indicator_id])
+            return
+        
+        previous = (stats.first_date, stats.last_date, stats.lowest_value, stats.highest_value)
+        latest = stats.latest_by_dimension
+        stats.values_count += len(added) - len(removed)
+        for value_date, dimension_key, value in added:
+            stats.first_date = min(filter(None, [stats.first_date, value_date]))
+            stats.last_date = max(filter(None, [stats.last_date, value_date]))
+            stats.lowest_value = value if stats.lowest_value is None else min(stats.lowest_value, value)
+            stats.highest_value = value if stats.highest_value is None else max(stats.highest_value, value)
+            entry = latest.get(dimension_key)
+            if entry is None or entry[0] <= value_date.isoformat():
+                latest[dimension_key] = [value_date.isoformat(), str(value)]
+        
+        # Удаленное значение могло быть единственным на границе: если новые
+        # значения ее не перекрывают, границы пересчитываются по базе
+        first_date, last_date, lowest_value, highest_value = previous
+        added_slots = {(value_date, dimension_key) for value_date, dimension_key, _ in added}
+        stale = stats.values_count < 0
+        stale_keys = set()
+        for value_date, dimension_key, value in removed:
+            if value_date == first_date and not any(item[0] <= value_date for item in added):
+                stale = True
+            if value_date == last_date and not any(item[0] >= value_date for item in added):
+                stale = True
+            if value == lowest_value and not any(item[2] <= value for item in added):
+                stale = True
+            if value == highest_value and not any(item[2] >= value for item in added):
+                stale = True
+            entry = latest.get(dimension_key)
+            if entry is not None and entry[0] == value_date.isoformat() and (value_date, dimension_key) not in added_slots:
+                stale_keys.add(dimension_key)
+        
+        if stale:
+            refresh_stats([indicator_id])
+            return
+        if stale_keys:
+            for dimension_key in stale_keys:
+                latest.pop(dimension_key, None)
+            values = IndicatorValue.objects.filter(indicator_id=indicator_id, dimension_key__in=stale_keys)
+            for _, dimension_key, value_date, value in _latest_values(values):
+                latest[dimension_key] = [value_date.isoformat(), str(value)]
+        stats.save()
+
+
+def refresh_stats(indicator_ids=None):
+    """
+    Пересчитывает сводку по значениям показателей по базе.
+    
+    Args:
+        indicator_ids: список ID показателей или None - все показатели
+    
+    Returns:
+        int: количество пересчитанных сводок
+    """
+    indicators = Indicator.objects.all()
+    values = IndicatorValue.objects.all()
+    if indicator_ids is not None:
+        indicators = indicators.filter(pk__in=indicator_ids)
+        values = values.filter(indicator_id__in=indicator_ids)
+    
+    totals = {
+        row['indicator_id']: row
+        for row in values.order_by().values('indicator_id').annotate(
+            values_count=Count('pk'),
+            first_date=Min('date'),
+            last_date=Max('date'),
+            lowest_value=Min('value'),
+            highest_value=Max('value')
+        )
+    }
+    latest = {}
+    for indicator_id, dimension_key, value_date, value in _latest_values(values):
+        latest.setdefault(indicator_id, {})[dimension_key] = [value_date.isoformat(), str(value)]
+    
+    now = timezone.now()
+    with transaction.atomic():
+        indicator_ids = list(indicators.values_list('pk', flat=True))
+        existing = set(IndicatorStats.objects.filter(
+            indicator_id__in=indicator_ids
+        ).values_list('indicator_id', flat=True))
+        to_update = []
+        to_create = []
+        for indicator_id in indicator_ids:
+            row = totals.get(indicator_id, {})
+            stats = IndicatorStats(
+                indicator_id=indicator_id,
+                values_count=row.get('values_count', 0),
+                first_date=row.get('first_date'),
+                last_date=row.get('last_date'),
+                lowest_value=row.get('lowest_value'),
+                highest_value=row.get('highest_value'),
+                latest_by_dimension=latest.get(indicator_id, {}),
+                updated_at=now
+            )
+            (to_update if indicator_id in existing else to_create).append(stats)
+        IndicatorStats.objects.bulk_update(to_update, [
+            'values_count', 'first_date', 'last_date', 'lowest_value', 'highest_value', 'latest_by_dimension', 'updated_at'
+        ], batch_size=500)
+        IndicatorStats.objects.bulk_create(to_create, batch_size=500)
+    return len(to_update) + len(to_create)
+
+
+def _latest_values(values):
+    """Последнее по дате значение каждого разреза: (ID показателя, ключ разреза, дата, значение)"""
+    later = IndicatorValue.objects.filter(
+        indicator_id=OuterRef('indicator_id'),
+        dimension_key=OuterRef('dimension_key'),
+        date__gt=OuterRef('date')
+    )
+    return values.order_by().filter(~Exists(later)).values_list(
+        'indicator_id', 'dimension_key', 'date', 'value'
+    ).iterator(chunk_size=2000)
@@ -0,0 +1,113 @@
+"""Статусы значений показателей относительно пороговых значений"""
+from django.db.models import Case, When, Value, IntegerField
+import numpy as np
+
+
+# Коды статусов (индекс в списке = код, хранится в IndicatorValue.status)
+STATUS_GRAY = 0
+STATUS_GREEN = 1
+STATUS_YELLOW = 2
+STATUS_RED = 3
+STATUS_CODES = ['gray', 'green', 'yellow', 'red']
+
+
+def has_thresholds(indicator):
+    """Проверяет, заданы ли у показателя все три пороговых значения"""
+    return indicator.unacceptable_value is not None and \
+        indicator.acceptable_value is not None and \
+        indicator.good_value is not None
+
+
+def classify_values(indicator, values):
+    """
+    Векторно определяет коды статусов значений (см. STATUS_CODES).
+    
+    Значения сравниваются с порогами как float одним вызовом np.searchsorted
+    вместо поштучного вызова Indicator.get_value_status.
+    
+    Args:
+        indicator: объект Indicator
+        values: последовательность чисел (None - нет значения)
+    
+    Returns:
+        np.ndarray кодов статусов (int8); для отсутствующих значений -1.
+        Если пороги не заданы - все коды STATUS_GRAY.
+    """
+    array = np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+    codes = np.full(len(array), STATUS_GRAY, dtype=np.int8)
+    
+    if has_thresholds(indicator):
+        good = float(indicator.good_value)
+        acceptable = float(indicator.acceptable_value)
+        
+        if indicator.direction == 'increasing':
+            # [acceptable, good): v < acceptable -> 0 (red), < good -> 1 (yellow), иначе 2 (green)
+            if acceptable <= good:
+                codes[:] = STATUS_RED - np.searchsorted([acceptable, good], array, side='right')
+            else:
+                codes[:] = np.where(array >= good, STATUS_GREEN,
+                                    np.where(array >= acceptable, STATUS_YELLOW, STATUS_RED))
+        else:
+            # (good, acceptable]: v <= good -> 0 (green), <= acceptable -> 1 (yellow), иначе 2 (red)
+            if good <= acceptable:
+                codes[:] = STATUS_GREEN + np.searchsorted([good, acceptable], array, side='left')
+            else:
+                codes[:] = np.where(array <= good, STATUS_GREEN,
+                                    np.where(array <= acceptable, STATUS_YELLOW, STATUS_RED))
+    
+    codes[np.isnan(array)] = -1
+    return codes
+
+
+def get_statuses(indicator, values):
+    """
+    Возвращает статусы значений строками (green/yellow/red/gray) для ответов API.
+    
+    Returns:
+        list или None, если пороговые значения не заданы
+    """
+    if not has_thresholds(indicator):
+        return None
+    return [STATUS_CODES[code] if code >= 0 else None for code in classify_values(indicator, values)]
+
+
+def get_status_code(indicator, value):
+    """Код статуса одного значения (для сохранения в IndicatorValue.status)"""
+    if value is None:
+        return STATUS_GRAY
+    return int(classify_values(indicator, [value])[0])
+
+
+def status_expression(indicator):
+    """
+    SQL-выражение кода статуса значения по порогам показателя.
+    
+    Позволяет пересчитать сохраненные статусы всех значений показателя
+    одним UPDATE без загрузки значений в Python.
+    """
+    if not has_thresholds(indicator):
+        return Value(STATUS_GRAY)
+    
+    if indicator.direction == 'increasing':
+        return Case(
+            When(value__gte=indicator.good_value, then=Value(STATUS_GREEN)),
+            When(value__gte=indicator.acceptable_value, then=Value(STATUS_YELLOW)),
+            default=Value(STATUS_RED),
+            output_field=IntegerField()
+        )
+    return Case(
+        When(value__lte=indicator.good_value, then=Value(STATUS_GREEN)),
+        When(value__lte=indicator.acceptable_value, then=Value(STATUS_YELLOW)),
+        default=Value(STATUS_RED),
+        output_field=IntegerField()
+    )
+
+
+def refresh_value_statuses(indicator):
+    """
+    Пересчитывает сохраненные статусы всех значений показателя (после изменения порогов).
+    
+    Returns:
+        int: количество обновленных значений
+    """
+    return indicator.values.update(status=status_expression(indicator))
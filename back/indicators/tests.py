@@ -1,3 +1,848 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+import time
+import warnings
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import IntegrityError, connection, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .bulk import load_values
+from .database import configure_connection
+from .generators import generate_test_values
+from dictionaries.models import Dictionary, DictionaryItem
+from indicators_project.db_routing import REPLICA_ALIAS, STICKY_COOKIE, ReplicaRoutingMiddleware, read_from_replica
+from .models import (
+    Indicator, IndicatorChangeLog, IndicatorDictionary, IndicatorRollup, IndicatorStats, IndicatorValue,
+    Unit, WriteLease
+)
+from .outbox import compact_changes, get_txn_id, purge_changes, read_changes
+from .filters import dimension_key_matches, filter_by_dictionary_items
+from .formula_parser import calculate_aggregate_value
+from .retention import compact_indicator, get_retention_cutoff
+from .rollups import ROLLUP_PERIODS, rebuild_rollups
+from .stats import refresh_stats
+from .status import STATUS_GRAY, STATUS_GREEN, STATUS_RED, STATUS_YELLOW, classify_values, get_statuses
+from .versioning import get_data_version, get_data_versions, mark_values_deleted
+from .writer import (
+    WriteBatch, WriteLeaseError, acquire_write_lease, get_lease_settings, lease_wait, release_write_lease,
+    write_batch
+)
+from visualization.utils import aggregate_by_period, aggregate_with_rollups, get_indicator_data, normalize_dictionary_filters
 
-# Create your tests here.
+
+class IndicatorTestMixin:
+    """Показатель без справочников для тестов записи значений"""
+
+    def setUp(self):
+        self.unit = Unit.objects.create(name='Штука', symbol='шт')
+        self.indicator = Indicator.objects.create(
+            name='Выпуск',
+            unit=self.unit,
+            min_value=10,
+            max_value=100
+        )
+
+
+class WriteBatchTests(IndicatorTestMixin, TestCase):
+    """Пакетная запись внутри открытой транзакции (админка, ATOMIC_REQUESTS)"""
+
+    def test_generate_inside_atomic(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                count = generate_test_values(self.indicator, date(2024, 1, 1), date(2024, 1, 31))
+        
+        self.assertEqual(count, 31)
+        self.assertEqual(IndicatorValue.objects.filter(indicator=self.indicator).count(), 31)
+        # Аренда освобождается после фиксации внешней транзакции
+        self.assertEqual(WriteLease.objects.get(name='values').owner, '')
+
+    def test_rollback_with_outer_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                generate_test_values(self.indicator, date(2024, 1, 1), date(2024, 1, 10))
+                raise RuntimeError
+        
+        self.assertFalse(IndicatorValue.objects.filter(indicator=self.indicator).exists())
+        self.assertFalse(WriteLease.objects.exclude(owner='').exists())
+
+    def test_load_values_inside_atomic(self):
+        with transaction.atomic():
+            load_values(self.indicator, [(date(2024, 1, 1), Decimal('5'), [])])
+            # Повторная загрузка в той же транзакции обновляет значение
+            load_values(self.indicator, [(date(2024, 1, 1), Decimal('7'), [])])
+        
+        value = IndicatorValue.objects.get(indicator=self.indicator)
+        self.assertEqual(value.value, Decimal('7'))
+
+    @skipUnless(connection.vendor == 'postgresql', 'загрузка через COPY есть только в PostgreSQL')
+    def test_copy_twice_in_one_transaction(self):
+        with transaction.atomic():
+            load_values(self.indicator, [(date(2024, 1, day), Decimal('5'), []) for day in range(1, 11)])
+            load_values(self.indicator, [(date(2024, 1, day), Decimal('7'), []) for day in range(5, 21)])
+        
+        values = dict(IndicatorValue.objects.filter(indicator=self.indicator).values_list('date', 'value'))
+        self.assertEqual(len(values), 20)
+        self.assertEqual(values[date(2024, 1, 4)], Decimal('5'))
+        self.assertEqual(values[date(2024, 1, 5)], Decimal('7'))
+
+    @skipUnless(connection.vendor == 'postgresql', 'загрузка через COPY есть только в PostgreSQL')
+    def test_generate_several_indicators_in_one_batch(self):
+        other = Indicator.objects.create(name='Отгрузка', unit=self.unit, min_value=10, max_value=100)
+        with write_batch('Массовая генерация данных') as batch:
+            for indicator in (self.indicator, other):
+                with transaction.atomic():
+                    generate_test_values(indicator, date(2024, 1, 1), date(2024, 1, 31))
+                batch.checkpoint()
+        
+        self.assertEqual(IndicatorValue.objects.filter(indicator=other).count(), 31)
+
+
+class WriteLeaseTests(IndicatorTestMixin, TestCase):
+    """Ожидание аренды записи, занятой другой операцией"""
+
+    def hold_lease(self):
+        WriteLease.objects.update_or_create(name='values', defaults={
+            'owner': 'Импорт из Excel:1:abcdef01',
+            'expires_at': timezone.now() + timedelta(minutes=5),
+        })
+
+    @override_settings(WRITE_LEASE_WAIT=1)
+    def test_busy_lease_in_request(self):
+        Indicator.objects.create(name='Расчет', unit=self.unit, indicator_type='aggregate', formula='[Выпуск] * 2')
+        self.hold_lease()
+        started = time.monotonic()
+        response = self.client.post(reverse('indicators:recalculate_all_aggregates'), follow=True)
+        
+        self.assertLess(time.monotonic() - started, 5)
+        messages = [str(message) for message in response.context['messages']]
+        self.assertTrue(any(message.startswith('Запись занята') for message in messages), messages)
+
+    def test_command_wait(self):
+        self.assertEqual(get_lease_settings()['wait'], settings.WRITE_LEASE_WAIT)
+        with lease_wait():
+            self.assertEqual(get_lease_settings()['wait'], settings.WRITE_LEASE_COMMAND_WAIT)
+        self.assertEqual(get_lease_settings()['wait'], settings.WRITE_LEASE_WAIT)
+        self.assertLess(settings.WRITE_LEASE_WAIT, 120)
+
+    def test_no_wait_inside_transaction(self):
+        self.hold_lease()
+        started = time.monotonic()
+        with transaction.atomic():
+            with self.assertRaises(WriteLeaseError):
+                load_values(self.indicator, [(date(2024, 1, 1), Decimal('5'), [])])
+        
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertFalse(IndicatorValue.objects.exists())
+
+
+class WriteLeaseRenewTests(TransactionTestCase):
+    """Аренда записи после шага дольше ее срока"""
+
+    def test_long_step_keeps_lease(self):
+        owner = acquire_write_lease('Загрузка')
+        batch = WriteBatch(owner)
+        batch.begin()
+        # Шаг пачки длился дольше WRITE_LEASE_TTL
+        WriteLease.objects.filter(name='values').update(expires_at=timezone.now() - timedelta(seconds=1))
+        batch.end()
+        
+        with self.assertRaises(WriteLeaseError):
+            acquire_write_lease('Другая операция', wait=0)
+        batch.begin()
+        batch.end()
+        release_write_lease(owner)
+
+
+class RetentionTests(IndicatorTestMixin, TestCase):
+    """Сжатие старых дневных значений и очистка сжатого показателя"""
+
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        load_values(self.indicator, [
+            (today - timedelta(days=days), Decimal(days % 17), []) for days in range(1000)
+        ])
+        self.indicator.daily_retention_days = 400
+        self.indicator.save()
+        compact_indicator(self.indicator, get_retention_cutoff(self.indicator))
+        self.indicator.refresh_from_db()
+
+    def test_compaction_keeps_rollups(self):
+        cutoff = self.indicator.compacted_before
+        self.assertFalse(IndicatorValue.objects.filter(indicator=self.indicator, date__lt=cutoff).exists())
+        self.assertTrue(IndicatorRollup.objects.filter(indicator=self.indicator, period_start__lt=cutoff).exists())
+        data = get_indicator_data(self.indicator, days_back=1000)
+        self.assertTrue(any(point < cutoff.isoformat() for point in data['dates']))
+
+    def test_clear_after_compaction(self):
+        self.indicator.values.all().delete()
+        mark_values_deleted([self.indicator.pk])
+        
+        self.indicator.refresh_from_db()
+        self.assertIsNone(self.indicator.compacted_before)
+        self.assertFalse(IndicatorRollup.objects.filter(indicator=self.indicator).exists())
+        for period in (None, 'month'):
+            data = get_indicator_data(self.indicator, days_back=1000, aggregation_period=period)
+            self.assertEqual(data['dates'], [])
+
+    def test_clear_command_after_compaction(self):
+        call_command('clear_indicator_values', '--noinput', stdout=io.StringIO())
+        
+        self.assertFalse(IndicatorRollup.objects.exists())
+        self.assertFalse(Indicator.objects.filter(compacted_before__isnull=False).exists())
+
+    def test_partial_delete_keeps_compacted_periods(self):
+        IndicatorValue.objects.filter(indicator=self.indicator, date=date.today()).delete()
+        mark_values_deleted([self.indicator.pk])
+        
+        self.indicator.refresh_from_db()
+        self.assertIsNotNone(self.indicator.compacted_before)
+        self.assertTrue(IndicatorRollup.objects.filter(
+            indicator=self.indicator,
+            period_start__lt=self.indicator.compacted_before
+        ).exists())
+
+
+class OutboxTransactionTests(IndicatorTestMixin, TestCase):
+    """Записи журнала изменений и идентификатор транзакции"""
+
+    def test_failed_save_leaves_no_changes(self):
+        with self.assertRaises(IntegrityError):
+            IndicatorValue(indicator=self.indicator, date=None, value=Decimal('1')).save()
+        
+        self.assertFalse(IndicatorChangeLog.objects.exists())
+
+    def test_txn_id_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                IndicatorValue.objects.create(indicator=self.indicator, date=date(2024, 1, 1), value=Decimal('1'))
+                IndicatorValue.objects.create(indicator=self.indicator, date=date(2024, 1, 2), value=Decimal('2'))
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                IndicatorValue.objects.create(indicator=self.indicator, date=date(2024, 1, 3), value=Decimal('3'))
+        
+        txn_ids = list(IndicatorChangeLog.objects.order_by('pk').values_list('txn_id', flat=True))
+        self.assertEqual(len(txn_ids), 3)
+        self.assertEqual(txn_ids[0], txn_ids[1])
+        self.assertNotEqual(txn_ids[1], txn_ids[2])
+
+    def test_txn_id_after_savepoint_rollback(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        first = get_txn_id()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                # Обработчик сброса из откаченной точки сохранения отброшен -
+                # повторный вызов регистрирует его заново
+                self.assertEqual(get_txn_id(), first)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.assertNotEqual(get_txn_id(), first)
+
+
+class ChangesApiTests(IndicatorTestMixin, TestCase):
+    """Курсор и сжатие журнала изменений (GET /indicators/api/changes/)"""
+
+    def setUp(self):
+        super().setUp()
+        self.other = Indicator.objects.create(name='Брак', unit=self.unit)
+        IndicatorValue.objects.create(indicator=self.other, date=date(2024, 1, 1), value=Decimal('2'))
+        self.value = IndicatorValue.objects.create(indicator=self.indicator, date=date(2024, 1, 1), value=Decimal('1'))
+        self.value.value = Decimal('3')
+        self.value.save()
+
+    def get_changes(self, **params):
+        response = self.client.get(reverse('indicators:api_changes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_paging(self):
+        first = self.get_changes(cursor=0, limit=2)
+        self.assertEqual([change['op'] for change in first['changes']], ['I', 'I'])
+        self.assertEqual(first['cursor'], first['changes'][-1]['seq'])
+        
+        rest = self.get_changes(cursor=first['cursor'])
+        self.assertEqual([change['op'] for change in rest['changes']], ['U'])
+        
+        done = self.get_changes(cursor=rest['cursor'])
+        self.assertEqual(done['changes'], [])
+        self.assertEqual(done['cursor'], rest['cursor'])
+
+    def test_indicator_filter_advances_cursor(self):
+        result = self.get_changes(cursor=0, ids=str(self.indicator.pk))
+        self.assertEqual({change['indicator_id'] for change in result['changes']}, {self.indicator.pk})
+        self.assertEqual(result['cursor'], IndicatorChangeLog.objects.order_by('-pk').first().pk)
+
+    def test_bad_cursor(self):
+        response = self.client.get(reverse('indicators:api_changes'), {'cursor': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_compaction_keeps_latest_change(self):
+        other_seq, inserted_seq, updated_seq = IndicatorChangeLog.objects.order_by('pk').values_list('pk', flat=True)
+        deleted = compact_changes(timezone.now() + timedelta(seconds=1))
+        self.assertEqual(deleted, 1)
+        self.assertFalse(IndicatorChangeLog.objects.filter(pk=inserted_seq).exists())
+        
+        # Свежий пропуск похож на незафиксированную транзакцию - чтение останавливается
+        with override_settings(OUTBOX_SETTLE_SECONDS=60):
+            stalled = self.get_changes(cursor=other_seq)
+        self.assertEqual(stalled['changes'], [])
+        self.assertEqual(stalled['cursor'], other_seq)
+        
+        with override_settings(OUTBOX_SETTLE_SECONDS=0):
+            settled = self.get_changes(cursor=other_seq)
+        self.assertEqual([change['seq'] for change in settled['changes']], [updated_seq])
+        self.assertEqual(settled['cursor'], updated_seq)
+
+    def test_purge_reports_oldest_seq(self):
+        last_seq = IndicatorChangeLog.objects.order_by('-pk').first().pk
+        purge_changes(timezone.now() + timedelta(seconds=1))
+        IndicatorValue.objects.create(indicator=self.indicator, date=date(2024, 1, 2), value=Decimal('4'))
+        
+        with override_settings(OUTBOX_SETTLE_SECONDS=0):
+            result = self.get_changes(cursor=1)
+        self.assertGreater(result['oldest_seq'], last_seq)
+        self.assertEqual([change['op'] for change in result['changes']], ['I'])
+
+    def test_late_commit_of_lower_id(self):
+        other_seq, inserted_seq, updated_seq = IndicatorChangeLog.objects.order_by('pk').values_list('pk', flat=True)
+        # Запись с меньшим ID еще не зафиксирована, а запись после пропуска старше OUTBOX_SETTLE_SECONDS
+        IndicatorChangeLog.objects.filter(pk=inserted_seq).delete()
+        IndicatorChangeLog.objects.update(created_at=timezone.now() - timedelta(minutes=10))
+        transaction_start = timezone.now() - timedelta(minutes=20)
+        
+        with mock.patch('indicators.outbox.get_pending_since', return_value=transaction_start):
+            stalled = self.get_changes(cursor=other_seq)
+        self.assertEqual(stalled['changes'], [])
+        self.assertEqual(stalled['cursor'], other_seq)
+        
+        IndicatorChangeLog.objects.create(
+            pk=inserted_seq, indicator=self.indicator, version=1, date=date(2024, 1, 1), op=IndicatorChangeLog.OP_INSERT
+        )
+        with mock.patch('indicators.outbox.get_pending_since', return_value=None):
+            result = self.get_changes(cursor=other_seq)
+        self.assertEqual([change['seq'] for change in result['changes']], [inserted_seq, updated_seq])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'порядок фиксации по ID нарушается только в PostgreSQL')
+class ChangesLateCommitTests(IndicatorTestMixin, TransactionTestCase):
+    """Запись журнала с меньшим ID, зафиксированная позже записи с большим"""
+
+    @override_settings(OUTBOX_SETTLE_SECONDS=0)
+    def test_late_commit_of_lower_id(self):
+        first = IndicatorChangeLog.objects.create(indicator=self.indicator, version=1)
+        inserted = threading.Event()
+        finish = threading.Event()
+        
+        def write_late():
+            try:
+                with transaction.atomic():
+                    IndicatorChangeLog.objects.create(indicator=self.indicator, version=2)
+                    inserted.set()
+                    finish.wait(10)
+            finally:
+                connection.close()
+        
+        writer = threading.Thread(target=write_late)
+        writer.start()
+        inserted.wait(10)
+        later = IndicatorChangeLog.objects.create(indicator=self.indicator, version=3)
+        
+        stalled = read_changes(cursor=first.pk)
+        finish.set()
+        writer.join()
+        self.assertEqual(stalled['changes'], [])
+        self.assertEqual(stalled['cursor'], first.pk)
+        
+        result = read_changes(cursor=first.pk)
+        self.assertEqual(len(result['changes']), 2)
+        self.assertEqual(result['cursor'], later.pk)
+
+
+class StatusTests(IndicatorTestMixin, TestCase):
+    """Статусы значений относительно порогов"""
+
+    def set_thresholds(self, direction, unacceptable, acceptable, good):
+        self.indicator.direction = direction
+        self.indicator.unacceptable_value = Decimal(unacceptable)
+        self.indicator.acceptable_value = Decimal(acceptable)
+        self.indicator.good_value = Decimal(good)
+        self.indicator.save()
+
+    def test_classify_matches_get_value_status(self):
+        values = [Decimal(v) for v in ('0', '19.99', '20', '35', '49.99', '50', '80')]
+        for thresholds in (('increasing', 10, 20, 50), ('decreasing', 50, 20, 10)):
+            with self.subTest(thresholds=thresholds):
+                self.set_thresholds(*thresholds)
+                expected = [self.indicator.get_value_status(value) for value in values]
+                self.assertEqual(get_statuses(self.indicator, values), expected)
+        self.assertEqual(list(classify_values(self.indicator, [None, 5])), [-1, STATUS_GREEN])
+
+    def test_without_thresholds(self):
+        self.assertIsNone(get_statuses(self.indicator, [1, 2]))
+        self.assertEqual(list(classify_values(self.indicator, [1, None])), [STATUS_GRAY, -1])
+
+    def test_stored_on_write(self):
+        self.set_thresholds('increasing', 10, 20, 50)
+        value = IndicatorValue.objects.create(indicator=self.indicator, date=date(2024, 1, 1), value=Decimal(60))
+        load_values(self.indicator, [(date(2024, 1, 2), Decimal(30), []), (date(2024, 1, 3), Decimal(5), [])])
+        
+        self.assertEqual(
+            list(self.indicator.values.order_by('date').values_list('status', flat=True)),
+            [STATUS_GREEN, STATUS_YELLOW, STATUS_RED]
+        )
+        value.value = Decimal(1)
+        value.save()
+        value.refresh_from_db()
+        self.assertEqual(value.status, STATUS_RED)
+
+    def test_recomputed_on_threshold_change(self):
+        self.set_thresholds('increasing', 10, 20, 50)
+        load_values(self.indicator, [(date(2024, 1, 1), Decimal(30), []), (date(2024, 1, 2), Decimal(60), [])])
+        version, reset_version = get_data_version(self.indicator.pk)
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.set_thresholds('decreasing', 50, 40, 35)
+        
+        # Статусы всех значений пересчитываются одним UPDATE
+        table = IndicatorValue._meta.db_table
+        updates = [query['sql'] for query in queries if query['sql'].startswith(f'UPDATE "{table}"')]
+        self.assertEqual(len(updates), 1)
+        
+        self.assertEqual(
+            list(self.indicator.values.order_by('date').values_list('status', flat=True)),
+            [STATUS_GREEN, STATUS_RED]
+        )
+        # Клиенты перезагружают ряды целиком: статусы в них устарели
+        new_version, new_reset_version = get_data_version(self.indicator.pk)
+        self.assertGreater(new_reset_version, reset_version)
+        self.assertGreater(new_version, version)
+
+
+class DimensionTestMixin(IndicatorTestMixin):
+    """Показатель в разрезе справочника"""
+
+    def setUp(self):
+        super().setUp()
+        dictionary = Dictionary.objects.create(name='Заводы', code='factories')
+        self.items = [DictionaryItem.objects.create(dictionary=dictionary, name=f'Завод {i}') for i in range(2)]
+        IndicatorDictionary.objects.create(indicator=self.indicator, dictionary=dictionary)
+
+    def create_value(self, value_date, value, items=()):
+        value_obj = IndicatorValue.objects.create(indicator=self.indicator, date=value_date, value=Decimal(value))
+        if items:
+            value_obj.dictionary_items.set(items)
+        return value_obj
+
+
+class DictionaryFilterTests(DimensionTestMixin, TestCase):
+    """Фильтры по справочникам (EXISTS по таблице связи)"""
+
+    def setUp(self):
+        super().setUp()
+        regions = Dictionary.objects.create(name='Регионы', code='regions')
+        IndicatorDictionary.objects.create(indicator=self.indicator, dictionary=regions)
+        self.regions = [DictionaryItem.objects.create(dictionary=regions, name=name) for name in ('Север', 'Юг')]
+        self.dictionaries = (self.items[0].dictionary_id, regions.pk)
+        day = date(2024, 1, 1)
+        self.values = {
+            'factory0_north': self.create_value(day, 1, [self.items[0], self.regions[0]]),
+            'factory0_south': self.create_value(day, 2, [self.items[0], self.regions[1]]),
+            'factory1_north': self.create_value(day, 3, [self.items[1], self.regions[0]]),
+            # Значение с двумя элементами одного справочника не должно дублироваться
+            'both_factories': self.create_value(day, 4, [self.items[0], self.items[1]]),
+        }
+
+    def filtered(self, filters):
+        values = filter_by_dictionary_items(self.indicator.values.all(), normalize_dictionary_filters(filters))
+        return sorted(values.values_list('value', flat=True))
+
+    def test_any_item_of_each_dictionary(self):
+        factories, regions = self.dictionaries
+        all_items = [item.pk for item in self.items]
+        self.assertEqual(self.filtered({factories: all_items}), [1, 2, 3, 4])
+        self.assertEqual(self.filtered({factories: [self.items[0].pk]}), [1, 2, 4])
+        self.assertEqual(self.filtered({factories: all_items, regions: [self.regions[0].pk]}), [1, 3])
+        self.assertEqual(self.filtered({factories: [self.items[1].pk], regions: [self.regions[1].pk]}), [])
+
+    def test_empty_filters_ignored(self):
+        factories, regions = self.dictionaries
+        self.assertEqual(self.filtered({}), [1, 2, 3, 4])
+        self.assertEqual(self.filtered({factories: [], regions: ['x']}), [1, 2, 3, 4])
+
+    def test_no_distinct(self):
+        factories, regions = self.dictionaries
+        values = filter_by_dictionary_items(
+            self.indicator.values.all(), {factories: [item.pk for item in self.items], regions: [self.regions[0].pk]}
+        )
+        sql = str(values.query).upper()
+        self.assertNotIn('DISTINCT', sql)
+        self.assertEqual(sql.count('EXISTS'), 2)
+
+    def test_dimension_key_matches_query(self):
+        factories, regions = self.dictionaries
+        for filters in ({factories: [self.items[0].pk]}, {factories: [self.items[1].pk], regions: [self.regions[0].pk]}):
+            with self.subTest(filters=filters):
+                matched = sorted(
+                    float(value.value) for value in self.values.values()
+                    if dimension_key_matches(value.dimension_key, filters)
+                )
+                self.assertEqual(matched, [float(value) for value in self.filtered(filters)])
+
+
+class DataVersionTests(DimensionTestMixin, TestCase):
+    """Версии данных на путях массовой и каскадной записи"""
+
+    def setUp(self):
+        super().setUp()
+        self.values = [
+            self.create_value(date(2024, 1, 1), 1, [self.items[0]]),
+            self.create_value(date(2024, 1, 2), 2, [self.items[0], self.items[1]]),
+            self.create_value(date(2024, 1, 3), 3, [self.items[1]]),
+        ]
+        self.version = get_data_version(self.indicator.pk)
+
+    def assertReset(self):
+        version, reset_version = get_data_version(self.indicator.pk)
+        self.assertGreater(version, self.version[0])
+        self.assertEqual(reset_version, version)
+
+    def keys(self):
+        return list(self.indicator.values.order_by('date').values_list('dimension_key', flat=True))
+
+    def test_admin_bulk_delete(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:indicators_indicatorvalue_changelist'), {
+            'action': 'delete_selected',
+            '_selected_action': [self.values[0].pk, self.values[2].pk],
+            'post': 'yes',
+        })
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.indicator.values.count(), 1)
+        self.assertReset()
+        # В журнал записано удаление каждого значения
+        deleted = IndicatorChangeLog.objects.filter(
+            indicator=self.indicator, op=IndicatorChangeLog.OP_DELETE, reset=True
+        ).values_list('date', flat=True)
+        self.assertEqual(sorted(deleted), [date(2024, 1, 1), date(2024, 1, 3)])
+
+    def test_dictionary_item_delete(self):
+        self.items[0].delete()
+        
+        self.assertEqual(self.keys(), ['', str(self.items[1].pk), str(self.items[1].pk)])
+        self.assertReset()
+
+    def test_reverse_clear(self):
+        self.items[1].indicatorvalue_set.clear()
+        
+        self.assertEqual(self.keys(), [str(self.items[0].pk), str(self.items[0].pk), ''])
+        self.assertGreater(get_data_version(self.indicator.pk)[0], self.version[0])
+
+    def test_versions_of_several_indicators(self):
+        other = Indicator.objects.create(name='Брак', unit=self.unit)
+        with self.assertNumQueries(1):
+            versions = get_data_versions([self.indicator.pk, other.pk])
+        self.assertEqual(versions, {self.indicator.pk: self.version, other.pk: (0, 0)})
+        
+        url = reverse('visualization:api_data_versions')
+        response = self.client.get(url, {'ids': f'{self.indicator.pk},{other.pk}'}).json()
+        self.assertEqual(response['versions'][str(other.pk)], {'version': 0, 'reset_version': 0})
+        self.assertEqual(response['versions'][str(self.indicator.pk)]['version'], self.version[0])
+        self.assertEqual(self.client.get(url, {'ids': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+
+class StatsTests(DimensionTestMixin, TestCase):
+    """Сводка по значениям (IndicatorStats) при записи совпадает с пересчетом по базе"""
+
+    def assertStatsRebuilt(self):
+        fields = ['values_count', 'first_date', 'last_date', 'lowest_value', 'highest_value', 'latest_by_dimension']
+        incremental = IndicatorStats.objects.filter(indicator=self.indicator).values(*fields).get()
+        refresh_stats([self.indicator.pk])
+        rebuilt = IndicatorStats.objects.filter(indicator=self.indicator).values(*fields).get()
+        self.assertEqual(incremental, rebuilt)
+
+    def test_write_paths(self):
+        first = self.create_value(date(2024, 1, 1), '10', [self.items[0]])
+        self.assertStatsRebuilt()
+        last = self.create_value(date(2024, 1, 5), '50', [self.items[1]])
+        self.create_value(date(2024, 1, 3), '30', [self.items[0]])
+        self.assertStatsRebuilt()
+        
+        # Изменение значения, державшего минимум
+        first.value = Decimal('40')
+        first.save()
+        self.assertStatsRebuilt()
+        
+        # Перенос последней даты назад
+        last.date = date(2024, 1, 2)
+        last.save()
+        self.assertStatsRebuilt()
+        
+        # Удаление элемента справочника меняет разрез
+        last.dictionary_items.remove(self.items[1])
+        self.assertStatsRebuilt()
+        
+        first.delete()
+        self.assertStatsRebuilt()
+        
+        load_values(self.indicator, [
+            (date(2024, 1, 3), Decimal('5'), [self.items[0].pk]),
+            (date(2024, 2, 1), Decimal('70'), [self.items[1].pk]),
+        ])
+        self.assertStatsRebuilt()
+
+    def test_single_save_query_count(self):
+        self.create_value(date(2024, 1, 1), '10', [self.items[0]])
+        # Значение с разрезом: запись, версия, журнал, сводка, итоги и смена разреза
+        with self.assertNumQueries(39):
+            self.create_value(date(2024, 1, 2), '20', [self.items[1]])
+
+
+class CompactedFormulaTests(DimensionTestMixin, TestCase):
+    """Функции формул за день до и после сжатия значений с несколькими разрезами"""
+
+    def setUp(self):
+        super().setUp()
+        load_values(self.indicator, [
+            (date(2020, 3, day), value, [item.pk])
+            for day in range(1, 32)
+            for item, value in zip(self.items, (Decimal('40'), Decimal('70')))
+        ])
+
+    def calculate(self, formula, target_date=date(2020, 3, 15)):
+        aggregate = Indicator.objects.create(
+            name=f'Расчет {Indicator.objects.count()}',
+            unit=self.unit,
+            indicator_type='aggregate',
+            formula=formula
+        )
+        return calculate_aggregate_value(aggregate, target_date)
+
+    def test_day_functions_survive_compaction(self):
+        formulas = {
+            "SUM([Выпуск], 'day')": Decimal('110'),
+            "COUNT([Выпуск], 'day')": Decimal('2'),
+            "AVG([Выпуск], 'day')": Decimal('55'),
+            "MAX([Выпуск], 'day')": Decimal('70'),
+            "CUMULATIVE([Выпуск], 'day')": Decimal('110'),
+            "SUM([Выпуск], 'month')": Decimal('3410'),
+        }
+        before = {formula: self.calculate(formula) for formula in formulas}
+        compact_indicator(self.indicator, date(2021, 1, 1))
+        self.assertFalse(IndicatorValue.objects.filter(indicator=self.indicator).exists())
+        after = {formula: self.calculate(formula) for formula in formulas}
+        
+        self.assertEqual(before, formulas)
+        self.assertEqual(after, formulas)
+
+
+class RollupTests(DimensionTestMixin, TestCase):
+    """Итоги по периодам (IndicatorRollup) совпадают с агрегацией дневных значений"""
+
+    def setUp(self):
+        super().setUp()
+        start = date(2023, 1, 1)
+        rows = []
+        for days in range(730):
+            for position, items in enumerate(([], [self.items[0].pk], [self.items[1].pk])):
+                if (days + position) % 4:
+                    rows.append((start + timedelta(days=days), Decimal((days * 7 + position * 13) % 101) / 4, items))
+        load_values(self.indicator, rows)
+
+    def get_rollups(self):
+        return sorted(IndicatorRollup.objects.filter(indicator=self.indicator).values_list(
+            'dimension_key', 'period', 'period_start', 'value_sum', 'value_count',
+            'value_min', 'value_max', 'last_date', 'last_value'
+        ))
+
+    def assertRollupsRebuilt(self):
+        incremental = self.get_rollups()
+        rebuild_rollups([self.indicator.pk])
+        self.assertEqual(incremental, self.get_rollups())
+
+    def test_matches_daily_aggregation(self):
+        filters_options = [None, {str(self.items[0].dictionary_id): [self.items[1].pk]}]
+        starts = [date(2023, 1, 1), date(2023, 2, 15), date(2023, 4, 1), date(2023, 11, 20)]
+        ends = [None, date(2024, 6, 30), date(2024, 8, 10), date(2024, 12, 31)]
+        for period in ROLLUP_PERIODS:
+            for start_date in starts:
+                for end_date in ends:
+                    for filters in filters_options:
+                        with self.subTest(period=period, start=start_date, end=end_date, filters=filters):
+                            values = IndicatorValue.objects.filter(indicator=self.indicator, date__gte=start_date)
+                            if end_date:
+                                values = values.filter(date__lte=end_date)
+                            values = filter_by_dictionary_items(values, normalize_dictionary_filters(filters))
+                            expected = aggregate_by_period(list(values.order_by('date')), period)
+                            actual = aggregate_with_rollups(self.indicator, period, start_date, end_date, filters)
+                            
+                            self.assertEqual([item['date'] for item in actual], [item['date'] for item in expected])
+                            self.assertEqual([item['count'] for item in actual], [item['count'] for item in expected])
+                            for got, want in zip(actual, expected):
+                                self.assertAlmostEqual(got['value'], want['value'], places=9)
+
+    def test_write_paths(self):
+        self.assertRollupsRebuilt()
+        value = IndicatorValue.objects.filter(indicator=self.indicator, dimension_key='').order_by('-date').first()
+        
+        # Новый минимум, затем снятие минимума
+        value.value = Decimal('-1')
+        value.save()
+        self.assertRollupsRebuilt()
+        value.value = Decimal('10')
+        value.save()
+        self.assertRollupsRebuilt()
+        
+        # Перенос в другой квартал и смена разреза
+        value.date = date(2023, 5, 5)
+        value.save()
+        self.assertRollupsRebuilt()
+        value.dictionary_items.set([self.items[0]])
+        self.assertRollupsRebuilt()
+        
+        value.delete()
+        self.assertRollupsRebuilt()
+        
+        # Единственное значение периода
+        single = self.create_value(date(2025, 3, 3), '7')
+        self.assertRollupsRebuilt()
+        single.delete()
+        self.assertRollupsRebuilt()
+        self.assertFalse(IndicatorRollup.objects.filter(indicator=self.indicator, period_start__year=2025).exists())
+
+
+REPLICA_DATABASES = {**settings.DATABASES, 'replica': settings.DATABASES['default']}
+
+
+class ReplicaRoutingTests(IndicatorTestMixin, TestCase):
+    """Чтение с реплики и закрепление чтений за основной базой после записи"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Реплика в тестах - та же база, подключение к ней не открывается
+        warnings.filterwarnings('ignore', 'Overriding setting DATABASES', UserWarning)
+
+    def request(self, write=None, method='get', cookies=None):
+        """Выполняет помеченное read_from_replica представление через ReplicaRoutingMiddleware"""
+        seen = {}
+        
+        @read_from_replica
+        def view(request):
+            seen['before'] = router.db_for_read(Indicator)
+            seen['auth'] = router.db_for_read(User)
+            if write:
+                write()
+            seen['after'] = router.db_for_read(Indicator)
+            return HttpResponse()
+        
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    @override_settings(DATABASES=REPLICA_DATABASES)
+    def test_reads_from_replica(self):
+        seen, response = self.request()
+        self.assertEqual(seen['before'], REPLICA_ALIAS)
+        self.assertEqual(seen['auth'], 'default')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        
+        # Записи всегда идут в основную базу
+        self.assertEqual(router.db_for_write(Indicator), 'default')
+
+    @override_settings(DATABASES=REPLICA_DATABASES, REPLICA_STICKY_SECONDS=10)
+    def test_data_write_is_sticky(self):
+        seen, response = self.request(
+            write=lambda: IndicatorValue.objects.create(indicator=self.indicator, date=date(2024, 1, 1), value=Decimal('1'))
+        )
+        self.assertEqual(seen['before'], REPLICA_ALIAS)
+        self.assertEqual(seen['after'], 'default')
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        
+        seen, _ = self.request(cookies={STICKY_COOKIE: response.cookies[STICKY_COOKIE].value})
+        self.assertEqual(seen['before'], 'default')
+
+    @override_settings(DATABASES=REPLICA_DATABASES)
+    def test_session_write_is_not_sticky(self):
+        user = User.objects.create_user('user', password='user')
+        seen, response = self.request(
+            write=lambda: User.objects.filter(pk=user.pk).update(last_login=timezone.now()),
+            method='post'
+        )
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        
+        seen, _ = self.request(write=lambda: Session.objects.create(
+            session_key='k' * 32, session_data='', expire_date=timezone.now()
+        ))
+        self.assertEqual(seen['after'], REPLICA_ALIAS)
+
+    def test_without_replica(self):
+        self.assertNotIn(REPLICA_ALIAS, settings.DATABASES)
+        seen, response = self.request(
+            write=lambda: Unit.objects.create(name='Килограмм', symbol='кг')
+        )
+        self.assertEqual(seen['before'], 'default')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+
+class SqlitePragmaTests(TestCase):
+    """Параметры PRAGMA новых соединений SQLite (обработчик connection_created)"""
+
+    def open_connection(self):
+        """Открывает новое соединение SQLite к файлу во временном каталоге"""
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+            'OPTIONS': {},
+        }, 'pragmas')
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def get_pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_TUNING_ENABLED=True, SQLITE_PRAGMAS={'journal_mode': 'WAL', 'busy_timeout': 5000})
+    def test_new_connection(self):
+        wrapper = self.open_connection()
+        self.assertEqual(self.get_pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.get_pragma(wrapper, 'busy_timeout'), 5000)
+
+    @override_settings(SQLITE_TUNING_ENABLED=False)
+    def test_disabled(self):
+        wrapper = self.open_connection()
+        self.assertEqual(self.get_pragma(wrapper, 'journal_mode'), 'delete')
+
+    @override_settings(SQLITE_TUNING_ENABLED=True)
+    def test_other_backends_untouched(self):
+        class OtherConnection:
+            vendor = 'postgresql'
+            
+            def cursor(self):
+                raise AssertionError('PRAGMA применяется только к SQLite')
+        
+        configure_connection(sender=None, connection=OtherConnection())
@@ -25,5 +25,6 @@ urlpatterns = [
     path('clear-data/', views.clear_data, name='clear_data'),
     path('<int:pk>/save-dictionaries/', views.save_indicator_dictionaries, name='save_indicator_dictionaries'),
     path('dictionaries/<int:dictionary_id>/items/', views.get_dictionary_items, name='get_dictionary_items'),
+    path('api/changes/', views.api_changes, name='api_changes'),
 ]
 
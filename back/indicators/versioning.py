@@ -0,0 +1,147 @@
+"""Версии данных показателей для кэширования и инкрементальной загрузки"""
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from .models import Indicator, IndicatorDataVersion, IndicatorChangeLog, IndicatorRollup, IndicatorValue
+from .outbox import get_txn_id, OUTBOX_BATCH_SIZE
+from .rollups import rebuild_rollups
+from .stats import refresh_stats
+
+
+def bump_data_version(indicator_id, reset=False, value_date=None, op=IndicatorChangeLog.OP_UPDATE,
+                      dimension_key='', changes=None):
+    """
+    Атомарно увеличивает версию данных показателя и записывает изменения в журнал (outbox).
+    
+    Args:
+        indicator_id: ID показателя
+        reset: True, если значения удалялись - клиенты с более ранней версией
+               должны перезагрузить данные целиком
+        value_date: дата измененного значения (None - изменение всех значений)
+        op: операция (IndicatorChangeLog.OP_*)
+        dimension_key: ключ разреза измененного значения
+        changes: список (операция, дата, ключ разреза) - несколько записей журнала
+                 с одной версией вместо одной записи из op/value_date/dimension_key
+    
+    Returns:
+        int: Новая версия данных показателя
+    """
+    updates = {'version': F('version') + 1, 'updated_at': timezone.now()}
+    if reset:
+        updates['reset_version'] = F('version') + 1
+    if changes is None:
+        changes = [(op, value_date, dimension_key)]
+    
+    with transaction.atomic():
+        updated = IndicatorDataVersion.objects.filter(indicator_id=indicator_id).update(**updates)
+        if not updated:
+            IndicatorDataVersion.objects.get_or_create(indicator_id=indicator_id)
+            IndicatorDataVersion.objects.filter(indicator_id=indicator_id).update(**updates)
+        version = IndicatorDataVersion.objects.values_list('version', flat=True).get(indicator_id=indicator_id)
+        txn_id = get_txn_id()
+        IndicatorChangeLog.objects.bulk_create([
+            IndicatorChangeLog(
+                indicator_id=indicator_id,
+                version=version,
+                date=change_date,
+                dimension_key=change_key,
+                op=change_op,
+                reset=reset,
+                txn_id=txn_id
+            )
+            for change_op, change_date, change_key in changes
+        ], batch_size=OUTBOX_BATCH_SIZE)
+    return version
+
+
+def mark_values_deleted(indicator_ids=None, deleted=None):
+    """
+    Отмечает массовое удаление значений (QuerySet.delete() не вызывает delete() модели).
+    
+    Показатель, у которого не осталось дневных значений, считается очищенным
+    целиком: итоги его сжатых периодов (см. retention) удаляются, граница
+    сжатия сбрасывается.
+    
+    Args:
+        indicator_ids: список ID показателей или None - для всех показателей;
+                       в журнал пишется удаление всех значений показателя
+        deleted: список (ID показателя, дата, ключ разреза) удаленных значений -
+                 если известен, в журнал пишется каждое значение
+    """
+    deleted_by_indicator = {}
+    if deleted is not None:
+        for indicator_id, value_date, dimension_key in deleted:
+            deleted_by_indicator.setdefault(indicator_id, []).append(
+                (IndicatorChangeLog.OP_DELETE, value_date, dimension_key)
+            )
+        indicator_ids = list(deleted_by_indicator)
+    
+    versions = IndicatorDataVersion.objects.all()
+    if indicator_ids is not None:
+        versions = versions.filter(indicator_id__in=indicator_ids)
+    
+    with transaction.atomic():
+        versions.update(
+            version=F('version') + 1,
+            reset_version=F('version') + 1,
+            updated_at=timezone.now()
+        )
+        txn_id = get_txn_id()
+        IndicatorChangeLog.objects.bulk_create([
+            IndicatorChangeLog(
+                indicator_id=indicator_id,
+                version=version,
+                date=change_date,
+                dimension_key=change_key,
+                op=change_op,
+                reset=True,
+                txn_id=txn_id
+            )
+            for indicator_id, version in versions.values_list('indicator_id', 'version')
+            for change_op, change_date, change_key in deleted_by_indicator.get(
+                indicator_id, [(IndicatorChangeLog.OP_DELETE, None, '')]
+            )
+        ], batch_size=OUTBOX_BATCH_SIZE)
+        cleared = Indicator.objects.filter(compacted_before__isnull=False).exclude(
+            Exists(IndicatorValue.objects.filter(indicator_id=OuterRef('pk')))
+        )
+        if indicator_ids is not None:
+            cleared = cleared.filter(pk__in=indicator_ids)
+        cleared_ids = list(cleared.values_list('pk', flat=True))
+        if cleared_ids:
+            IndicatorRollup.objects.filter(indicator_id__in=cleared_ids).delete()
+            Indicator.objects.filter(pk__in=cleared_ids).update(compacted_before=None)
+        
+        # Сводка и итоги по периодам пересчитываются: удаленные значения неизвестны
+        refresh_stats(indicator_ids)
+        rebuild_rollups(indicator_ids)
+
+
+def get_data_version(indicator_id):
+    """
+    Возвращает текущую версию данных показателя одним индексным запросом.
+    
+    Returns:
+        tuple: (version, reset_version) или None, если данных еще не было
+    """
+    return IndicatorDataVersion.objects.filter(
+        indicator_id=indicator_id
+    ).values_list('version', 'reset_version').first()
+
+
+def get_data_versions(indicator_ids):
+    """
+    Возвращает версии данных нескольких показателей одним запросом.
+    
+    Args:
+        indicator_ids: список ID показателей
+    
+    Returns:
+        dict: {ID показателя: (version, reset_version)}; показатели без данных - (0, 0)
+    """
+    versions = {indicator_id: (0, 0) for indicator_id in indicator_ids}
+    for indicator_id, version, reset_version in IndicatorDataVersion.objects.filter(
+        indicator_id__in=list(versions)
+    ).values_list('indicator_id', 'version', 'reset_version'):
+        versions[indicator_id] = (version, reset_version)
+    return versions
@@ -7,20 +7,32 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ValidationError
 import json
+import logging
 from decimal import Decimal
 from .models import Unit, Indicator, IndicatorValue, ImportTemplate, UserDictionaryFilter
 from .generators import generate_test_values
 from .formula_parser import parse_formula, validate_formula_dependencies, calculate_aggregate_value, parse_aggregation_functions, parse_prev_functions
 from .excel_parser import parse_indicators_from_excel
+from .filters import filter_by_dictionary_items
+from .cumulative import with_cumulative
+from .versioning import mark_values_deleted
+from .outbox import read_changes
+from .writer import write_batch, WriteLeaseError
+from indicators_project.db_routing import read_from_replica
+from django.db import transaction
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from datetime import date, timedelta
 from dateutil.relativedelta import relativedelta
 
 
+logger = logging.getLogger(__name__)
+
+
 def index(request):
     """Главная страница - реестр показателей"""
-    indicators = Indicator.objects.all().select_related('unit').order_by('-created_at')
+    # Количество значений и последнее значение - из сводки (IndicatorStats) одним JOIN
+    indicators = Indicator.objects.all().select_related('unit', 'stats').order_by('-created_at')
     
     # Поиск
     search_query = request.GET.get('search', '')
@@ -49,6 +61,7 @@ def index(request):
     return render(request, 'indicators/index.html', context)
 
 
+@read_from_replica
 def indicator_detail(request, pk):
     """Детальная страница показателя"""
     from dictionaries.models import Dictionary, DictionaryItem
@@ -61,11 +74,14 @@ def indicator_detail(request, pk):
     
     # Применяем фильтры пользователя (только если есть фильтры)
     if request.user.is_authenticated:
-        user_filters = UserDictionaryFilter.objects.filter(user=request.user, is_required=True)
-        for user_filter in user_filters:
-            # Фильтруем значения по обязательным фильтрам только если есть элементы в фильтре
-            if user_filter.items.exists():
-                values_query = values_query.filter(dictionary_items__in=user_filter.items.all())
+        user_filters = UserDictionaryFilter.objects.filter(
+            user=request.user, is_required=True
+        ).prefetch_related('items')
+        # Фильтруем значения по обязательным фильтрам только если есть элементы в фильтре
+        values_query = filter_by_dictionary_items(values_query, {
+            user_filter.dictionary_id: [item.id for item in user_filter.items.all()]
+            for user_filter in user_filters
+        })
     
     # Применяем фильтры по датам из GET-параметров
     start_date_filter = request.GET.get('start_date')
@@ -103,55 +119,25 @@ def indicator_detail(request, pk):
             except (ValueError, TypeError):
                 pass
     
-    # Применяем фильтры: для каждого справочника фильтруем по выбранным элементам
-    if selected_items_by_dict:
-        # Собираем все выбранные ID элементов
-        all_selected_item_ids = []
-        for item_ids in selected_items_by_dict.values():
-            all_selected_item_ids.extend(item_ids)
-        
-        if all_selected_item_ids:
-            # Фильтруем значения, которые содержат хотя бы один из выбранных элементов
-            # Но нужно учесть, что если выбраны элементы из разных справочников,
-            # то значение должно содержать хотя бы один элемент из каждого выбранного справочника
-            for dict_id, item_ids in selected_items_by_dict.items():
-                values_query = values_query.filter(dictionary_items__id__in=item_ids)
-    
-    # distinct() должен быть вызван до среза
-    values = values_query.order_by('-date').distinct()[:100]
+    # Применяем фильтры: значение должно содержать хотя бы один выбранный элемент
+    # каждого справочника (по одному EXISTS-подзапросу на справочник, без DISTINCT)
+    values_query = filter_by_dictionary_items(values_query, selected_items_by_dict)
     
     # Проверяем, нужно ли показать нарастающим итогом
     show_cumulative = request.GET.get('cumulative') == 'true'
     
+    # Нарастающий итог считается отдельно для каждой комбинации справочников
+    # оконной функцией в том же запросе, что и выборка значений
+    if show_cumulative:
+        values_query = with_cumulative(values_query)
+    
+    values = values_query.order_by('-date')[:100]
+    
     if show_cumulative and values:
-        # Вычисляем нарастающий итог для каждого значения
-        # Важно: нарастающий итог должен считаться отдельно для каждой комбинации справочников
-        from decimal import Decimal
-        from collections import defaultdict
-        
-        # Группируем значения по комбинации справочников
-        values_by_dimension = defaultdict(list)
-        for value in values:
-            # Создаем ключ из отсортированных ID элементов справочников
-            dimension_key = tuple(sorted(value.dictionary_items.values_list('id', flat=True)))
-            values_by_dimension[dimension_key].append(value)
-        
-        # Вычисляем нарастающий итог для каждой группы
-        cumulative_values = []
-        for dimension_key, dimension_values in values_by_dimension.items():
-            # Сортируем значения по дате (от старых к новым) для правильного накопления
-            sorted_values = sorted(dimension_values, key=lambda v: v.date)
-            cumulative_sum = Decimal('0')
-            
-            for value in sorted_values:
-                cumulative_sum += value.value
-                cumulative_values.append({
-                    'value_obj': value,
-                    'cumulative_value': cumulative_sum
-                })
-        
-        # Сортируем итоговый список по дате (от новых к старым) для отображения
-        cumulative_values.sort(key=lambda x: x['value_obj'].date, reverse=True)
+        cumulative_values = [
+            {'value_obj': value, 'cumulative_value': value.cumulative_value}
+            for value in values
+        ]
     else:
         cumulative_values = None
     
@@ -616,64 +602,69 @@ def calculate_aggregate_values(request, pk):
         error_count = 0
         errors = []
         
-        for target_date in dates_to_calculate:
-            for dict_items_tuple in dictionary_combinations:
-                try:
-                    # Рассчитываем значение с учетом разреза
-                    target_dimension_items = list(dict_items_tuple) if dict_items_tuple else None
-                    calculated_value = calculate_aggregate_value(indicator, target_date, target_dimension_items=target_dimension_items)
-                    
-                    # Получаем множество ID элементов справочников для проверки уникальности
-                    dict_items_set = set(item.id for item in dict_items_tuple) if dict_items_tuple else set()
-                    
-                    # Ищем существующее значение с такой же комбинацией справочников
-                    existing_values = IndicatorValue.objects.filter(
-                        indicator=indicator,
-                        date=target_date
-                    ).prefetch_related('dictionary_items')
-                    
-                    value_obj = None
-                    for existing_value in existing_values:
-                        existing_items_set = set(item.id for item in existing_value.dictionary_items.all())
-                        if existing_items_set == dict_items_set:
-                            value_obj = existing_value
-                            break
-                    
-                    # Если не нашли, создаем новое значение
-                    if value_obj is None:
-                        value_obj = IndicatorValue.objects.create(
-                            indicator=indicator,
-                            date=target_date,
-                            value=calculated_value
-                        )
-                    else:
-                        # Обновляем существующее значение
-                        value_obj.value = calculated_value
-                        value_obj.save()
-                    
-                    # Устанавливаем элементы справочников
-                    if dict_items_tuple:
-                        value_obj.dictionary_items.set(dict_items_tuple)
-                    else:
-                        value_obj.dictionary_items.clear()
-                    
-                    calculated_count += 1
-                except ValueError as e:
-                    error_count += 1
-                    dimension_str = f" ({', '.join([str(item) for item in dict_items_tuple])})" if dict_items_tuple else ""
-                    error_msg = f"{target_date.strftime('%d.%m.%Y')}{dimension_str}: {str(e)}"
-                    errors.append(error_msg)
-                    # Логируем для отладки
-                    print(f"[ERROR] {error_msg}")
-                except Exception as e:
-                    error_count += 1
-                    dimension_str = f" ({', '.join([str(item) for item in dict_items_tuple])})" if dict_items_tuple else ""
-                    error_msg = f"{target_date.strftime('%d.%m.%Y')}{dimension_str}: {str(e)}"
-                    errors.append(error_msg)
-                    # Логируем для отладки
-                    print(f"[ERROR] {error_msg}")
-                    import traceback
-                    traceback.print_exc()
+        # Запись пачками под арендой (см. indicators.writer)
+        try:
+            with write_batch(f'Расчет: {indicator.name}') as batch:
+                for target_date in dates_to_calculate:
+                    for dict_items_tuple in dictionary_combinations:
+                        try:
+                            # Рассчитываем значение с учетом разреза
+                            target_dimension_items = list(dict_items_tuple) if dict_items_tuple else None
+                            calculated_value = calculate_aggregate_value(indicator, target_date, target_dimension_items=target_dimension_items)
+                            
+                            # Точка сохранения: ошибка одной строки не прерывает транзакцию пачки
+                            with transaction.atomic():
+                                # Получаем множество ID элементов справочников для проверки уникальности
+                                dict_items_set = set(item.id for item in dict_items_tuple) if dict_items_tuple else set()
+                                
+                                # Ищем существующее значение с такой же комбинацией справочников
+                                existing_values = IndicatorValue.objects.filter(
+                                    indicator=indicator,
+                                    date=target_date
+                                ).prefetch_related('dictionary_items')
+                                
+                                value_obj = None
+                                for existing_value in existing_values:
+                                    existing_items_set = set(item.id for item in existing_value.dictionary_items.all())
+                                    if existing_items_set == dict_items_set:
+                                        value_obj = existing_value
+                                        break
+                                
+                                # Если не нашли, создаем новое значение
+                                if value_obj is None:
+                                    value_obj = IndicatorValue.objects.create(
+                                        indicator=indicator,
+                                        date=target_date,
+                                        value=calculated_value
+                                    )
+                                else:
+                                    # Обновляем существующее значение
+                                    value_obj.value = calculated_value
+                                    value_obj.save()
+                                
+                                # Устанавливаем элементы справочников
+                                if dict_items_tuple:
+                                    value_obj.dictionary_items.set(dict_items_tuple)
+                                else:
+                                    value_obj.dictionary_items.clear()
+                                
+                            calculated_count += 1
+                            batch.step()
+                        except ValueError as e:
+                            error_count += 1
+                            dimension_str = f" ({', '.join([str(item) for item in dict_items_tuple])})" if dict_items_tuple else ""
+                            error_msg = f"{target_date.strftime('%d.%m.%Y')}{dimension_str}: {str(e)}"
+                            errors.append(error_msg)
+                            logger.warning('Расчет показателя %s: %s', indicator.pk, error_msg)
+                        except Exception as e:
+                            error_count += 1
+                            dimension_str = f" ({', '.join([str(item) for item in dict_items_tuple])})" if dict_items_tuple else ""
+                            error_msg = f"{target_date.strftime('%d.%m.%Y')}{dimension_str}: {str(e)}"
+                            errors.append(error_msg)
+                            logger.exception('Расчет показателя %s: %s', indicator.pk, error_msg)
+        except WriteLeaseError as e:
+            messages.error(request, str(e))
+            return redirect('indicators:indicator_detail', pk=pk)
         
         # Показываем результаты
         if calculated_count > 0:
@@ -776,170 +767,180 @@ def recalculate_all_aggregates(request):
     total_errors = 0
     indicator_results = {}
     
-    # Пересчитываем каждый агрегатный показатель
-    for indicator in aggregate_indicators:
-        calculated_count = 0
-        error_count = 0
-        errors = []
-        
-        # Определяем период из формулы
-        period = get_period_from_formula(indicator.formula)
-        
-        # Находим даты из зависимых показателей
-        dependencies = indicator.get_dependencies()
-        if dependencies:
-            # Получаем диапазон дат из зависимых показателей
-            date_range = IndicatorValue.objects.filter(
-                indicator__in=dependencies
-            ).aggregate(
-                min_date=Min('date'),
-                max_date=Max('date')
-            )
-            min_date = date_range['min_date']
-            max_date = date_range['max_date']
-            
-            if not min_date or not max_date:
-                errors.append("Не удалось определить диапазон дат")
-                indicator_results[indicator.name] = {
-                    'calculated': 0,
-                    'errors': 1,
-                    'error_messages': errors
-                }
-                continue
-            
-            # Генерируем даты с правильным шагом для периода
-            dates_to_calculate = generate_dates_by_period(min_date, max_date, period)
-        else:
-            # Если нет зависимостей, берем все даты из системы
-            all_dates = IndicatorValue.objects.values_list('date', flat=True).distinct()
-            if all_dates:
-                min_date = min(all_dates)
-                max_date = max(all_dates)
-                dates_to_calculate = generate_dates_by_period(min_date, max_date, period)
-            else:
-                errors.append("Нет данных для пересчета")
-                indicator_results[indicator.name] = {
-                    'calculated': 0,
-                    'errors': 1,
-                    'error_messages': errors
-                }
-                continue
-        
-        if not dates_to_calculate:
-            errors.append("Не удалось сгенерировать даты для расчета")
-            indicator_results[indicator.name] = {
-                'calculated': 0,
-                'errors': 1,
-                'error_messages': errors
-            }
-            continue
-        
-        # Определяем комбинации справочников для расчета
-        dictionary_combinations = []
-        
-        # Проверяем, нужно ли рассчитывать в разрезе справочников
-        has_required_dicts = IndicatorDictionary.objects.filter(
-            indicator=indicator,
-            is_required=True,
-            dictionary__is_active=True
-        ).exists()
-        
-        has_any_dicts = indicator.dictionaries.exists()
-        
-        # Для агрегатных показателей: если есть справочники, всегда считаем в разрезе
-        should_calculate_by_dimensions = (
-            has_required_dicts or 
-            indicator.aggregate_by_dimensions or 
-            (indicator.indicator_type == 'aggregate' and has_any_dicts)
-        )
-        
-        if has_any_dicts and should_calculate_by_dimensions:
-            # Получаем все активные элементы для каждого справочника показателя
-            indicator_dicts = IndicatorDictionary.objects.filter(
-                indicator=indicator,
-                dictionary__is_active=True
-            ).select_related('dictionary')
-            dictionaries_list = [ind_dict.dictionary for ind_dict in indicator_dicts]
-            
-            dict_items_lists = []
-            for dictionary in dictionaries_list:
-                items = list(dictionary.items.filter(is_active=True))
-                if items:
-                    dict_items_lists.append(items)
-            
-            if dict_items_lists:
-                # Создаем все комбинации через product
-                dictionary_combinations = list(product(*dict_items_lists))
-            else:
-                # Нет активных элементов - создаем пустую комбинацию
-                dictionary_combinations = [tuple()]
-        else:
-            # Нет справочников или не нужно агрегировать в разрезе - генерируем без разреза
-            dictionary_combinations = [tuple()]
-        
-        # Рассчитываем значения для каждой даты и комбинации справочников
-        for target_date in dates_to_calculate:
-            for dict_items_tuple in dictionary_combinations:
-                try:
-                    # Рассчитываем значение с учетом разреза
-                    target_dimension_items = list(dict_items_tuple) if dict_items_tuple else None
-                    calculated_value = calculate_aggregate_value(indicator, target_date, target_dimension_items=target_dimension_items)
+    # Все показатели пересчитываются под одной арендой записи пачками (см. indicators.writer)
+    try:
+        with write_batch('Пересчет агрегатных показателей') as batch:
+            # Пересчитываем каждый агрегатный показатель
+            for indicator in aggregate_indicators:
+                calculated_count = 0
+                error_count = 0
+                errors = []
+                
+                # Определяем период из формулы
+                period = get_period_from_formula(indicator.formula)
+                
+                # Находим даты из зависимых показателей
+                dependencies = indicator.get_dependencies()
+                if dependencies:
+                    # Получаем диапазон дат из зависимых показателей
+                    date_range = IndicatorValue.objects.filter(
+                        indicator__in=dependencies
+                    ).aggregate(
+                        min_date=Min('date'),
+                        max_date=Max('date')
+                    )
+                    min_date = date_range['min_date']
+                    max_date = date_range['max_date']
                     
-                    # Получаем множество ID элементов справочников для проверки уникальности
-                    dict_items_set = set(item.id for item in dict_items_tuple) if dict_items_tuple else set()
+                    if not min_date or not max_date:
+                        errors.append("Не удалось определить диапазон дат")
+                        indicator_results[indicator.name] = {
+                            'calculated': 0,
+                            'errors': 1,
+                            'error_messages': errors
+                        }
+                        continue
                     
-                    # Ищем существующее значение с такой же комбинацией справочников
-                    existing_values = IndicatorValue.objects.filter(
+                    # Генерируем даты с правильным шагом для периода
+                    dates_to_calculate = generate_dates_by_period(min_date, max_date, period)
+                else:
+                    # Если нет зависимостей, берем все даты из системы
+                    all_dates = IndicatorValue.objects.values_list('date', flat=True).distinct()
+                    if all_dates:
+                        min_date = min(all_dates)
+                        max_date = max(all_dates)
+                        dates_to_calculate = generate_dates_by_period(min_date, max_date, period)
+                    else:
+                        errors.append("Нет данных для пересчета")
+                        indicator_results[indicator.name] = {
+                            'calculated': 0,
+                            'errors': 1,
+                            'error_messages': errors
+                        }
+                        continue
+                
+                if not dates_to_calculate:
+                    errors.append("Не удалось сгенерировать даты для расчета")
+                    indicator_results[indicator.name] = {
+                        'calculated': 0,
+                        'errors': 1,
+                        'error_messages': errors
+                    }
+                    continue
+                
+                # Определяем комбинации справочников для расчета
+                dictionary_combinations = []
+                
+                # Проверяем, нужно ли рассчитывать в разрезе справочников
+                has_required_dicts = IndicatorDictionary.objects.filter(
+                    indicator=indicator,
+                    is_required=True,
+                    dictionary__is_active=True
+                ).exists()
+                
+                has_any_dicts = indicator.dictionaries.exists()
+                
+                # Для агрегатных показателей: если есть справочники, всегда считаем в разрезе
+                should_calculate_by_dimensions = (
+                    has_required_dicts or 
+                    indicator.aggregate_by_dimensions or 
+                    (indicator.indicator_type == 'aggregate' and has_any_dicts)
+                )
+                
+                if has_any_dicts and should_calculate_by_dimensions:
+                    # Получаем все активные элементы для каждого справочника показателя
+                    indicator_dicts = IndicatorDictionary.objects.filter(
                         indicator=indicator,
-                        date=target_date
-                    ).prefetch_related('dictionary_items')
+                        dictionary__is_active=True
+                    ).select_related('dictionary')
+                    dictionaries_list = [ind_dict.dictionary for ind_dict in indicator_dicts]
                     
-                    value_obj = None
-                    for existing_value in existing_values:
-                        existing_items_set = set(item.id for item in existing_value.dictionary_items.all())
-                        if existing_items_set == dict_items_set:
-                            value_obj = existing_value
-                            break
+                    dict_items_lists = []
+                    for dictionary in dictionaries_list:
+                        items = list(dictionary.items.filter(is_active=True))
+                        if items:
+                            dict_items_lists.append(items)
                     
-                    # Если не нашли, создаем новое значение
-                    if value_obj is None:
-                        value_obj = IndicatorValue.objects.create(
-                            indicator=indicator,
-                            date=target_date,
-                            value=calculated_value
-                        )
+                    if dict_items_lists:
+                        # Создаем все комбинации через product
+                        dictionary_combinations = list(product(*dict_items_lists))
                     else:
-                        # Обновляем существующее значение
-                        value_obj.value = calculated_value
-                        value_obj.save()
-                    
-                    # Устанавливаем элементы справочников
-                    if dict_items_tuple:
-                        value_obj.dictionary_items.set(dict_items_tuple)
-                    else:
-                        value_obj.dictionary_items.clear()
-                    
-                    calculated_count += 1
-                except ValueError as e:
-                    error_count += 1
-                    if len(errors) < 5:  # Сохраняем только первые 5 ошибок
-                        dimension_str = f" ({', '.join([str(item) for item in dict_items_tuple])})" if dict_items_tuple else ""
-                        error_msg = f"{target_date.strftime('%d.%m.%Y')}{dimension_str}: {str(e)[:100]}"
-                        errors.append(error_msg)
-                except Exception as e:
-                    error_count += 1
-                    if len(errors) < 5:  # Сохраняем только первые 5 ошибок
-                        dimension_str = f" ({', '.join([str(item) for item in dict_items_tuple])})" if dict_items_tuple else ""
-                        error_msg = f"{target_date.strftime('%d.%m.%Y')}{dimension_str}: {str(e)[:100]}"
-                        errors.append(error_msg)
-        
-        total_calculated += calculated_count
-        total_errors += error_count
-        indicator_results[indicator.name] = {
-            'calculated': calculated_count,
-            'errors': error_count,
-            'error_messages': errors[:5]  # Сохраняем только первые 5 ошибок
-        }
+                        # Нет активных элементов - создаем пустую комбинацию
+                        dictionary_combinations = [tuple()]
+                else:
+                    # Нет справочников или не нужно агрегировать в разрезе - генерируем без разреза
+                    dictionary_combinations = [tuple()]
+                
+                # Рассчитываем значения для каждой даты и комбинации справочников
+                for target_date in dates_to_calculate:
+                    for dict_items_tuple in dictionary_combinations:
+                        try:
+                            # Рассчитываем значение с учетом разреза
+                            target_dimension_items = list(dict_items_tuple) if dict_items_tuple else None
+                            calculated_value = calculate_aggregate_value(indicator, target_date, target_dimension_items=target_dimension_items)
+                            
+                            # Точка сохранения: ошибка одной строки не прерывает транзакцию пачки
+                            with transaction.atomic():
+                                # Получаем множество ID элементов справочников для проверки уникальности
+                                dict_items_set = set(item.id for item in dict_items_tuple) if dict_items_tuple else set()
+                                
+                                # Ищем существующее значение с такой же комбинацией справочников
+                                existing_values = IndicatorValue.objects.filter(
+                                    indicator=indicator,
+                                    date=target_date
+                                ).prefetch_related('dictionary_items')
+                                
+                                value_obj = None
+                                for existing_value in existing_values:
+                                    existing_items_set = set(item.id for item in existing_value.dictionary_items.all())
+                                    if existing_items_set == dict_items_set:
+                                        value_obj = existing_value
+                                        break
+                                
+                                # Если не нашли, создаем новое значение
+                                if value_obj is None:
+                                    value_obj = IndicatorValue.objects.create(
+                                        indicator=indicator,
+                                        date=target_date,
+                                        value=calculated_value
+                                    )
+                                else:
+                                    # Обновляем существующее значение
+                                    value_obj.value = calculated_value
+                                    value_obj.save()
+                                
+                                # Устанавливаем элементы справочников
+                                if dict_items_tuple:
+                                    value_obj.dictionary_items.set(dict_items_tuple)
+                                else:
+                                    value_obj.dictionary_items.clear()
+                                
+                            calculated_count += 1
+                            batch.step()
+                        except ValueError as e:
+                            error_count += 1
+                            if len(errors) < 5:  # Сохраняем только первые 5 ошибок
+                                dimension_str = f" ({', '.join([str(item) for item in dict_items_tuple])})" if dict_items_tuple else ""
+                                error_msg = f"{target_date.strftime('%d.%m.%Y')}{dimension_str}: {str(e)[:100]}"
+                                errors.append(error_msg)
+                        except Exception as e:
+                            error_count += 1
+                            logger.exception('Пересчет показателя %s на %s', indicator.pk, target_date)
+                            if len(errors) < 5:  # Сохраняем только первые 5 ошибок
+                                dimension_str = f" ({', '.join([str(item) for item in dict_items_tuple])})" if dict_items_tuple else ""
+                                error_msg = f"{target_date.strftime('%d.%m.%Y')}{dimension_str}: {str(e)[:100]}"
+                                errors.append(error_msg)
+                
+                total_calculated += calculated_count
+                total_errors += error_count
+                indicator_results[indicator.name] = {
+                    'calculated': calculated_count,
+                    'errors': error_count,
+                    'error_messages': errors[:5]  # Сохраняем только первые 5 ошибок
+                }
+    except WriteLeaseError as e:
+        messages.error(request, str(e))
+        return redirect('indicators:index')
     
     # Показываем результаты
     if total_calculated > 0:
@@ -1126,45 +1127,51 @@ def generate_indicators(request):
             error_count = 0
             errors = []
             
-            for indicator_id in indicator_ids:
-                try:
-                    indicator = Indicator.objects.get(pk=indicator_id)
-                    
-                    # Определяем min/max для конкретного показателя
-                    # Если указаны общие значения, используем их, иначе - из настроек показателя
-                    min_value = common_min_value if common_min_value is not None else indicator.min_value
-                    max_value = common_max_value if common_max_value is not None else indicator.max_value
-                    
-                    if min_value is None or max_value is None:
-                        errors.append(f'{indicator.name}: не указаны min/max значения')
+            # Одна аренда записи на все показатели: генерация не чередуется
+            # построчно с другими операциями записи (см. indicators.writer)
+            with write_batch('Массовая генерация данных') as batch:
+                for indicator_id in indicator_ids:
+                    try:
+                        indicator = Indicator.objects.get(pk=indicator_id)
+                        
+                        # Определяем min/max для конкретного показателя
+                        # Если указаны общие значения, используем их, иначе - из настроек показателя
+                        min_value = common_min_value if common_min_value is not None else indicator.min_value
+                        max_value = common_max_value if common_max_value is not None else indicator.max_value
+                        
+                        if min_value is None or max_value is None:
+                            errors.append(f'{indicator.name}: не указаны min/max значения')
+                            error_count += 1
+                            continue
+                        
+                        if min_value >= max_value:
+                            errors.append(f'{indicator.name}: максимальное значение должно быть больше минимального (min: {min_value}, max: {max_value})')
+                            error_count += 1
+                            continue
+                        
+                        # Точка сохранения: ошибка одного показателя не откатывает остальные
+                        with transaction.atomic():
+                            count = generate_test_values(
+                                indicator,
+                                start_date,
+                                end_date,
+                                min_value=min_value,
+                                max_value=max_value,
+                                step=step
+                            )
+                        batch.checkpoint()
+                        total_generated += count
+                        success_count += 1
+                        
+                    except Indicator.DoesNotExist:
+                        errors.append(f'Показатель с ID {indicator_id} не найден')
                         error_count += 1
-                        continue
-                    
-                    if min_value >= max_value:
-                        errors.append(f'{indicator.name}: максимальное значение должно быть больше минимального (min: {min_value}, max: {max_value})')
+                    except ValueError as e:
+                        errors.append(f'{indicator.name}: {str(e)}')
+                        error_count += 1
+                    except Exception as e:
+                        errors.append(f'{indicator.name}: ошибка генерации - {str(e)}')
                         error_count += 1
-                        continue
-                    
-                    count = generate_test_values(
-                        indicator,
-                        start_date,
-                        end_date,
-                        min_value=min_value,
-                        max_value=max_value,
-                        step=step
-                    )
-                    total_generated += count
-                    success_count += 1
-                    
-                except Indicator.DoesNotExist:
-                    errors.append(f'Показатель с ID {indicator_id} не найден')
-                    error_count += 1
-                except ValueError as e:
-                    errors.append(f'{indicator.name}: {str(e)}')
-                    error_count += 1
-                except Exception as e:
-                    errors.append(f'{indicator.name}: ошибка генерации - {str(e)}')
-                    error_count += 1
             
             # Формируем сообщения о результате
             if success_count > 0:
@@ -1329,14 +1336,15 @@ def import_from_excel(request):
         full_path = default_storage.path(file_path)
         
         try:
-            # Парсим файл
-            result = parse_indicators_from_excel(
-                file_path=full_path,
-                template=template,
-                sheet_name=sheet_name if sheet_name else None,
-                indicator_column=column,
-                start_row=start_row
-            )
+            # Парсим файл (запись под арендой одной транзакцией, см. indicators.writer)
+            with write_batch('Импорт из Excel'):
+                result = parse_indicators_from_excel(
+                    file_path=full_path,
+                    template=template,
+                    sheet_name=sheet_name if sheet_name else None,
+                    indicator_column=column,
+                    start_row=start_row
+                )
             
             if result['success']:
                 messages.success(
@@ -1454,6 +1462,7 @@ def clear_indicator_values(request, pk):
         try:
             values_count = indicator.values.count()
             indicator.values.all().delete()
+            mark_values_deleted([indicator.pk])
             messages.success(
                 request,
                 f'Все значения показателя "{indicator.name}" удалены! Удалено записей: {values_count}'
@@ -1466,7 +1475,7 @@ def clear_indicator_values(request, pk):
     # GET запрос - показываем подтверждение
     context = {
         'indicator': indicator,
-        'values_count': indicator.values.count(),
+        'values_count': indicator.stats.values_count if hasattr(indicator, 'stats') else 0,
     }
     return render(request, 'indicators/clear_indicator_values.html', context)
 
@@ -1507,6 +1516,7 @@ def clear_data(request):
                 elif action == 'clear_values':
                     # Очистка только значений
                     deleted = IndicatorValue.objects.all().delete()
+                    mark_values_deleted()
                     messages.success(
                         request,
                         f'Все значения показателей удалены! Удалено записей: {deleted[0]}'
@@ -1623,3 +1633,31 @@ def get_dictionary_items(request, dictionary_id):
             'success': False,
             'error': str(e)
         }, status=400)
+
+
+@require_http_methods(["GET"])
+def api_changes(request):
+    """
+    API для потребителей журнала изменений значений (outbox, см. indicators.outbox).
+    
+    Параметры:
+        cursor (int): ID последней обработанной записи (0 - с начала журнала)
+        limit (int): максимальное количество записей (по умолчанию 1000)
+        ids (str): ID показателей через запятую (по умолчанию - все)
+    
+    Ответ:
+        changes: записи {'seq', 'indicator_id', 'date', 'dimension_key', 'op', 'txn_id',
+                 'version', 'reset'} в порядке seq
+        cursor: курсор для следующего запроса
+        oldest_seq: ID самой старой хранимой записи
+    """
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+        limit = int(request.GET.get('limit', 1000))
+        ids = request.GET.get('ids', '')
+        indicator_ids = {int(pk) for pk in ids.split(',') if pk.strip()} if ids else None
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Некорректные параметры запроса'}, status=400)
+    
+    result = read_changes(cursor=max(cursor, 0), limit=limit, indicator_ids=indicator_ids)
+    return JsonResponse({'success': True, **result}, json_dumps_params={'separators': (',', ':')})
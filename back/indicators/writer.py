@@ -0,0 +1,281 @@
+"""Согласование тяжелых операций записи (импорт, генерация, пересчет)
+
+SQLite допускает только одного пишущего. Когда несколько воркеров одновременно
+пишут построчно, они по очереди упираются в блокировку и ждут друг друга на
+каждой строке. Здесь операции записи сначала получают аренду в базе (одна на
+все процессы), а затем пишут пачками в крупных транзакциях. Первым оператором
+каждой транзакции продлевается аренда - так блокировка записи берется сразу,
+а не при первом INSERT после чтений (иначе SQLite может отказать в ней без
+ожидания). Читатели в режиме WAL при этом не ждут.
+
+Внутри уже открытой транзакции (админка, ATOMIC_REQUESTS, transaction.atomic
+вызывающего) запись присоединяется к ней: аренда берется в той же транзакции,
+пачки не фиксируются отдельно, а аренда освобождается после фиксации внешней
+транзакции. Ждать аренду внутри транзакции нельзя: в SQLite неудачное
+обновление строки аренды уже держит блокировку записи, и владелец аренды не
+может зафиксировать свою пачку - операции ждут друг друга до "database is
+locked". Поэтому занятая аренда здесь сразу дает WriteLeaseError.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import WriteLease
+
+
+DEFAULT_LEASE_NAME = 'values'
+
+_local = threading.local()
+
+
+class WriteLeaseError(Exception):
+    """Не удалось получить или удержать аренду записи"""
+
+
+def get_lease_settings():
+    """
+    Возвращает параметры аренды записи из настроек проекта.
+    
+    Ожидание аренды короткое (WRITE_LEASE_WAIT): запрос, не дождавшийся аренды,
+    сообщает, что запись занята, а не держит воркер дольше его таймаута. Команды
+    управления ждут дольше (WRITE_LEASE_COMMAND_WAIT, см. lease_wait).
+    
+    Returns:
+        dict: wait (ожидание аренды, с), ttl (срок аренды без продления, с),
+              batch_size (операций в одной транзакции)
+    """
+    wait = getattr(_local, 'wait', None)
+    return {
+        'wait': getattr(settings, 'WRITE_LEASE_WAIT', 5) if wait is None else wait,
+        'ttl': getattr(settings, 'WRITE_LEASE_TTL', 60),
+        'batch_size': getattr(settings, 'WRITE_BATCH_SIZE', 500),
+    }
+
+
+@contextmanager
+def lease_wait(seconds=None):
+    """
+    Задает ожидание аренды записи для операций в текущем потоке.
+    
+    Args:
+        seconds: ожидание, с (по умолчанию WRITE_LEASE_COMMAND_WAIT - для команд управления)
+    """
+    previous = getattr(_local, 'wait', None)
+    _local.wait = getattr(settings, 'WRITE_LEASE_COMMAND_WAIT', 300) if seconds is None else seconds
+    try:
+        yield
+    finally:
+        _local.wait = previous
+
+
+def acquire_write_lease(label, name=DEFAULT_LEASE_NAME, wait=None, ttl=None, owner=None):
+    """
+    Получает аренду записи, ожидая ее освобождения другими процессами.
+    
+    Args:
+        label: описание операции (для отображения владельца)
+        name: название аренды
+        wait: максимальное время ожидания, с
+        ttl: срок аренды без продления, с
+        owner: идентификатор владельца - аренда, уже принадлежащая ему, берется повторно
+    
+    Returns:
+        str: идентификатор владельца аренды
+    
+    Raises:
+        WriteLeaseError: аренда не освободилась за время ожидания
+    """
+    options = get_lease_settings()
+    wait = options['wait'] if wait is None else wait
+    ttl = options['ttl'] if ttl is None else ttl
+    reentrant = Q(owner=owner) if owner else Q(pk__in=[])
+    owner = owner or f'{label[:60]}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    
+    try:
+        WriteLease.objects.get_or_create(name=name)
+    except IntegrityError:
+        # Строку аренды одновременно создал другой процесс
+        pass
+    
+    deadline = time.monotonic() + wait
+    delay = 0.05
+    while True:
+        now = timezone.now()
+        acquired = WriteLease.objects.filter(name=name).filter(
+            Q(owner='') | Q(expires_at__lt=now) | reentrant
+        ).update(owner=owner, expires_at=now + timedelta(seconds=ttl))
+        if acquired:
+            return owner
+        if time.monotonic() + delay > deadline:
+            holder = WriteLease.objects.filter(name=name).values_list('owner', flat=True).first()
+            raise WriteLeaseError(f'Запись занята другой операцией ({holder}), повторите позже')
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+
+def renew_write_lease(owner, name=DEFAULT_LEASE_NAME, ttl=None):
+    """
+    Продлевает аренду записи.
+    
+    Raises:
+        WriteLeaseError: аренда истекла и перешла к другой операции
+    """
+    ttl = get_lease_settings()['ttl'] if ttl is None else ttl
+    renewed = WriteLease.objects.filter(name=name, owner=owner).update(
+        expires_at=timezone.now() + timedelta(seconds=ttl)
+    )
+    if not renewed:
+        raise WriteLeaseError('Аренда записи истекла и перешла к другой операции')
+
+
+def release_write_lease(owner, name=DEFAULT_LEASE_NAME):
+    """Освобождает аренду записи (если она все еще принадлежит владельцу)"""
+    WriteLease.objects.filter(name=name, owner=owner).update(owner='', expires_at=None)
+
+
+class WriteBatch:
+    """
+    Пачка операций записи под арендой: каждые batch_size операций фиксируются
+    одной транзакцией.
+    
+    Использование:
+        with write_batch('Генерация данных') as batch:
+            for row in rows:
+                save(row)
+                batch.step()
+    
+    При ошибке откатывается только текущая пачка - ранее зафиксированные
+    пачки остаются, как и при построчной записи. Пачка, присоединенная к
+    внешней транзакции (joined), не фиксируется - все операции фиксируются
+    или откатываются вместе с внешней транзакцией.
+    """
+
+    def __init__(self, owner, name=DEFAULT_LEASE_NAME, batch_size=None, joined=False):
+        self.owner = owner
+        self.name = name
+        self.batch_size = batch_size or get_lease_settings()['batch_size']
+        self.joined = joined
+        self.pending = 0
+        self.total = 0
+        self._atomic = None
+
+    def begin(self):
+        """Открывает транзакцию пачки и сразу берет блокировку записи продлением аренды"""
+        self._atomic = transaction.atomic()
+        self._atomic.__enter__()
+        try:
+            renew_write_lease(self.owner, self.name)
+        except WriteLeaseError:
+            self.end(*sys.exc_info())
+            raise
+
+    def end(self, exc_type=None, exc_value=None, traceback=None):
+        """
+        Фиксирует (или при ошибке откатывает) транзакцию текущей пачки.
+        
+        Перед фиксацией аренда продлевается еще раз: строка аренды заблокирована
+        транзакцией пачки, и другие процессы увидят срок, отсчитанный от фиксации,
+        а не от начала пачки. Иначе шаг дольше WRITE_LEASE_TTL (большая загрузка,
+        сжатие, пересчет итогов) фиксировал бы уже истекшую аренду, ее забирала
+        другая операция, а следующая пачка падала после зафиксированных.
+        """
+        atomic, self._atomic = self._atomic, None
+        if atomic is not None:
+            if exc_type is None:
+                try:
+                    renew_write_lease(self.owner, self.name)
+                except WriteLeaseError:
+                    atomic.__exit__(*sys.exc_info())
+                    raise
+            atomic.__exit__(exc_type, exc_value, traceback)
+        self.pending = 0
+
+    def step(self, count=1):
+        """
+        Отмечает выполненные операции; при заполнении пачки фиксирует ее.
+        
+        Args:
+            count: количество выполненных операций
+        """
+        self.pending += count
+        self.total += count
+        self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Фиксирует пачку, если она заполнена.
+        
+        Пока внутри пачки открыта точка сохранения (вложенный transaction.atomic),
+        фиксация откладывается до следующего вызова вне нее.
+        """
+        if self.joined:
+            return
+        if self.pending >= self.batch_size and not transaction.get_connection().savepoint_ids:
+            self.end()
+            self.begin()
+
+
+@contextmanager
+def write_batch(label, name=DEFAULT_LEASE_NAME, batch_size=None):
+    """
+    Аренда записи + запись пачками.
+    
+    Вложенный вызов в том же потоке использует внешнюю пачку, не запрашивая
+    аренду повторно (например, генерация для нескольких показателей подряд).
+    Вызов внутри открытой транзакции присоединяется к ней: строка аренды
+    захватывается обновлением в этой транзакции (до ее завершения другие
+    процессы ждут аренду), пачки не фиксируются, аренда освобождается после
+    фиксации транзакции (при откате захват откатывается вместе с ней). Аренду,
+    занятую другой операцией, такой вызов не ждет.
+    
+    Args:
+        label: описание операции
+        name: название аренды
+        batch_size: операций в одной транзакции (по умолчанию WRITE_BATCH_SIZE)
+    
+    Yields:
+        WriteBatch: текущая пачка
+    
+    Raises:
+        WriteLeaseError: аренда не получена
+    """
+    current = getattr(_local, 'batch', None)
+    if current is not None:
+        yield current
+        return
+    
+    if transaction.get_connection().in_atomic_block:
+        # Один владелец на поток: повторная запись в той же внешней транзакции
+        # берет уже захваченную (еще не освобожденную) аренду
+        if not hasattr(_local, 'joined_owner'):
+            _local.joined_owner = f'transaction:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        owner = acquire_write_lease(label, name, wait=0, owner=_local.joined_owner)
+        transaction.on_commit(lambda: release_write_lease(owner, name))
+        _local.batch = WriteBatch(owner, name, batch_size, joined=True)
+        try:
+            yield _local.batch
+        finally:
+            _local.batch = None
+        return
+    
+    owner = acquire_write_lease(label, name)
+    batch = WriteBatch(owner, name, batch_size)
+    _local.batch = batch
+    try:
+        batch.begin()
+        try:
+            yield batch
+        except BaseException:
+            batch.end(*sys.exc_info())
+            raise
+        batch.end()
+    finally:
+        _local.batch = None
+        release_write_lease(owner, name)
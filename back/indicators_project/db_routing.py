@@ -0,0 +1,126 @@
+"""Маршрутизация чтения на реплику базы данных
+
+Представления, помеченные декоратором read_from_replica, читают данные
+приложений из REPLICA_READ_APPS с базы 'replica' (если она настроена).
+Все записи идут в 'default'. Чтобы пользователь сразу видел свои изменения,
+после записи данных приложений из REPLICA_READ_APPS на REPLICA_STICKY_SECONDS
+устанавливается cookie, и его чтения тоже идут в 'default' - реплика за это
+время успевает догнать основную базу. Запись таких данных посреди запроса
+переключает оставшиеся чтения этого запроса на 'default'. Записи сессий и
+авторизации (вход, обновление сессии) чтения с реплики не закрепляют.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+
+
+REPLICA_ALIAS = 'replica'
+
+# Приложения, данные которых можно читать с реплики (авторизация и сессии
+# всегда читаются с основной базы)
+REPLICA_READ_APPS = {'indicators', 'dictionaries', 'visualization'}
+
+STICKY_COOKIE = 'db_primary_until'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    """Состояние маршрутизации текущего запроса"""
+
+    def __init__(self, sticky=False):
+        self.sticky = sticky
+        self.read_alias = None
+        self.wrote = False
+
+
+def replica_configured():
+    """Проверяет, настроена ли база-реплика"""
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def get_sticky_seconds():
+    """Время после записи, в течение которого чтения пользователя идут в основную базу, с"""
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+class ReplicaRouter:
+    """Роутер: чтение помеченных представлений - с реплики, запись - в основную базу"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.read_alias is None or state.wrote:
+            return None
+        if model._meta.app_label not in REPLICA_READ_APPS:
+            return None
+        return state.read_alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label in REPLICA_READ_APPS:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплика получает схему репликацией, миграции применяются только к основной базе
+        return db != REPLICA_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Создает состояние маршрутизации запроса и после записи данных устанавливает
+    cookie, закрепляющее чтения пользователя за основной базой.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            primary_until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            primary_until = 0
+        state = RoutingState(sticky=primary_until > time.time())
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        
+        if replica_configured() and state.wrote:
+            seconds = get_sticky_seconds()
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(int(time.time() + seconds)),
+                max_age=seconds,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+
+def read_from_replica(view_func):
+    """
+    Декоратор представления: читающие запросы (GET/HEAD/OPTIONS) читают с реплики,
+    если она настроена и пользователь недавно ничего не записывал.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if (state is None or state.sticky or request.method not in SAFE_METHODS
+                or not replica_configured()):
+            return view_func(request, *args, **kwargs)
+        
+        state.read_alias = REPLICA_ALIAS
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            state.read_alias = None
+    return wrapper
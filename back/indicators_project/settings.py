@@ -57,6 +57,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'indicators_project.db_routing.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -96,6 +97,114 @@ DATABASES = {
     }
 }
 
+# Профиль PostgreSQL для работы под нагрузкой нескольких воркеров
+# (DJANGO_DB_ENGINE=postgresql, требуется пакет psycopg). Соединения
+# переиспользуются между запросами (CONN_MAX_AGE) и проверяются перед
+# повторным использованием (CONN_HEALTH_CHECKS). При работе через pgbouncer
+# в режиме transaction укажите DJANGO_DB_DISABLE_SERVER_SIDE_CURSORS=True.
+
+if os.environ.get('DJANGO_DB_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'indicators'),
+            'USER': os.environ.get('DJANGO_DB_USER', 'indicators'),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DJANGO_DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DJANGO_DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DJANGO_DB_CONNECT_TIMEOUT', 5)),
+                'application_name': 'indicators',
+            },
+        }
+    }
+
+# Параметры соединений SQLite (применяются при открытии каждого соединения,
+# см. indicators.database). WAL позволяет читать во время пересчетов, а
+# busy_timeout - ждать освобождения блокировки вместо "database is locked".
+# Проверить эффект на текущем сервере: python manage.py benchmark_sqlite
+
+SQLITE_TUNING_ENABLED = os.environ.get('DJANGO_SQLITE_TUNING', 'True') == 'True'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('DJANGO_SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('DJANGO_SQLITE_SYNCHRONOUS', 'NORMAL'),
+    # Ожидание блокировки, мс
+    'busy_timeout': int(os.environ.get('DJANGO_SQLITE_BUSY_TIMEOUT', 5000)),
+    # Отображение файла базы в память, байт (256 МБ)
+    'mmap_size': int(os.environ.get('DJANGO_SQLITE_MMAP_SIZE', 268435456)),
+    # Отрицательное значение - размер кэша страниц в КБ (64 МБ)
+    'cache_size': int(os.environ.get('DJANGO_SQLITE_CACHE_SIZE', -65536)),
+    'temp_store': 'MEMORY',
+}
+
+# Согласование тяжелых операций записи (импорт, генерация, пересчет) между
+# воркерами, см. indicators.writer: запрос ждет аренду записи до
+# WRITE_LEASE_WAIT секунд (меньше таймаута воркера gunicorn), команда
+# управления - до WRITE_LEASE_COMMAND_WAIT секунд; аренда без продления
+# освобождается через WRITE_LEASE_TTL секунд, значения фиксируются пачками
+# по WRITE_BATCH_SIZE.
+
+WRITE_LEASE_WAIT = int(os.environ.get('DJANGO_WRITE_LEASE_WAIT', 5))
+WRITE_LEASE_COMMAND_WAIT = int(os.environ.get('DJANGO_WRITE_LEASE_COMMAND_WAIT', 300))
+WRITE_LEASE_TTL = int(os.environ.get('DJANGO_WRITE_LEASE_TTL', 60))
+WRITE_BATCH_SIZE = int(os.environ.get('DJANGO_WRITE_BATCH_SIZE', 500))
+
+# Журнал изменений значений (outbox, см. indicators.outbox): записи старше
+# OUTBOX_RETENTION_DAYS дней удаляются, а старше OUTBOX_COMPACT_AFTER_HOURS
+# часов сжимаются до последней записи каждого значения командой
+# python manage.py compact_change_log (запускать по расписанию, например cron).
+
+OUTBOX_RETENTION_DAYS = int(os.environ.get('DJANGO_OUTBOX_RETENTION_DAYS', 30))
+OUTBOX_COMPACT_AFTER_HOURS = int(os.environ.get('DJANGO_OUTBOX_COMPACT_AFTER_HOURS', 24))
+# Сколько секунд пропуск в последовательности записей считается незафиксированной
+# транзакцией; в PostgreSQL пропуск ждет завершения открытых транзакций, а это время -
+# запас на расхождение часов приложения и базы (см. indicators.outbox.get_pending_since)
+OUTBOX_SETTLE_SECONDS = int(os.environ.get('DJANGO_OUTBOX_SETTLE_SECONDS', 5))
+
+
+# Реплика для чтения дашбордов и API (см. indicators_project.db_routing).
+# PostgreSQL: DJANGO_DB_REPLICA_HOST (и при необходимости DJANGO_DB_REPLICA_PORT) -
+# потоковая реплика основной базы. SQLite (для локальной проверки):
+# DJANGO_DB_REPLICA_PATH - копия файла базы, синхронизируемая отдельно.
+# Без этих переменных все запросы идут в основную базу.
+
+if os.environ.get('DJANGO_DB_REPLICA_HOST') and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DJANGO_DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DJANGO_DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif os.environ.get('DJANGO_DB_REPLICA_PATH') and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DJANGO_DB_REPLICA_PATH'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['indicators_project.db_routing.ReplicaRouter']
+
+# Сколько секунд после записи чтения пользователя идут в основную базу
+REPLICA_STICKY_SECONDS = int(os.environ.get('DJANGO_REPLICA_STICKY_SECONDS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# По умолчанию - локальная память процесса. При нескольких воркерах gunicorn
+# укажите общий бэкенд (например, FileBasedCache или Redis) через переменные
+# окружения, чтобы инвалидация кэша была видна всем процессам.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'indicators'),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
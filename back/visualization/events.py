@@ -0,0 +1,89 @@
+"""Server-Sent Events: уведомления открытых дашбордов об изменении данных показателей"""
+import json
+import time
+from django.db.models import Count, Max, Min, Q
+from indicators.models import IndicatorChangeLog
+
+
+# Как часто поток проверяет журнал изменений (секунды)
+EVENTS_POLL_INTERVAL = 1
+# Через сколько секунд без событий отправлять комментарий для поддержания соединения
+EVENTS_HEARTBEAT_INTERVAL = 15
+# Длительность одного соединения: после нее браузер переподключается
+# сам (с заголовком Last-Event-ID), освобождая поток сервера. Должна быть
+# заметно меньше таймаута воркера gunicorn (--timeout 120), иначе поток
+# обрывается принудительно; каждое открытое соединение занимает поток
+# воркера, поэтому сервер запускается с --worker-class gthread
+# (см. docs/DEPLOY_BEGET.md)
+EVENTS_STREAM_DURATION = 55
+# Пауза перед переподключением браузера (миллисекунды)
+EVENTS_RETRY = 3000
+
+
+def get_last_change_id():
+    """Возвращает ID последней записи журнала изменений (0 - журнал пуст)"""
+    return IndicatorChangeLog.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+
+def collect_changes(indicator_ids, last_id):
+    """
+    Читает новые записи журнала изменений для показателей и сворачивает их по показателю.
+    
+    Args:
+        indicator_ids: ID показателей дашборда
+        last_id: ID последней записи журнала, уже отправленной клиенту
+    
+    Returns:
+        tuple: (новый last_id, список изменений
+                {'indicator', 'cursor', 'from', 'reset'} по одному на показатель)
+    """
+    # Журнал содержит запись на каждое значение - сворачиваем в базе
+    rows = IndicatorChangeLog.objects.filter(
+        pk__gt=last_id,
+        indicator_id__in=indicator_ids
+    ).values('indicator_id').annotate(
+        last_id=Max('pk'),
+        cursor=Max('version'),
+        first_date=Min('date'),
+        resets=Count('pk', filter=Q(reset=True))
+    ).order_by('indicator_id')
+    
+    changes = []
+    for row in rows:
+        last_id = max(last_id, row['last_id'])
+        changes.append({
+            'indicator': row['indicator_id'],
+            'cursor': row['cursor'],
+            'from': row['first_date'].isoformat() if row['first_date'] else None,
+            'reset': row['resets'] > 0
+        })
+    
+    return last_id, changes
+
+
+def stream_indicator_changes(indicator_ids, last_id):
+    """
+    Генератор потока text/event-stream с изменениями данных показателей.
+    
+    Каждое событие update содержит JSON {'changes': [...]} (см. collect_changes)
+    и id - ID последней записи журнала, с которой браузер продолжит поток
+    после переподключения.
+    
+    Args:
+        indicator_ids: ID показателей дашборда
+        last_id: ID последней записи журнала, уже известной клиенту
+    """
+    yield f'retry: {EVENTS_RETRY}\n\n'
+    
+    started = last_event = time.monotonic()
+    while time.monotonic() - started < EVENTS_STREAM_DURATION:
+        last_id, changes = collect_changes(indicator_ids, last_id)
+        if changes:
+            payload = json.dumps({'changes': changes}, separators=(',', ':'))
+            yield f'id: {last_id}\nevent: update\ndata: {payload}\n\n'
+            last_event = time.monotonic()
+        elif time.monotonic() - last_event >= EVENTS_HEARTBEAT_INTERVAL:
+            yield ': ping\n\n'
+            last_event = time.monotonic()
+        
+        time.sleep(EVENTS_POLL_INTERVAL)
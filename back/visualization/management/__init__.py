@@ -0,0 +1 @@
+# Пустой файл для превращения директории в пакет
@@ -0,0 +1,5 @@
+# Пустой файл для превращения директории в пакет
+
+
+
+
@@ -0,0 +1,172 @@
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from indicators.models import Indicator, IndicatorDataVersion, IndicatorDictionary
+from indicators.cumulative import with_cumulative
+from indicators.versioning import get_data_version
+from visualization.events import collect_changes
+from visualization.utils import (
+    get_indicator_data, get_indicator_breakdown, get_latest_snapshot, get_pivot_page,
+    get_dimension_ranking, get_status_summary, get_changes_since, get_indicators_matrix
+)
+
+
+# Строка плана SQLite с полным просмотром таблицы (без индекса). Просмотр подзапросов
+# и оконного фильтра Django (qualify) уже отобранных строк полным просмотром не считается
+SQLITE_FULL_SCAN = re.compile(
+    r'^SCAN (?!\()(?!qualify\b)(?!CONSTANT ROW)(?!.*USING (COVERING )?INDEX)'
+)
+# Строка плана PostgreSQL с последовательным просмотром таблицы
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on ')
+# Имя просматриваемой таблицы в строке плана
+SCANNED_TABLE = re.compile(r'(?:^SCAN|Seq Scan on) "?(\w+)')
+
+# Операции, которые по назначению читают таблицы целиком (сводка по всем
+# показателям): полный просмотр этих таблиц не считается проблемой
+WHOLE_TABLE_READS = {
+    'Сводка статусов': (Indicator, IndicatorDataVersion),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN QUERY PLAN (EXPLAIN на PostgreSQL) для основных запросов '
+        'визуализации и отмечает полные просмотры таблиц'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--indicator',
+            type=int,
+            help='ID показателя для запросов (по умолчанию - показатель с наибольшим количеством значений)',
+        )
+        parser.add_argument(
+            '--days-back',
+            type=int,
+            default=30,
+            help='Окно дат для запросов рядов (по умолчанию 30 дней)',
+        )
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='Завершиться с ошибкой, если найден полный просмотр таблицы',
+        )
+        parser.add_argument(
+            '--show-sql',
+            action='store_true',
+            help='Выводить текст запросов',
+        )
+
+    def get_hot_queries(self, indicator, days_back):
+        """
+        Основные операции чтения. Каждая выполняется настоящим кодом
+        приложения, а в план попадают фактически выполненные им запросы.
+        """
+        link = IndicatorDictionary.objects.filter(indicator=indicator).select_related('dictionary').first()
+        dictionary_id = link.dictionary_id if link else None
+        first_item = link.dictionary.items.values_list('pk', flat=True).first() if link else None
+        filters = {str(dictionary_id): [first_item]} if first_item else {}
+        version = (get_data_version(indicator.pk) or (0, 0))[0]
+        
+        operations = [
+            ('Ряд показателя', lambda: get_indicator_data(indicator, days_back=days_back)),
+            ('Ряд с фильтром по справочнику', lambda: get_indicator_data(
+                indicator, days_back=days_back, dictionary_filters=filters)),
+            ('Нарастающий итог', lambda: get_indicator_data(indicator, days_back=days_back, cumulative=True)),
+            ('Последнее значение', lambda: get_latest_snapshot(indicator)),
+            ('Последние значения по разрезам', lambda: get_latest_snapshot(indicator, per_dimension=True)),
+            ('Изменения с версии', lambda: get_changes_since(indicator.pk, max(version - 1, 0))),
+            ('Опрос журнала изменений', lambda: collect_changes([indicator.pk], 0)),
+            ('Страница показателя (нарастающий итог)', lambda: list(
+                with_cumulative(indicator.values.all()).order_by('-date')[:100])),
+            ('Сводная таблица', lambda: get_pivot_page(
+                indicator, 'month', dictionary_id, days_back=days_back)),
+            ('Матрица показателей', lambda: get_indicators_matrix([indicator], days_back=days_back)),
+            ('Сводка статусов', lambda: get_status_summary(days_back, use_cache=False)),
+        ]
+        if dictionary_id:
+            operations += [
+                ('Разбивка по справочнику', lambda: get_indicator_breakdown(
+                    indicator, dictionary_id, days_back=days_back)),
+                ('Рейтинг элементов справочника', lambda: get_dimension_ranking(
+                    indicator, dictionary_id, use_cache=False)),
+            ]
+        return operations
+
+    def explain(self, sql):
+        """Возвращает строки плана запроса для текущей СУБД"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                return [row[-1] for row in cursor.fetchall()]
+            cursor.execute('EXPLAIN ' + sql)
+            return [row[0] for row in cursor.fetchall()]
+
+    def is_full_scan(self, plan_line):
+        """Проверяет, описывает ли строка плана полный просмотр таблицы"""
+        if connection.vendor == 'sqlite':
+            return bool(SQLITE_FULL_SCAN.match(plan_line.strip()))
+        return bool(POSTGRES_FULL_SCAN.search(plan_line))
+
+    def scanned_table(self, plan_line):
+        """Имя таблицы из строки плана с полным просмотром"""
+        match = SCANNED_TABLE.search(plan_line.strip())
+        return match.group(1) if match else None
+
+    def handle(self, *args, **options):
+        if options['indicator']:
+            indicator = Indicator.objects.filter(pk=options['indicator']).first()
+            if not indicator:
+                raise CommandError(f'Показатель {options["indicator"]} не найден')
+        else:
+            indicator = Indicator.objects.annotate(
+                values_count=Count('values')
+            ).order_by('-values_count').first()
+            if not indicator:
+                self.stdout.write(self.style.WARNING('Показатели отсутствуют. Нечего анализировать.'))
+                return
+        
+        self.stdout.write('\n' + '='*60)
+        self.stdout.write(self.style.WARNING('Анализ планов основных запросов'))
+        self.stdout.write('='*60)
+        self.stdout.write(f'СУБД: {connection.vendor}')
+        self.stdout.write(f'Показатель: {indicator.name} (ID {indicator.pk})')
+        self.stdout.write('='*60 + '\n')
+        
+        full_scans = 0
+        explained = 0
+        for name, operation in self.get_hot_queries(indicator, options['days_back']):
+            # Журнал запросов ограничен по длине - начинаем каждую операцию с пустого
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                operation()
+            
+            whole_tables = {model._meta.db_table for model in WHOLE_TABLE_READS.get(name, ())}
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                    continue
+                explained += 1
+                if options['show_sql']:
+                    self.stdout.write(f'  {sql}')
+                for line in self.explain(sql):
+                    if self.is_full_scan(line) and self.scanned_table(line) in whole_tables:
+                        self.stdout.write(f'  ~ {line} (чтение всей таблицы по назначению)')
+                    elif self.is_full_scan(line):
+                        full_scans += 1
+                        self.stdout.write(self.style.ERROR(f'  ✗ {line}'))
+                    else:
+                        self.stdout.write(f'    {line}')
+            self.stdout.write('')
+        
+        self.stdout.write('='*60)
+        summary = f'Проверено запросов: {explained}, полных просмотров таблиц: {full_scans}'
+        if full_scans:
+            self.stdout.write(self.style.WARNING(summary))
+            if options['fail_on_scan']:
+                raise CommandError('Найдены полные просмотры таблиц')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✓ {summary}'))
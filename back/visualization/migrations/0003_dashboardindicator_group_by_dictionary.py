@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dictionaries', '0002_dictionaryitem_unique_dictionary_item_code'),
+        ('visualization', '0002_dashboardindicator_cumulative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardindicator',
+            name='group_by_dictionary',
+            field=models.ForeignKey(blank=True, help_text='Если указан, график показывает отдельный ряд для каждого элемента справочника', null=True, on_delete=django.db.models.deletion.SET_NULL, to='dictionaries.dictionary', verbose_name='Разбивка по справочнику'),
+        ),
+    ]
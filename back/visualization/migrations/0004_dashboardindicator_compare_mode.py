@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualization', '0003_dashboardindicator_group_by_dictionary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardindicator',
+            name='compare_mode',
+            field=models.CharField(blank=True, choices=[('prev_year', 'С прошлым годом'), ('prev_period', 'С предыдущим периодом')], default='', help_text='Если указано, на графике показывается ряд сравнения', max_length=20, verbose_name='Сравнение'),
+        ),
+    ]
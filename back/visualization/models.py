@@ -92,6 +92,25 @@ class DashboardIndicator(models.Model):
         default=False,
         help_text='Если включено, значения будут отображаться как нарастающий итог'
     )
+    group_by_dictionary = models.ForeignKey(
+        'dictionaries.Dictionary',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Разбивка по справочнику',
+        help_text='Если указан, график показывает отдельный ряд для каждого элемента справочника'
+    )
+    compare_mode = models.CharField(
+        'Сравнение',
+        max_length=20,
+        choices=[
+            ('prev_year', 'С прошлым годом'),
+            ('prev_period', 'С предыдущим периодом'),
+        ],
+        blank=True,
+        default='',
+        help_text='Если указано, на графике показывается ряд сравнения'
+    )
     dictionary_filters = models.JSONField(
         'Фильтры по справочникам',
         default=dict,
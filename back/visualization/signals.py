@@ -0,0 +1,14 @@
+"""Сигналы приложения визуализации"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from dictionaries.models import Dictionary, DictionaryItem
+from indicators.models import IndicatorDictionary
+from .utils import bump_dictionaries_generation
+
+
+@receiver([post_save, post_delete], sender=Dictionary)
+@receiver([post_save, post_delete], sender=DictionaryItem)
+@receiver([post_save, post_delete], sender=IndicatorDictionary)
+def invalidate_dashboard_filters(sender, **kwargs):
+    """Сбрасывает кэш панелей фильтров дашбордов при изменении справочников"""
+    bump_dictionaries_generation()
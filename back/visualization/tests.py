@@ -1,3 +1,716 @@
+import io
+import json
+import numpy as np
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from dictionaries.models import Dictionary, DictionaryItem
+from indicators.bulk import load_values
+from indicators.formula_parser import get_prev_period_date
+from indicators.models import Indicator, IndicatorDictionary, IndicatorValue, Unit
+from .events import EVENTS_STREAM_DURATION
+from .models import Dashboard
+from .utils import (
+    correlation_matrix, downsample_lttb, get_dashboard_filter_dictionaries, get_indicator_breakdown, get_indicator_data,
+    get_status_summary
+)
 
-# Create your tests here.
+
+class DashboardEventsTests(TestCase):
+    """Поток изменений панели (Server-Sent Events)"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', password='owner')
+        self.dashboard = Dashboard.objects.create(name='Панель', is_public=False, created_by=self.owner)
+        self.url = reverse('visualization:dashboard_events', args=[self.dashboard.pk])
+
+    def test_private_dashboard_forbidden(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        
+        User.objects.create_user('other', password='other')
+        self.client.login(username='other', password='other')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_owner_gets_stream(self):
+        self.client.login(username='owner', password='owner')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(next(iter(response.streaming_content)).startswith(b'retry:'))
+        response.close()
+
+    def test_stream_shorter_than_worker_timeout(self):
+        # gunicorn запускается с --timeout 120 (docs/DEPLOY_BEGET.md)
+        self.assertLess(EVENTS_STREAM_DURATION, 120)
+
+
+class DashboardFilterDictionariesTests(TestCase):
+    """Справочники общей панели фильтров дашборда"""
+
+    def setUp(self):
+        cache.clear()
+        unit = Unit.objects.create(name='Штука', symbol='шт')
+        self.indicators = [Indicator.objects.create(name=f'Показатель {i}', unit=unit) for i in range(2)]
+        self.regions = Dictionary.objects.create(name='Регионы', code='regions')
+        self.factories = Dictionary.objects.create(name='Заводы', code='factories')
+        archive = Dictionary.objects.create(name='Архив', code='archive', is_active=False)
+        DictionaryItem.objects.create(dictionary=self.regions, name='Север')
+        DictionaryItem.objects.create(dictionary=self.regions, name='Юг (закрыт)', is_active=False)
+        DictionaryItem.objects.create(dictionary=self.factories, name='Завод')
+        IndicatorDictionary.objects.create(indicator=self.indicators[0], dictionary=self.regions)
+        IndicatorDictionary.objects.create(indicator=self.indicators[0], dictionary=archive)
+        IndicatorDictionary.objects.create(indicator=self.indicators[1], dictionary=self.regions)
+        IndicatorDictionary.objects.create(indicator=self.indicators[1], dictionary=self.factories)
+        self.indicator_ids = [indicator.pk for indicator in self.indicators]
+
+    def test_merged_in_two_queries(self):
+        with self.assertNumQueries(2):
+            dictionaries = get_dashboard_filter_dictionaries(1, self.indicator_ids)
+        
+        # Общий справочник один раз, неактивные справочники и элементы не попадают
+        self.assertEqual(list(dictionaries), [self.regions.pk, self.factories.pk])
+        self.assertEqual([item.name for item in dictionaries[self.regions.pk]['items']], ['Север'])
+        self.assertEqual([item.name for item in dictionaries[self.factories.pk]['items']], ['Завод'])
+
+    def test_cached_until_dictionaries_change(self):
+        get_dashboard_filter_dictionaries(1, self.indicator_ids)
+        with self.assertNumQueries(0):
+            get_dashboard_filter_dictionaries(1, self.indicator_ids)
+        
+        DictionaryItem.objects.create(dictionary=self.regions, name='Запад')
+        dictionaries = get_dashboard_filter_dictionaries(1, self.indicator_ids)
+        self.assertEqual([item.name for item in dictionaries[self.regions.pk]['items']], ['Запад', 'Север'])
+
+    def test_panel_change(self):
+        get_dashboard_filter_dictionaries(1, self.indicator_ids)
+        dictionaries = get_dashboard_filter_dictionaries(1, self.indicator_ids[:1])
+        self.assertEqual(list(dictionaries), [self.regions.pk])
+
+
+class IndicatorDataMixin:
+    """Показатель в разрезе справочника с дневными значениями"""
+
+    def setUp(self):
+        self.unit = Unit.objects.create(name='Штука', symbol='шт')
+        self.indicator = Indicator.objects.create(name='Выпуск', unit=self.unit, min_value=10, max_value=100)
+        dictionary = Dictionary.objects.create(name='Заводы', code='factories')
+        self.dictionary = dictionary
+        self.items = [DictionaryItem.objects.create(dictionary=dictionary, name=f'Завод {i}') for i in range(2)]
+        IndicatorDictionary.objects.create(indicator=self.indicator, dictionary=dictionary)
+        self.end_date = date.today()
+
+    def load(self, days, values_by_item):
+        """Загружает значения за days дней до end_date: values_by_item - {элемент: функция(день) -> значение}"""
+        load_values(self.indicator, [
+            (self.end_date - timedelta(days=day), Decimal(value(day)), [item.pk])
+            for day in range(days)
+            for item, value in values_by_item.items()
+        ])
+
+
+class DownsampleTests(IndicatorDataMixin, TestCase):
+    """Прореживание рядов (LTTB)"""
+
+    def test_lttb_keeps_endpoints_and_extremes(self):
+        x = np.arange(1000)
+        y = np.sin(x / 50)
+        y[500] = 40
+        y[700] = -40
+        for max_points in (2, 3, 10, 50):
+            with self.subTest(max_points=max_points):
+                indices = downsample_lttb(x, y, max_points)
+                self.assertLessEqual(len(indices), max_points)
+                self.assertEqual(indices[0], 0)
+                self.assertEqual(indices[-1], 999)
+                self.assertEqual(list(indices), sorted(set(indices)))
+                if max_points >= 10:
+                    self.assertIn(500, indices)
+                    self.assertIn(700, indices)
+        self.assertEqual(list(downsample_lttb(x[:5], y[:5], 50)), [0, 1, 2, 3, 4])
+
+    def test_downsample_per_dimension(self):
+        self.load(200, {
+            self.items[0]: lambda day: 1 if day == 60 else 20 + day % 7,
+            self.items[1]: lambda day: 1000 if day == 100 else 500 + day % 5,
+        })
+        data = get_indicator_data(self.indicator, days_back=199, end_date=self.end_date, max_points=40)
+        
+        self.assertTrue(data['downsampled'])
+        self.assertEqual(data['total_points'], 400)
+        self.assertLessEqual(len(data['values']), 40)
+        first = (self.end_date - timedelta(days=199)).isoformat()
+        last = self.end_date.isoformat()
+        for low in (True, False):
+            series = [(point, value) for point, value in zip(data['dates'], data['values']) if (value < 100) == low]
+            # Каждый разрез прорежен отдельно: у каждого свои крайние точки и половина бюджета
+            self.assertEqual(len(series), 20)
+            self.assertEqual(series[0][0], first)
+            self.assertEqual(series[-1][0], last)
+        # Выбросы обоих разрезов сохраняются
+        self.assertIn(1000.0, data['values'])
+        self.assertIn(1.0, data['values'])
+
+
+class CumulativeDataTests(IndicatorDataMixin, TestCase):
+    """Нарастающий итог по дням"""
+
+    def setUp(self):
+        super().setUp()
+        self.indicator.unacceptable_value = 5
+        self.indicator.acceptable_value = 50
+        self.indicator.good_value = 100
+        self.indicator.save()
+        self.load(10, {self.items[0]: lambda day: 1, self.items[1]: lambda day: 10 + day})
+        self.first = self.end_date - timedelta(days=9)
+
+    def test_grouped_by_dimension(self):
+        data = get_indicator_data(self.indicator, days_back=9, end_date=self.end_date, cumulative=True)
+        
+        self.assertNotIn('values', data)
+        self.assertEqual(data['dates'], [(self.first + timedelta(days=day)).isoformat() for day in range(10)])
+        self.assertEqual(data['total_points'], 20)
+        groups = {group['name']: group for group in data['groups']}
+        self.assertEqual(set(groups), {'Завод 0', 'Завод 1'})
+        self.assertEqual(groups['Завод 0']['id'], str(self.items[0].pk))
+        # Итог копится по каждому разрезу отдельно (от самой ранней даты)
+        self.assertEqual(groups['Завод 0']['values'], [float(day) for day in range(1, 11)])
+        self.assertEqual(
+            groups['Завод 1']['values'],
+            [float(sum(10 + day for day in range(9 - index, 10))) for index in range(10)]
+        )
+        # Статусы - по накопленным значениям своего разреза
+        self.assertEqual(groups['Завод 0']['statuses'][0], 'red')
+        self.assertEqual(groups['Завод 1']['statuses'][-1], 'green')
+
+    def test_single_dimension_stays_flat(self):
+        data = get_indicator_data(
+            self.indicator, days_back=9, end_date=self.end_date, cumulative=True,
+            dictionary_filters={self.dictionary.pk: [self.items[0].pk]}
+        )
+        
+        self.assertNotIn('groups', data)
+        self.assertEqual(data['values'], [float(day) for day in range(1, 11)])
+
+    def test_api(self):
+        url = reverse('visualization:api_indicator_data', args=[self.indicator.pk])
+        data = self.client.get(url, {'days_back': 9, 'cumulative': 'true'}).json()['data']
+        
+        self.assertEqual([group['values'][-1] for group in data['groups']], [10.0, 145.0])
+
+
+class BreakdownTests(IndicatorDataMixin, TestCase):
+    """Разбивка на ряды по элементам справочника (group_by)"""
+
+    def setUp(self):
+        super().setUp()
+        regions = Dictionary.objects.create(name='Регионы', code='regions')
+        IndicatorDictionary.objects.create(indicator=self.indicator, dictionary=regions)
+        self.regions = [DictionaryItem.objects.create(dictionary=regions, name=name) for name in ('Север', 'Юг')]
+        self.first = self.end_date - timedelta(days=1)
+        factory0, factory1 = (item.pk for item in self.items)
+        north, south = (item.pk for item in self.regions)
+        load_values(self.indicator, [
+            (self.first, Decimal(1), [factory0, north]),
+            (self.first, Decimal(2), [factory0, south]),
+            (self.first, Decimal(5), [factory1, north]),
+            (self.end_date, Decimal(3), [factory0, north]),
+        ])
+
+    def breakdown(self, **params):
+        return get_indicator_breakdown(self.indicator, self.dictionary.pk, days_back=1, end_date=self.end_date, **params)
+
+    def test_series_per_item(self):
+        data = self.breakdown()
+        
+        self.assertEqual(data['dates'], [self.first.isoformat(), self.end_date.isoformat()])
+        # Остальные разрезы (регионы) суммируются, пропуски - None
+        self.assertEqual(
+            [(group['id'], group['name'], group['values']) for group in data['groups']],
+            [(self.items[0].pk, 'Завод 0', [3.0, 3.0]), (self.items[1].pk, 'Завод 1', [5.0, None])]
+        )
+
+    def test_filters_and_cumulative(self):
+        data = self.breakdown(dictionary_filters={self.regions[0].dictionary_id: [self.regions[0].pk]})
+        self.assertEqual([group['values'] for group in data['groups']], [[1.0, 3.0], [5.0, None]])
+        
+        data = self.breakdown(cumulative=True)
+        self.assertEqual([group['values'] for group in data['groups']], [[3.0, 6.0], [5.0, None]])
+
+    def test_api(self):
+        url = reverse('visualization:api_indicator_data', args=[self.indicator.pk])
+        data = self.client.get(url, {'days_back': 1, 'group_by': self.regions[0].dictionary_id}).json()['data']
+        
+        self.assertEqual([group['name'] for group in data['groups']], ['Север', 'Юг'])
+        self.assertEqual([group['values'] for group in data['groups']], [[6.0, 3.0], [2.0, None]])
+
+    def test_empty(self):
+        data = get_indicator_breakdown(self.indicator, self.dictionary.pk, days_back=5, end_date=self.first - timedelta(days=1))
+        self.assertEqual(data, {'dates': [], 'groups': []})
+
+
+class StatusSummaryTests(IndicatorDataMixin, TestCase):
+    """Сводка статусов по всем показателям"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.indicator.unacceptable_value = 5
+        self.indicator.acceptable_value = 20
+        self.indicator.good_value = 50
+        self.indicator.save()
+        Indicator.objects.create(name='Брак', unit=self.unit)
+        factory0, factory1 = self.items
+        load_values(self.indicator, [
+            (self.end_date, Decimal(60), [factory0.pk]),
+            (self.end_date - timedelta(days=1), Decimal(5), [factory0.pk]),
+            (self.end_date - timedelta(days=2), Decimal(5), [factory1.pk]),
+            # Вне периода подсчета красных точек
+            (self.end_date - timedelta(days=40), Decimal(5), [factory1.pk]),
+        ])
+
+    def test_summary(self):
+        summary = get_status_summary(days_back=30)
+        
+        no_values, indicator = summary['indicators']
+        self.assertEqual(no_values['name'], 'Брак')
+        self.assertEqual(no_values['status'], 'gray')
+        self.assertIsNone(no_values['latest_date'])
+        # Худший из последних статусов разрезов
+        self.assertEqual(indicator['status'], 'red')
+        self.assertEqual(indicator['latest_date'], self.end_date.isoformat())
+        self.assertEqual(indicator['latest'], {'gray': 0, 'green': 1, 'yellow': 0, 'red': 1})
+        self.assertEqual(indicator['red_count'], 2)
+        self.assertEqual(summary['totals'], {'gray': 1, 'green': 0, 'yellow': 0, 'red': 1})
+        self.assertEqual(get_status_summary(days_back=60, use_cache=False)['indicators'][1]['red_count'], 3)
+
+    def test_cached_until_write(self):
+        get_status_summary()
+        with self.assertNumQueries(1):
+            get_status_summary()
+        
+        load_values(self.indicator, [(self.end_date, Decimal(60), [self.items[1].pk])])
+        self.assertEqual(get_status_summary()['indicators'][1]['status'], 'green')
+
+    def test_api(self):
+        response = self.client.get(reverse('visualization:api_status_summary'), {'days_back': 30})
+        self.assertEqual(response.json()['totals']['red'], 1)
+        
+        response = self.client.get(reverse('visualization:api_status_summary'), {'days_back': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SnapshotTests(IndicatorDataMixin, TestCase):
+    """Последнее значение показателя (snapshot)"""
+
+    def setUp(self):
+        super().setUp()
+        factory0, factory1 = self.items
+        self.yesterday = self.end_date - timedelta(days=1)
+        load_values(self.indicator, [
+            (self.end_date - timedelta(days=2), Decimal(30), [factory0.pk]),
+            (self.yesterday, Decimal(40), [factory0.pk]),
+            (self.end_date - timedelta(days=3), Decimal(70), [factory1.pk]),
+        ])
+        self.url = reverse('visualization:api_indicator_data', args=[self.indicator.pk])
+
+    def test_latest(self):
+        data = self.client.get(self.url, {'snapshot': 'latest'}).json()['data']
+        
+        self.assertTrue(data['snapshot'])
+        self.assertEqual(data['date'], self.yesterday.isoformat())
+        self.assertEqual(data['labels'], ['Завод 0'])
+        self.assertEqual(data['values'], [40.0])
+        self.assertEqual(data['range'], [10.0, 100.0])
+
+    def test_latest_by_dimension(self):
+        data = self.client.get(self.url, {'snapshot': 'latest_by_dimension'}).json()['data']
+        
+        self.assertEqual(data['labels'], ['Завод 0', 'Завод 1'])
+        self.assertEqual(data['values'], [40.0, 70.0])
+        self.assertEqual(data['date'], self.yesterday.isoformat())
+
+    def test_end_date_and_filters(self):
+        params = {'snapshot': 'latest_by_dimension', 'end_date': (self.end_date - timedelta(days=2)).isoformat()}
+        data = self.client.get(self.url, params).json()['data']
+        self.assertEqual(data['values'], [30.0, 70.0])
+        
+        filters = json.dumps({str(self.dictionary.pk): [self.items[1].pk]})
+        data = self.client.get(self.url, {'snapshot': 'latest', 'filters': filters}).json()['data']
+        self.assertEqual((data['labels'], data['values']), (['Завод 1'], [70.0]))
+
+    def test_empty(self):
+        params = {'snapshot': 'latest', 'end_date': (self.end_date - timedelta(days=10)).isoformat()}
+        data = self.client.get(self.url, params).json()['data']
+        self.assertEqual((data['date'], data['values']), (None, []))
+
+
+class RankingTests(IndicatorDataMixin, TestCase):
+    """Рейтинг элементов справочника"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.items.append(DictionaryItem.objects.create(dictionary=self.dictionary, name='Завод 2'))
+        # Количество точек у элементов разное: рейтинги по сумме и среднему различаются
+        load_values(self.indicator, [
+            (self.end_date - timedelta(days=day), Decimal(value), [self.items[index].pk])
+            for index, values in enumerate([(10, 20), (25,), (5, 5, 5)])
+            for day, value in enumerate(values)
+        ])
+        self.url = reverse('visualization:api_indicator_ranking', args=[self.indicator.pk])
+
+    def ranking(self, **params):
+        response = self.client.get(self.url, {'dictionary': self.dictionary.pk, **params})
+        return [(row['name'], row['value']) for row in response.json()['ranking']]
+
+    def test_sum_and_avg(self):
+        self.assertEqual(self.ranking(), [('Завод 0', 30.0), ('Завод 1', 25.0), ('Завод 2', 15.0)])
+        self.assertEqual(self.ranking(func='avg'), [('Завод 1', 25.0), ('Завод 0', 15.0), ('Завод 2', 5.0)])
+        self.assertEqual(self.ranking(order='asc', limit=2), [('Завод 2', 15.0), ('Завод 1', 25.0)])
+
+    def test_period(self):
+        start_date = (self.end_date - timedelta(days=1)).isoformat()
+        self.assertEqual(self.ranking(start_date=start_date), [('Завод 0', 30.0), ('Завод 1', 25.0), ('Завод 2', 10.0)])
+        self.assertEqual(self.ranking(end_date=start_date, func='avg'), [('Завод 0', 20.0), ('Завод 2', 5.0)])
+
+    def test_cache_follows_data_version(self):
+        self.ranking()
+        load_values(self.indicator, [(self.end_date, Decimal(100), [self.items[2].pk])])
+        self.assertEqual(self.ranking()[0], ('Завод 2', 110.0))
+
+    def test_bad_request(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'dictionary': 'x'}).status_code, 400)
+
+
+class CompareSeriesTests(IndicatorDataMixin, TestCase):
+    """Ряд сравнения с прошлым годом и прошлым периодом (compare)"""
+
+    def setUp(self):
+        super().setUp()
+        # Значение - число дней до end_date; второй разрез - только за последние 20 дней
+        self.load(400, {self.items[0]: lambda day: day})
+        self.load(20, {self.items[1]: lambda day: 1000 + day})
+
+    def day_value(self, value_date):
+        return float((self.end_date - value_date).days)
+
+    def test_prev_year(self):
+        data = get_indicator_data(self.indicator, days_back=5, end_date=self.end_date, compare='prev_year')
+        
+        self.assertEqual(len(data['compare']), len(data['values']))
+        for point, value, compare in zip(data['dates'], data['values'], data['compare']):
+            prev_date = get_prev_period_date(date.fromisoformat(point), 'year')
+            # Точки сопоставляются по своему разрезу: у второго разреза прошлого года нет
+            self.assertEqual(compare, self.day_value(prev_date) if value < 1000 else None)
+
+    def test_prev_period_by_day(self):
+        data = get_indicator_data(self.indicator, days_back=5, end_date=self.end_date, compare='prev_period')
+        
+        self.assertEqual(data['compare'], [value + 1 for value in data['values']])
+
+    def test_prev_period_by_month(self):
+        filters = {self.dictionary.pk: [self.items[0].pk]}
+        data = get_indicator_data(
+            self.indicator, days_back=150, end_date=self.end_date, aggregation_period='month',
+            dictionary_filters=filters, compare='prev_period'
+        )
+        full = get_indicator_data(
+            self.indicator, days_back=400, end_date=self.end_date, aggregation_period='month',
+            dictionary_filters=filters
+        )
+        
+        # Сравнение - полные прошлые месяцы, даже если они до начала окна
+        by_month = dict(zip(full['dates'], full['values']))
+        for point, compare in zip(data['dates'], data['compare']):
+            prev_month = get_prev_period_date(date.fromisoformat(point), 'month').isoformat()
+            self.assertAlmostEqual(compare, by_month[prev_month], places=4)
+
+    def test_api(self):
+        url = reverse('visualization:api_indicator_data', args=[self.indicator.pk])
+        data = self.client.get(url, {'days_back': 5, 'compare': 'prev_period'}).json()['data']
+        self.assertEqual(len(data['compare']), len(data['dates']))
+        
+        data = self.client.get(url, {'days_back': 5, 'compare': 'other'}).json()['data']
+        self.assertNotIn('compare', data)
+
+
+class IndicatorsMatrixTests(IndicatorDataMixin, TestCase):
+    """Матрица значений нескольких показателей и корреляция"""
+
+    def setUp(self):
+        super().setUp()
+        self.linear = Indicator.objects.create(name='Линейный', unit=self.unit)
+        self.cubic = Indicator.objects.create(name='Кубический', unit=self.unit)
+        # Разрезы показателя суммируются: по дням 1..6
+        self.load(6, {self.items[0]: lambda day: 5 - day, self.items[1]: lambda day: 1})
+        load_values(self.linear, [(self.end_date - timedelta(days=day), Decimal(2 * (6 - day) + 1), []) for day in range(6)])
+        # У третьего показателя нет значения за последний день
+        load_values(self.cubic, [(self.end_date - timedelta(days=day), Decimal(-(6 - day) ** 3), []) for day in range(1, 6)])
+        self.url = reverse('visualization:api_indicators_matrix')
+        self.ids = ','.join(str(indicator.pk) for indicator in (self.indicator, self.linear, self.cubic))
+
+    def test_matrix(self):
+        response = self.client.get(self.url, {'ids': self.ids, 'days_back': 10, 'stats': 'true'}).json()
+        
+        self.assertEqual([indicator['name'] for indicator in response['indicators']], ['Выпуск', 'Линейный', 'Кубический'])
+        self.assertEqual(response['dates'][-1], self.end_date.isoformat())
+        self.assertEqual(response['matrix'][0], [1.0, 3.0, -1.0])
+        self.assertEqual(response['matrix'][-1], [6.0, 13.0, None])
+        self.assertEqual(response['stats']['count'], [6, 6, 5])
+        self.assertEqual(response['stats']['mean'][0], 3.5)
+
+    def test_correlation(self):
+        pearson = self.client.get(self.url, {'ids': self.ids, 'correlation': 'pearson'}).json()['correlation']
+        spearman = self.client.get(self.url, {'ids': self.ids, 'correlation': 'spearman'}).json()['correlation']
+        
+        # Используются только даты со значениями всех показателей
+        self.assertEqual(pearson['rows_used'], 5)
+        self.assertEqual(pearson['matrix'][0][1], 1.0)
+        self.assertGreater(pearson['matrix'][0][2], -1.0)
+        self.assertEqual(spearman['matrix'][0][2], -1.0)
+
+    def test_spearman_ties_and_constant_column(self):
+        matrix = np.array([[1, 5, 7], [2, 6, 7], [2, 6, 7], [3, 8, 7]], dtype=float)
+        correlation, rows_used = correlation_matrix(matrix, 'spearman')
+        
+        self.assertEqual(rows_used, 4)
+        self.assertAlmostEqual(correlation[0][1], 1.0)
+        # Корреляция с постоянным столбцом не определена
+        self.assertTrue(np.isnan(correlation[0][2]))
+        self.assertTrue(np.isnan(correlation_matrix(matrix[:1], 'pearson')[0]).all())
+
+    def test_bad_request(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ids': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ids': f'{self.indicator.pk},999999'}).status_code, 404)
+
+
+class ExplainHotQueriesTests(IndicatorDataMixin, TestCase):
+    """Индексы горячих запросов и команда анализа их планов"""
+
+    def setUp(self):
+        super().setUp()
+        self.load(60, {self.items[0]: lambda day: day, self.items[1]: lambda day: 2 * day})
+
+    def test_indexes(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, IndicatorValue._meta.db_table)
+            through_constraints = connection.introspection.get_constraints(
+                cursor, IndicatorValue.dictionary_items.through._meta.db_table
+            )
+        indexes = [tuple(c['columns']) for c in constraints.values() if c['index']]
+        self.assertIn(('indicator_id', 'date'), indexes)
+        self.assertIn(('indicator_id', 'dimension_key', 'date'), indexes)
+        self.assertIn(
+            ('dictionaryitem_id', 'indicatorvalue_id'),
+            [tuple(c['columns']) for c in through_constraints.values() if c['index']]
+        )
+
+    def test_no_full_scans(self):
+        out = io.StringIO()
+        call_command('explain_hot_queries', indicator=self.indicator.pk, fail_on_scan=True, stdout=out)
+        
+        output = out.getvalue()
+        self.assertIn('Рейтинг элементов справочника', output)
+        self.assertIn('полных просмотров таблиц: 0', output)
+        # Сводка статусов читает все показатели по назначению
+        self.assertIn('SCAN indicators_indicator (чтение всей таблицы по назначению)', output)
+
+    def test_scan_detection(self):
+        from .management.commands.explain_hot_queries import Command
+        command = Command()
+        if connection.vendor == 'sqlite':
+            self.assertTrue(command.is_full_scan('SCAN indicators_indicatorvalue'))
+            self.assertFalse(command.is_full_scan('SEARCH v USING INDEX indicators_i_indicat_idx (indicator_id=?)'))
+            self.assertFalse(command.is_full_scan('SCAN v USING COVERING INDEX indicators_i_indicat_idx'))
+            self.assertEqual(command.scanned_table('SCAN indicators_indicator'), 'indicators_indicator')
+        else:
+            self.assertTrue(command.is_full_scan('Seq Scan on indicators_indicatorvalue'))
+            self.assertFalse(command.is_full_scan('Index Scan using indicators_i_indicat_idx'))
+            self.assertEqual(command.scanned_table('Seq Scan on indicators_indicator  (cost=0.00..1.01)'), 'indicators_indicator')
+
+
+class IncrementalDataTests(IndicatorDataMixin, TestCase):
+    """Инкрементальная загрузка ряда (since/cursor)"""
+
+    def setUp(self):
+        super().setUp()
+        self.load(20, {self.items[0]: lambda day: 20 + day, self.items[1]: lambda day: 50 + day})
+        self.url = reverse('visualization:api_indicator_data', args=[self.indicator.pk])
+
+    def fetch(self, **params):
+        response = self.client.get(self.url, {'days_back': 30, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_unknown_indicator(self):
+        for params in ({}, {'since': 1}, {'since': '2024-01-01'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('visualization:api_indicator_data', args=[9999]), params)
+                self.assertEqual(response.status_code, 404)
+
+    def test_unchanged(self):
+        base = self.fetch()
+        result = self.fetch(since=base['cursor'])
+        self.assertEqual(result['delta'], {'unchanged': True})
+        self.assertEqual(result['cursor'], base['cursor'])
+
+    def test_delta_applied_to_base(self):
+        base = self.fetch()
+        value = self.indicator.values.get(date=self.end_date - timedelta(days=5), dimension_key=str(self.items[0].pk))
+        value.value = Decimal('99')
+        value.save()
+        
+        result = self.fetch(since=base['cursor'])
+        self.assertFalse(result['delta']['reset'])
+        self.assertEqual(result['delta']['from'], value.date.isoformat())
+        self.assertGreater(result['cursor'], base['cursor'])
+        
+        # Клиент заменяет точки начиная с from
+        kept = [index for index, point in enumerate(base['data']['dates']) if point < result['delta']['from']]
+        merged_dates = [base['data']['dates'][index] for index in kept] + result['data']['dates']
+        merged_values = [base['data']['values'][index] for index in kept] + result['data']['values']
+        full = self.fetch()
+        self.assertEqual(merged_dates, full['data']['dates'])
+        self.assertEqual(merged_values, full['data']['values'])
+        self.assertIn(99.0, merged_values)
+
+    def test_reset_forces_full_reload(self):
+        base = self.fetch()
+        self.indicator.values.filter(date=self.end_date - timedelta(days=10)).first().delete()
+        
+        result = self.fetch(since=base['cursor'])
+        self.assertTrue(result['delta']['reset'])
+        self.assertIsNone(result['delta']['from'])
+        full = self.fetch()
+        self.assertEqual(result['data'], full['data'])
+        self.assertEqual(len(result['data']['dates']), 39)
+
+
+def decode_compact(data):
+    """Разворачивает компактный формат (encode_compact) в обычные ряды, как это делает клиент"""
+    if data['start'] is None:
+        dates = []
+    elif data.get('step'):
+        start = date.fromisoformat(data['start'])
+        dates = [(start + timedelta(days=data['step'] * index)).isoformat() for index in range(data['count'])]
+    else:
+        start = date.fromisoformat(data['start'])
+        dates = [(start + timedelta(days=offset)).isoformat() for offset in data['offsets']]
+    
+    def decode_statuses(codes):
+        if codes is None:
+            return None
+        return [data['status_codes'][code] if code is not None else None for code in codes]
+    
+    decoded = {'dates': dates}
+    if 'groups' in data:
+        decoded['groups'] = [
+            dict(group, statuses=decode_statuses(group['statuses'])) for group in data['groups']
+        ]
+    else:
+        decoded['values'] = data['values']
+        decoded['statuses'] = decode_statuses(data['statuses'])
+    return decoded
+
+
+class CompactFormatTests(IndicatorDataMixin, TestCase):
+    """Компактный колоночный формат ответа (format=compact)"""
+
+    def setUp(self):
+        super().setUp()
+        self.load(120, {self.items[0]: lambda day: f'{5 + day % 30}.25', self.items[1]: lambda day: 50 + day % 90})
+        self.url = reverse('visualization:api_indicator_data', args=[self.indicator.pk])
+
+    def assertRoundTrip(self, **params):
+        params = {'days_back': 100, **params}
+        full = self.client.get(self.url, params).json()['data']
+        compact = self.client.get(self.url, {**params, 'format': 'compact'}).json()['data']
+        self.assertEqual(compact['format'], 'compact')
+        
+        # Значения передаются с точностью хранения (4 знака)
+        def rounded(values):
+            return [round(value, 4) if value is not None else None for value in values]
+        
+        decoded = decode_compact(compact)
+        self.assertEqual(decoded['dates'], full['dates'])
+        if 'groups' in full:
+            self.assertEqual(decoded['groups'], [dict(group, values=rounded(group['values'])) for group in full['groups']])
+        else:
+            self.assertEqual(decoded['values'], rounded(full['values']))
+            self.assertEqual(decoded['statuses'], full['statuses'])
+        return compact
+
+    def test_dates_with_step(self):
+        filters = json.dumps({str(self.dictionary.pk): [self.items[0].pk]})
+        compact = self.assertRoundTrip(filters=filters)
+        self.assertEqual(compact['step'], 1)
+        self.assertNotIn('offsets', compact)
+
+    def test_dates_with_offsets(self):
+        # Даты повторяются (несколько разрезов) и неравномерны (месяцы)
+        self.assertIn('offsets', self.assertRoundTrip())
+        self.assertIn('offsets', self.assertRoundTrip(aggregation='month'))
+
+    def test_groups(self):
+        compact = self.assertRoundTrip(group_by=self.dictionary.pk, aggregation='week')
+        self.assertEqual(len(compact['groups']), 2)
+
+    def test_empty(self):
+        self.indicator.values.all().delete()
+        compact = self.assertRoundTrip()
+        self.assertEqual(compact['values'], [])
+
+
+class PivotTests(IndicatorDataMixin, TestCase):
+    """Постраничная сводная таблица (keyset-курсор)"""
+
+    def setUp(self):
+        super().setUp()
+        # Одинаковые суммы у разных ячеек - проверка однозначного порядка
+        self.load(90, {self.items[0]: lambda day: 10, self.items[1]: lambda day: 10 if day < 30 else 20})
+        self.url = reverse('visualization:api_indicator_pivot', args=[self.indicator.pk])
+
+    def get_page(self, **params):
+        response = self.client.get(self.url, {'days_back': 120, 'group_by': self.dictionary.pk, 'aggregation': 'week', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_cover_all_cells(self):
+        for sort in ('period', '-period', 'value', '-value'):
+            with self.subTest(sort=sort):
+                full = self.get_page(sort=sort, page_size=1000)
+                self.assertIsNone(full['next_cursor'])
+                
+                rows = []
+                cursor = None
+                while True:
+                    params = {'sort': sort, 'page_size': 3}
+                    if cursor:
+                        params['cursor'] = json.dumps(cursor)
+                    page = self.get_page(**params)
+                    self.assertEqual(page['totals'] is None, cursor is not None)
+                    rows.extend(page['rows'])
+                    cursor = page['next_cursor']
+                    if cursor is None:
+                        break
+                
+                self.assertEqual(rows, full['rows'])
+                # Каждый период встречается в двух строках (по элементу справочника)
+                self.assertEqual(len({(row[0], row[1]) for row in rows}), len(rows))
+                self.assertEqual(len(rows), 2 * len({row[0] for row in rows}))
+
+    def test_bad_cursor(self):
+        for cursor in ('{', '5', '["2024-01-01"]', '["не дата", 1]', '["2024-01-01", "x"]'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'group_by': self.dictionary.pk, 'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(response.json()['error'], ('Некорректные параметры запроса', 'Некорректный курсор страницы'))
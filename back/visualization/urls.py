@@ -8,9 +8,15 @@ urlpatterns = [
     path('create/', views.dashboard_create, name='dashboard_create'),
     path('<int:pk>/', views.dashboard_detail, name='dashboard_detail'),
     path('<int:pk>/edit/', views.dashboard_edit, name='dashboard_edit'),
+    path('<int:pk>/events/', views.dashboard_events, name='dashboard_events'),
     path('<int:pk>/indicator/add/', views.dashboard_indicator_add, name='dashboard_indicator_add'),
     path('<int:pk>/indicator/<int:indicator_id>/update/', views.dashboard_indicator_update, name='dashboard_indicator_update'),
     path('<int:pk>/indicator/<int:indicator_id>/delete/', views.dashboard_indicator_delete, name='dashboard_indicator_delete'),
     path('api/indicator/<int:indicator_id>/data/', views.api_indicator_data, name='api_indicator_data'),
+    path('api/indicator/<int:indicator_id>/pivot/', views.api_indicator_pivot, name='api_indicator_pivot'),
+    path('api/indicator/<int:indicator_id>/ranking/', views.api_indicator_ranking, name='api_indicator_ranking'),
+    path('api/indicators/matrix/', views.api_indicators_matrix, name='api_indicators_matrix'),
+    path('api/status-summary/', views.api_status_summary, name='api_status_summary'),
+    path('api/indicators/versions/', views.api_data_versions, name='api_data_versions'),
 ]
 
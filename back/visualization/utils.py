@@ -1,13 +1,102 @@
 from datetime import date, timedelta
-from django.db.models import Q
-from indicators.models import Indicator, IndicatorValue
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Q, Sum, Avg, Min, Max, Count, F, Window, DateField, FloatField
+from django.db.models.functions import RowNumber, Round, Trunc
+from indicators.models import Indicator, IndicatorValue, IndicatorDictionary, IndicatorDataVersion
+from indicators.filters import filter_by_dictionary_items, dimension_key_matches
+from indicators.cumulative import with_cumulative
+from indicators.status import STATUS_CODES, STATUS_RED, get_statuses
+from indicators.formula_parser import get_prev_period_date, get_period_range
+from indicators.rollups import ROLLUP_PERIODS, VALUE_QUANTUM, get_rollup_series
+from indicators.versioning import get_data_version
+from bisect import bisect_left
+from dictionaries.models import DictionaryItem
+import hashlib
 import json
+import warnings
+import numpy as np
+
+
+# Ключ счетчика поколений справочников: увеличивается при любом изменении
+# справочников, их элементов или привязок к показателям (см. signals.py)
+DICTIONARIES_GENERATION_KEY = 'visualization:dictionaries:generation'
+DASHBOARD_FILTERS_TIMEOUT = 60 * 60
+STATUS_SUMMARY_TIMEOUT = 60 * 60
+RANKING_TIMEOUT = 60 * 60
+
+
+def bump_dictionaries_generation():
+    """Инвалидирует закэшированные панели фильтров всех дашбордов"""
+    try:
+        cache.incr(DICTIONARIES_GENERATION_KEY)
+    except ValueError:
+        cache.set(DICTIONARIES_GENERATION_KEY, 1, None)
+
+
+def get_dashboard_filter_dictionaries(dashboard_id, indicator_ids):
+    """
+    Собирает справочники для общей панели фильтров дашборда.
+    
+    Справочники всех показателей панели и их активные элементы загружаются
+    двумя запросами и объединяются в памяти. Результат кэшируется для
+    дашборда; ключ кэша зависит от набора показателей на панели и поколения
+    справочников, поэтому изменение панели или справочников его сбрасывает.
+    
+    Args:
+        dashboard_id: ID дашборда
+        indicator_ids: список ID показателей в порядке панелей
+    
+    Returns:
+        dict вида {dictionary_id: {'dictionary': Dictionary, 'items': [DictionaryItem, ...]}}
+    """
+    generation = cache.get(DICTIONARIES_GENERATION_KEY, 0)
+    panels_hash = hashlib.md5(','.join(str(i) for i in indicator_ids).encode()).hexdigest()
+    cache_key = f'visualization:dashboard:{dashboard_id}:filters:{generation}:{panels_hash}'
+    
+    all_dictionaries = cache.get(cache_key)
+    if all_dictionaries is not None:
+        return all_dictionaries
+    
+    # Запрос 1: справочники всех показателей панели
+    dictionaries_by_indicator = {}
+    indicator_dicts = IndicatorDictionary.objects.filter(
+        indicator_id__in=indicator_ids,
+        dictionary__is_active=True
+    ).select_related('dictionary')
+    for ind_dict in indicator_dicts:
+        dictionaries_by_indicator.setdefault(ind_dict.indicator_id, []).append(ind_dict.dictionary)
+    
+    # Сохраняем порядок: по панелям, внутри панели - по порядку привязки справочников
+    all_dictionaries = {}
+    for indicator_id in indicator_ids:
+        for dictionary in dictionaries_by_indicator.get(indicator_id, []):
+            if dictionary.id not in all_dictionaries:
+                all_dictionaries[dictionary.id] = {
+                    'dictionary': dictionary,
+                    'items': []
+                }
+    
+    # Запрос 2: активные элементы всех найденных справочников
+    if all_dictionaries:
+        items = DictionaryItem.objects.filter(
+            dictionary_id__in=list(all_dictionaries.keys()),
+            is_active=True
+        ).order_by('name')
+        for item in items:
+            all_dictionaries[item.dictionary_id]['items'].append(item)
+    
+    cache.set(cache_key, all_dictionaries, DASHBOARD_FILTERS_TIMEOUT)
+    return all_dictionaries
 
 
 def apply_dictionary_filters(values_query, dictionary_filters):
     """
     Применяет фильтры по справочникам к запросу значений показателей.
     
+    Каждый справочник превращается в один коррелированный EXISTS-подзапрос
+    (см. indicators.filters), поэтому результат не требует DISTINCT.
+    
     Args:
         values_query: QuerySet значений показателей
         dictionary_filters: dict с фильтрами вида {dictionary_id: [item_id1, item_id2, ...]}
@@ -15,21 +104,164 @@ def apply_dictionary_filters(values_query, dictionary_filters):
     Returns:
         Отфильтрованный QuerySet
     """
+    return filter_by_dictionary_items(values_query, normalize_dictionary_filters(dictionary_filters))
+
+
+def normalize_dictionary_filters(dictionary_filters):
+    """
+    Нормализует фильтры по справочникам: для каждого справочника - список
+    целочисленных ID элементов (пустые и некорректные фильтры отбрасываются).
+    
+    Args:
+        dictionary_filters: dict с фильтрами вида {dictionary_id: [item_id1, item_id2, ...]}
+    
+    Returns:
+        dict: {dictionary_id: [int, ...]}
+    """
+    selected_items_by_dict = {}
     if not dictionary_filters or not isinstance(dictionary_filters, dict):
-        return values_query
+        return selected_items_by_dict
     
-    # Применяем фильтры: для каждого справочника фильтруем по выбранным элементам
     for dict_id, item_ids in dictionary_filters.items():
         if item_ids and isinstance(item_ids, list):
             try:
                 # Преобразуем ID в int, если они строки
                 item_ids = [int(item_id) for item_id in item_ids if item_id]
                 if item_ids:
-                    values_query = values_query.filter(dictionary_items__id__in=item_ids)
+                    selected_items_by_dict[dict_id] = item_ids
             except (ValueError, TypeError):
                 continue
+    return selected_items_by_dict
+
+
+def get_status_summary(days_back=30, use_cache=True):
+    """
+    Сводка статусов по всем показателям.
+    
+    Последние значения по каждой паре (показатель, разрез) и количество
+    красных точек за период считаются одним запросом: оконная функция
+    ROW_NUMBER() OVER (PARTITION BY indicator, dimension_key ORDER BY date DESC)
+    отбирает последние значения, а оконный COUNT с фильтром по статусу
+    считает красные точки показателя. Статусы берутся из сохраненного
+    столбца IndicatorValue.status.
+    
+    Результат кэшируется до следующей записи значений: ключ кэша строится
+    по версиям данных показателей.
+    
+    Args:
+        days_back: период (дней) для подсчета красных точек
+        use_cache: использовать кэш
+    
+    Returns:
+        dict:
+            - indicators: список {'id', 'name', 'unit', 'status', 'latest_date',
+              'latest': количество последних значений разрезов по статусам,
+              'red_count': красных точек за период}
+            - totals: количество показателей по статусам
+    """
+    stamp = IndicatorDataVersion.objects.aggregate(
+        count=Count('pk'), total=Sum('version'), changed=Max('updated_at')
+    )
+    cache_key = 'visualization:status_summary:{}:{}:{}:{}'.format(
+        days_back, stamp['count'], stamp['total'] or 0,
+        stamp['changed'].timestamp() if stamp['changed'] else 0
+    )
+    summary = cache.get(cache_key) if use_cache else None
+    if summary is not None:
+        return summary
+    
+    start_date, _ = get_date_window(days_back)
+    
+    latest_rows = IndicatorValue.objects.annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('indicator_id'), F('dimension_key')],
+            order_by=[F('date').desc(), F('pk').desc()]
+        ),
+        red_count=Window(
+            expression=Count('pk', filter=Q(status=STATUS_RED, date__gte=start_date)),
+            partition_by=[F('indicator_id')]
+        )
+    ).filter(row_number=1).values_list('indicator_id', 'date', 'status', 'red_count')
+    
+    by_indicator = {}
+    for indicator_id, value_date, status, red_count in latest_rows:
+        item = by_indicator.setdefault(indicator_id, {
+            'status': status,
+            'latest_date': value_date,
+            'latest': dict.fromkeys(STATUS_CODES, 0),
+            'red_count': red_count
+        })
+        item['latest'][STATUS_CODES[status]] += 1
+        # Статус показателя - худший из последних статусов разрезов
+        item['status'] = max(item['status'], status)
+        item['latest_date'] = max(item['latest_date'], value_date)
+    
+    indicators = []
+    totals = dict.fromkeys(STATUS_CODES, 0)
+    for indicator in Indicator.objects.select_related('unit').order_by('name'):
+        item = by_indicator.get(indicator.id)
+        status = STATUS_CODES[item['status']] if item else 'gray'
+        totals[status] += 1
+        indicators.append({
+            'id': indicator.id,
+            'name': indicator.name,
+            'unit': indicator.unit.symbol,
+            'status': status,
+            'latest_date': item['latest_date'].isoformat() if item else None,
+            'latest': item['latest'] if item else dict.fromkeys(STATUS_CODES, 0),
+            'red_count': item['red_count'] if item else 0
+        })
+    
+    summary = {'days_back': days_back, 'indicators': indicators, 'totals': totals}
+    cache.set(cache_key, summary, STATUS_SUMMARY_TIMEOUT)
+    return summary
+
+
+def get_period_start(value_date, period):
+    """
+    Возвращает дату начала периода, в который попадает дата.
     
-    return values_query.distinct()
+    Args:
+        value_date: дата (date)
+        period: 'day', 'week', 'month', 'quarter', 'year'
+    
+    Returns:
+        date: первый день периода (для недели - понедельник)
+    """
+    if period == 'week':
+        return value_date - timedelta(days=value_date.weekday())
+    elif period == 'month':
+        return date(value_date.year, value_date.month, 1)
+    elif period == 'quarter':
+        quarter_month = ((value_date.month - 1) // 3) * 3 + 1
+        return date(value_date.year, quarter_month, 1)
+    elif period == 'year':
+        return date(value_date.year, 1, 1)
+    return value_date
+
+
+def get_date_window(days_back=30, end_date=None):
+    """
+    Определяет окно дат для выборки данных.
+    
+    Args:
+        days_back: количество дней назад от сегодняшней даты
+        end_date: конечная дата (строка ISO, date или None)
+    
+    Returns:
+        tuple: (start_date, end_date), end_date может быть None
+    """
+    start_date = date.today() - timedelta(days=days_back)
+    
+    # Парсим end_date если передан как строка
+    if end_date and isinstance(end_date, str):
+        try:
+            end_date = date.fromisoformat(end_date)
+        except (ValueError, TypeError):
+            end_date = None
+    
+    return start_date, end_date or None
 
 
 def aggregate_by_period(values, period):
@@ -62,19 +294,7 @@ def aggregate_by_period(values, period):
     
     for value in values:
         # Определяем ключ периода
-        if period == 'week':
-            # Первый день недели (понедельник)
-            week_start = value.date - timedelta(days=value.date.weekday())
-            period_key = week_start
-        elif period == 'month':
-            period_key = date(value.date.year, value.date.month, 1)
-        elif period == 'quarter':
-            quarter_month = ((value.date.month - 1) // 3) * 3 + 1
-            period_key = date(value.date.year, quarter_month, 1)
-        elif period == 'year':
-            period_key = date(value.date.year, 1, 1)
-        else:
-            period_key = value.date
+        period_key = get_period_start(value.date, period)
         
         # Агрегируем (используем среднее значение)
         if period_key not in aggregated:
@@ -101,7 +321,220 @@ def aggregate_by_period(values, period):
     return result
 
 
-def get_indicator_data(indicator, days_back=30, aggregation_period=None, dictionary_filters=None, end_date=None, cumulative=False):
+def aggregate_with_rollups(indicator, period, start_date, end_date=None, dictionary_filters=None):
+    """
+    Агрегирует значения показателя по периоду с использованием итогов (IndicatorRollup).
+    
+    Периоды, целиком попадающие в окно, берутся из итогов (строка на разрез и
+    период), дневные значения читаются только для неполных первого и последнего
+    периодов окна. Результат совпадает с aggregate_by_period по тем же значениям.
+    Неполные периоды до границы сжатия (Indicator.compacted_before, см.
+    indicators.retention) дневных значений не имеют и берутся из итогов целиком.
+    
+    Args:
+        indicator: объект Indicator
+        period: 'month', 'quarter' или 'year' (см. rollups.ROLLUP_PERIODS)
+        start_date: начальная дата окна
+        end_date: конечная дата окна (None - без ограничения)
+        dictionary_filters: фильтры по справочникам (dict)
+    
+    Returns:
+        Список словарей с ключами: date, value, count
+    """
+    selected_items_by_dict = normalize_dictionary_filters(dictionary_filters)
+    
+    # Полные периоды окна: [first_full, last_full)
+    compacted_before = indicator.compacted_before
+    first_full = get_period_start(start_date, period)
+    if first_full < start_date and not (compacted_before and start_date < compacted_before):
+        first_full = get_period_range(start_date, period)[1] + timedelta(days=1)
+    last_full = None
+    if end_date:
+        last_full = get_period_start(end_date, period)
+        if get_period_range(end_date, period)[1] == end_date or (compacted_before and end_date < compacted_before):
+            last_full = get_period_range(end_date, period)[1] + timedelta(days=1)
+    
+    totals = {}
+    if last_full is None or first_full < last_full:
+        for period_start, dimension_key, value_sum, value_count in get_rollup_series(
+            indicator.pk, period, first_full, last_full
+        ):
+            if not dimension_key_matches(dimension_key, selected_items_by_dict):
+                continue
+            total = totals.setdefault(period_start, [Decimal('0'), 0])
+            total[0] += value_sum
+            total[1] += value_count
+    
+    result = [
+        {'date': period_start, 'value': float(value_sum) / value_count, 'count': value_count}
+        for period_start, (value_sum, value_count) in totals.items()
+    ]
+    
+    # Неполные периоды на краях окна - по дневным значениям
+    edges = []
+    if start_date < first_full:
+        head_end = first_full - timedelta(days=1)
+        edges.append((start_date, min(head_end, end_date) if end_date else head_end))
+    if last_full is not None and first_full <= last_full <= end_date:
+        edges.append((last_full, end_date))
+    for edge_start, edge_end in edges:
+        values_query = filter_by_dictionary_items(IndicatorValue.objects.filter(
+            indicator=indicator,
+            date__gte=edge_start,
+            date__lte=edge_end
+        ), selected_items_by_dict).order_by('date')
+        result.extend(aggregate_by_period(list(values_query), period))
+    
+    return sorted(result, key=lambda item: item['date'])
+
+
+def get_compacted_points(indicator, start_date, end_date=None, dictionary_filters=None, segment_start=None):
+    """
+    Точки показателя за сжатые даты (до Indicator.compacted_before, см. indicators.retention).
+    
+    Дневных значений за эти даты нет - каждый месяц итогов (IndicatorRollup)
+    дает по одной точке на разрез со средним значением месяца.
+    
+    Args:
+        indicator: объект Indicator
+        start_date: начальная дата окна
+        end_date: конечная дата окна (None - без ограничения)
+        dictionary_filters: фильтры по справочникам (dict)
+        segment_start: дата, с которой нарастающий итог начинается заново (см. with_cumulative)
+    
+    Returns:
+        Список несохраненных IndicatorValue (дата - начало месяца, но не раньше
+        start_date) с cumulative_value - нарастающим итогом сумм месяцев по разрезу
+    """
+    start_before = indicator.compacted_before
+    if not start_before or start_date >= start_before:
+        return []
+    if end_date and end_date < start_before:
+        start_before = end_date + timedelta(days=1)
+    selected_items_by_dict = normalize_dictionary_filters(dictionary_filters)
+    
+    points = []
+    totals = {}
+    for period_start, dimension_key, value_sum, value_count in get_rollup_series(
+        indicator.pk, 'month', get_period_start(start_date, 'month'), start_before
+    ):
+        if not dimension_key_matches(dimension_key, selected_items_by_dict):
+            continue
+        point_date = max(period_start, start_date)
+        if segment_start and period_start < segment_start <= get_period_range(period_start, 'month')[1]:
+            # Месяц, в котором начинается новый отрезок итога, относится к нему
+            point_date = segment_start
+        segment = (dimension_key, bool(segment_start) and point_date >= segment_start)
+        totals[segment] = totals.get(segment, Decimal('0')) + value_sum
+        point = IndicatorValue(
+            indicator=indicator,
+            date=point_date,
+            dimension_key=dimension_key,
+            value=(value_sum / value_count).quantize(VALUE_QUANTUM)
+        )
+        point.cumulative_value = totals[segment]
+        points.append(point)
+    return points
+
+
+def downsample_lttb(x, y, max_points):
+    """
+    Прореживает ряд алгоритмом Largest-Triangle-Three-Buckets (LTTB).
+    
+    Первая и последняя точки сохраняются всегда, остальные делятся на
+    max_points - 2 корзины, из каждой выбирается точка, образующая треугольник
+    наибольшей площади с выбранной точкой предыдущей корзины и средней точкой
+    следующей. Площади внутри корзины считаются векторно средствами NumPy.
+    
+    Args:
+        x: последовательность координат X (например, порядковые номера дат)
+        y: последовательность значений
+        max_points: максимальное количество точек в результате
+    
+    Returns:
+        numpy.ndarray с индексами выбранных точек (по возрастанию)
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    
+    if max_points is None or max_points >= n:
+        return np.arange(n)
+    if max_points < 3:
+        # Корзин нет - остаются крайние точки
+        return np.array([0, n - 1][:max(max_points, 0)], dtype=int)
+    
+    # Границы корзин для всех точек, кроме первой и последней
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    
+    selected = np.empty(max_points, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        
+        # Средняя точка следующей корзины (для последней корзины - последняя точка ряда)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        if next_end <= next_start:
+            next_end = next_start + 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        
+        # Удвоенные площади треугольников (a, кандидат, среднее следующей корзины)
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) -
+            (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    
+    return selected
+
+
+def downsample_by_dimension(x, y, keys, max_points):
+    """
+    Прореживает ряд, в котором чередуются точки нескольких разрезов: LTTB
+    применяется к ряду каждого разреза отдельно.
+    
+    Точки распределяются между разрезами пропорционально их длине (остаток -
+    разрезам с наибольшей дробной частью), так что всего остается не больше
+    max_points точек.
+    
+    Args:
+        x: последовательность координат X
+        y: последовательность значений
+        keys: ключ разреза каждой точки
+        max_points: максимальное количество точек в результате
+    
+    Returns:
+        numpy.ndarray с индексами выбранных точек (по возрастанию)
+    """
+    n = len(y)
+    if max_points is None or max_points >= n:
+        return np.arange(n)
+    
+    series = {}
+    for index, key in enumerate(keys):
+        series.setdefault(key, []).append(index)
+    
+    shares = {key: max_points * len(indices) / n for key, indices in series.items()}
+    budgets = {key: int(share) for key, share in shares.items()}
+    remainder = max_points - sum(budgets.values())
+    for key in sorted(shares, key=lambda key: shares[key] - budgets[key], reverse=True)[:remainder]:
+        budgets[key] += 1
+    
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    selected = []
+    for key, indices in series.items():
+        indices = np.asarray(indices)
+        selected.append(indices[downsample_lttb(x[indices], y[indices], budgets[key])])
+    return np.sort(np.concatenate(selected))
+
+
+def get_indicator_data(indicator, days_back=30, aggregation_period=None, dictionary_filters=None, end_date=None, cumulative=False, max_points=None, compare=None):
     """
     Получает данные показателя для визуализации.
     
@@ -111,81 +544,890 @@ def get_indicator_data(indicator, days_back=30, aggregation_period=None, diction
         aggregation_period: период агрегации ('day', 'week', 'month', 'quarter', 'year')
         dictionary_filters: фильтры по справочникам (dict)
         end_date: конечная дата (строка ISO или date объект)
+        cumulative: рассчитывать нарастающий итог
+        max_points: максимальное количество точек; более длинные ряды
+                    прореживаются алгоритмом LTTB (None - без прореживания)
+        compare: 'prev_year' или 'prev_period' - добавить ряд сравнения
+                 с тем же периодом год назад или с предыдущим периодом
     
     Returns:
         dict с ключами:
             - dates: список дат (ISO формат)
             - values: список значений
             - statuses: список статусов (green/yellow/red) если пороговые значения заданы
+            - total_points: количество точек до прореживания
+            - downsampled: True, если ряд был прорежен
+            - compare: значения ряда сравнения, выровненные по dates
+              (только если задан compare; None - нет значения)
+        Нарастающий итог по дням (cumulative без агрегации и без compare) при
+        нескольких разрезах возвращается рядами разрезов, как в
+        get_indicator_breakdown: groups [{'id': ключ разреза, 'name', 'values',
+        'statuses'}] вместо values и statuses.
     """
-    # Вычисляем дату начала
-    start_date = date.today() - timedelta(days=days_back)
+    # Вычисляем окно дат
+    start_date, end_date = get_date_window(days_back, end_date)
     
-    # Парсим end_date если передан как строка
-    if end_date and isinstance(end_date, str):
-        try:
-            end_date = date.fromisoformat(end_date)
-        except (ValueError, TypeError):
-            end_date = None
-    
-    # Получаем значения показателя
-    values_query = IndicatorValue.objects.filter(
-        indicator=indicator,
-        date__gte=start_date
-    )
-    
-    # Применяем фильтр по конечной дате
-    if end_date:
-        values_query = values_query.filter(date__lte=end_date)
+    aggregated = bool(aggregation_period and aggregation_period != 'day')
     
-    values_query = values_query.prefetch_related('dictionary_items').order_by('date')
+    # Сдвиг ряда сравнения - та же логика периодов, что у функции PREV в формулах
+    offset = None
+    if compare == 'prev_year':
+        offset = 'year'
+    elif compare == 'prev_period':
+        offset = aggregation_period if aggregated else 'day'
     
-    # Применяем фильтры по справочникам
-    if dictionary_filters:
-        values_query = apply_dictionary_filters(values_query, dictionary_filters)
+    # Ряд сравнения читается тем же запросом: окно расширяется назад на сдвиг
+    query_start = start_date
+    if offset:
+        query_start = get_prev_period_date(start_date, offset)
+        if aggregated:
+            query_start = get_period_start(query_start, aggregation_period)
     
-    # Получаем все значения
-    values = list(values_query)
+    # Агрегация по месяцам, кварталам и годам - по итогам периодов (IndicatorRollup),
+    # дневные значения читаются только для неполных периодов на краях окна
+    use_rollups = aggregated and aggregation_period in ROLLUP_PERIODS
+    if use_rollups:
+        aggregated_data = aggregate_with_rollups(
+            indicator, aggregation_period, start_date, end_date, dictionary_filters
+        )
+    else:
+        # Получаем значения показателя
+        values_query = IndicatorValue.objects.filter(
+            indicator=indicator,
+            date__gte=query_start
+        )
+        
+        # Применяем фильтр по конечной дате
+        if end_date:
+            values_query = values_query.filter(date__lte=end_date)
+        
+        values_query = values_query.order_by('date')
+        
+        # Применяем фильтры по справочникам
+        if dictionary_filters:
+            values_query = apply_dictionary_filters(values_query, dictionary_filters)
+        
+        # Дневные значения до границы сжатия (см. indicators.retention) заменяются
+        # точками по месяцам из итогов
+        segment_start = start_date if offset else None
+        compacted = get_compacted_points(indicator, query_start, end_date, dictionary_filters, segment_start)
+        if indicator.compacted_before and query_start < indicator.compacted_before:
+            values_query = values_query.filter(date__gte=indicator.compacted_before)
+        
+        # Нарастающий итог по каждой комбинации справочников (оконная функция в SQL);
+        # для ряда сравнения итог начинается заново с начала расширенного окна
+        if cumulative and not aggregated:
+            values_query = with_cumulative(values_query, segment_start=segment_start)
+        
+        # Получаем все значения
+        rows = list(values_query)
+        if compacted:
+            if cumulative and not aggregated:
+                # Итог дневных значений продолжает итог сжатых месяцев того же отрезка
+                carried = {
+                    (v.dimension_key, bool(segment_start) and v.date >= segment_start): v.cumulative_value
+                    for v in compacted
+                }
+                for v in rows:
+                    v.cumulative_value += carried.get(
+                        (v.dimension_key, bool(segment_start) and v.date >= segment_start), Decimal('0')
+                    )
+            rows = compacted + rows
+        values = [v for v in rows if v.date >= start_date] if offset else rows
+        if aggregated:
+            aggregated_data = aggregate_by_period(values, aggregation_period)
     
     # Агрегируем по периоду, если указан
-    if aggregation_period and aggregation_period != 'day':
-        aggregated_data = aggregate_by_period(values, aggregation_period)
+    if aggregated:
         dates = [item['date'] for item in aggregated_data]
         values_list = [item['value'] for item in aggregated_data]
+    elif cumulative:
+        dates = [v.date for v in values]
+        values_list = [float(v.cumulative_value) for v in values]
     else:
         dates = [v.date for v in values]
         values_list = [float(v.value) for v in values]
     
     # Если нет данных, возвращаем пустые списки
     if not dates or not values_list:
-        return {
+        empty = {
             'dates': [],
             'values': [],
-            'statuses': None
+            'statuses': None,
+            'total_points': 0,
+            'downsampled': False
         }
+        if offset:
+            empty['compare'] = []
+        return empty
+    
+    # Выравниваем ряд сравнения по датам текущего ряда
+    compare_values = None
+    if offset:
+        if aggregated:
+            if use_rollups:
+                compare_data = aggregate_with_rollups(
+                    indicator, aggregation_period, query_start, end_date, dictionary_filters
+                )
+            else:
+                compare_data = aggregate_by_period(rows, aggregation_period)
+            by_period = {item['date']: item['value'] for item in compare_data}
+            compare_values = [
+                by_period.get(get_period_start(get_prev_period_date(d, offset), aggregation_period))
+                for d in dates
+            ]
+        else:
+            by_dimension = {
+                (v.date, v.dimension_key): float(v.cumulative_value if cumulative else v.value)
+                for v in rows
+            }
+            # Сжатые даты - по точке месяца (см. get_compacted_points)
+            by_month = {
+                (get_period_start(v.date, 'month'), v.dimension_key): float(v.cumulative_value if cumulative else v.value)
+                for v in compacted
+            }
+            compare_values = []
+            for v in values:
+                prev_date = get_prev_period_date(v.date, offset)
+                value = by_dimension.get((prev_date, v.dimension_key))
+                if value is None and compacted and prev_date < indicator.compacted_before:
+                    value = by_month.get((get_period_start(prev_date, 'month'), v.dimension_key))
+                compare_values.append(value)
+    
+    # Агрегированный ряд - один, нарастающий итог считается по периодам
+    if cumulative and aggregated:
+        values_list = np.cumsum(values_list).tolist()
+        if compare_values is not None:
+            column = np.array([np.nan if v is None else v for v in compare_values], dtype=float)
+            present = ~np.isnan(column)
+            column[present] = np.cumsum(column[present])
+            compare_values = [None if np.isnan(v) else float(v) for v in column]
+    
+    # Определяем статусы (векторно), если пороговые значения заданы
+    statuses = get_statuses(indicator, values_list)
+    
+    # Прореживаем длинные ряды. Статусы рассчитаны по исходным значениям,
+    # поэтому у оставшихся точек сохраняются их настоящие цвета порогов.
+    # Дневной ряд чередует точки разрезов - каждый разрез прореживается отдельно.
+    total_points = len(values_list)
+    downsampled = bool(max_points) and total_points > max_points
+    if downsampled:
+        x = [d.toordinal() for d in dates]
+        if aggregated:
+            indices = downsample_lttb(x, values_list, max_points)
+        else:
+            indices = downsample_by_dimension(x, values_list, [v.dimension_key for v in values], max_points)
+        dates = [dates[i] for i in indices]
+        values_list = [values_list[i] for i in indices]
+        if statuses is not None:
+            statuses = [statuses[i] for i in indices]
+        if compare_values is not None:
+            compare_values = [compare_values[i] for i in indices]
+    
+    # Нарастающий итог по дням считается по каждому разрезу отдельно: несколько
+    # разрезов возвращаются отдельными рядами, а не одним рядом с чередующимися точками
+    if cumulative and not aggregated and compare_values is None:
+        keys = [v.dimension_key for v in values]
+        if downsampled:
+            keys = [keys[i] for i in indices]
+        if len(set(keys)) > 1:
+            data = group_by_dimension(indicator, dates, values_list, statuses, keys)
+            data.update(total_points=total_points, downsampled=downsampled)
+            return data
+    
+    data = {
+        'dates': [d.isoformat() for d in dates],
+        'values': values_list,
+        'statuses': statuses,
+        'total_points': total_points,
+        'downsampled': downsampled
+    }
+    if compare_values is not None:
+        data['compare'] = compare_values
+    return data
+
+
+
+def get_indicator_breakdown(indicator, group_by, days_back=30, aggregation_period=None, dictionary_filters=None, end_date=None, cumulative=False):
+    """
+    Получает данные показателя в разрезе элементов одного справочника.
     
-    # Рассчитываем нарастающий итог, если включено
-    if cumulative:
-        cumulative_values = []
-        running_total = 0
-        for val in values_list:
-            running_total += val
-            cumulative_values.append(running_total)
-        values_list = cumulative_values
-    
-    # Определяем статусы, если пороговые значения заданы
-    statuses = None
-    if indicator.unacceptable_value is not None and \
-       indicator.acceptable_value is not None and \
-       indicator.good_value is not None:
-        statuses = []
-        for val in values_list:
-            status = indicator.get_value_status(val)
-            statuses.append(status if status else 'gray')
+    Все ряды строятся одним сгруппированным запросом по таблице связи значений
+    с элементами справочника: для каждой пары (дата, элемент) значения по
+    остальным разрезам суммируются. Агрегация по периоду (среднее) и
+    нарастающий итог применяются к каждому ряду отдельно.
+    
+    Args:
+        indicator: объект Indicator
+        group_by: ID справочника, по элементам которого строятся ряды
+        days_back, aggregation_period, dictionary_filters, end_date, cumulative:
+            как в get_indicator_data
+    
+    Returns:
+        dict в колоночном формате:
+            - dates: общая ось дат (ISO формат)
+            - groups: список рядов {'id', 'name', 'values', 'statuses'},
+              values выровнены по dates (None - нет значения)
+    """
+    start_date, end_date = get_date_window(days_back, end_date)
+    
+    values_query = IndicatorValue.objects.filter(
+        indicator=indicator,
+        date__gte=start_date
+    )
+    if end_date:
+        values_query = values_query.filter(date__lte=end_date)
+    if dictionary_filters:
+        values_query = apply_dictionary_filters(values_query, dictionary_filters)
+    
+    # Один сгруппированный запрос: сумма значений по (элемент справочника, дата)
+    through = IndicatorValue.dictionary_items.through
+    rows = through.objects.filter(
+        indicatorvalue__in=values_query.values('pk'),
+        dictionaryitem__dictionary_id=group_by
+    ).values_list(
+        'dictionaryitem_id', 'indicatorvalue__date'
+    ).annotate(
+        total=Sum('indicatorvalue__value')
+    ).order_by('indicatorvalue__date')
+    
+    period = aggregation_period if aggregation_period and aggregation_period != 'day' else None
+    
+    # Раскладываем по периодам: {item_id: {period_start: [daily values]}}
+    series = {}
+    all_dates = set()
+    for item_id, value_date, total in rows:
+        period_key = get_period_start(value_date, period) if period else value_date
+        series.setdefault(item_id, {}).setdefault(period_key, []).append(float(total))
+        all_dates.add(period_key)
+    
+    dates = sorted(all_dates)
+    if not dates:
+        return {'dates': [], 'groups': []}
+    
+    date_index = {d: i for i, d in enumerate(dates)}
+    
+    items = DictionaryItem.objects.filter(pk__in=list(series.keys())).order_by('sort_order', 'name')
+    groups = []
+    for item in items:
+        column = np.full(len(dates), np.nan)
+        for period_key, daily_values in series[item.id].items():
+            column[date_index[period_key]] = sum(daily_values) / len(daily_values)
+        
+        if cumulative:
+            present = ~np.isnan(column)
+            column[present] = np.cumsum(column[present])
+        
+        values_list = [None if np.isnan(v) else float(v) for v in column]
+        statuses = get_statuses(indicator, values_list)
+        
+        groups.append({
+            'id': item.id,
+            'name': item.name,
+            'values': values_list,
+            'statuses': statuses
+        })
     
     return {
         'dates': [d.isoformat() for d in dates],
+        'groups': groups
+    }
+
+
+def get_changes_since(indicator_id, since):
+    """
+    Определяет, какая часть данных показателя изменилась с момента прошлого запроса клиента.
+    
+    Если изменений нет, ответ строится одним индексным запросом к версии данных показателя.
+    
+    Args:
+        indicator_id: ID показателя
+        since: версия данных из прошлого ответа (int) или дата (date),
+               начиная с которой клиенту нужны данные
+    
+    Returns:
+        dict:
+            - cursor: текущая версия данных (клиент передает ее в следующем запросе)
+            - unchanged: True - данные не изменились
+            - reset: True - значения удалялись, ряд нужно загрузить целиком
+            - from_date: дата, начиная с которой данные клиента устарели
+    """
+    version, reset_version = get_data_version(indicator_id) or (0, 0)
+    changes = {'cursor': version, 'unchanged': False, 'reset': False, 'from_date': None}
+    
+    if isinstance(since, date):
+        changes['from_date'] = since
+    elif since >= version:
+        changes['unchanged'] = True
+    elif since < reset_version:
+        changes['reset'] = True
+    else:
+        # Самая ранняя дата среди значений, созданных или измененных после версии клиента
+        changes['from_date'] = IndicatorValue.objects.filter(
+            indicator_id=indicator_id,
+            data_version__gt=since
+        ).aggregate(Min('date'))['date__min']
+        if changes['from_date'] is None:
+            changes['unchanged'] = True
+    
+    return changes
+
+
+def slice_data_from(data, from_date):
+    """
+    Оставляет в данных показателя только точки начиная с даты from_date.
+    
+    Args:
+        data: результат get_indicator_data или get_indicator_breakdown
+        from_date: первая дата, которую нужно оставить
+    
+    Returns:
+        dict того же формата с хвостом ряда (рядов)
+    """
+    start = bisect_left(data['dates'], from_date.isoformat())
+    sliced = dict(data, dates=data['dates'][start:])
+    
+    if 'groups' in data:
+        sliced['groups'] = [
+            dict(
+                group,
+                values=group['values'][start:],
+                statuses=group['statuses'][start:] if group['statuses'] is not None else None
+            )
+            for group in data['groups']
+        ]
+    else:
+        sliced['values'] = data['values'][start:]
+        if data['statuses'] is not None:
+            sliced['statuses'] = data['statuses'][start:]
+        if 'compare' in data:
+            sliced['compare'] = data['compare'][start:]
+    
+    return sliced
+
+
+def get_dimension_labels(indicator, keys):
+    """
+    Подписи разрезов: названия элементов справочников (одним запросом).
+    
+    Args:
+        indicator: объект Indicator (подпись значений без разреза - его название)
+        keys: ключи разрезов (IndicatorValue.dimension_key)
+    
+    Returns:
+        list: подписи в порядке keys
+    """
+    item_ids = {int(item_id) for key in keys for item_id in key.split(',') if item_id}
+    item_names = dict(DictionaryItem.objects.filter(pk__in=item_ids).values_list('pk', 'name'))
+    return [
+        ', '.join(item_names.get(int(item_id), item_id) for item_id in key.split(',') if item_id) or indicator.name
+        for key in keys
+    ]
+
+
+def group_by_dimension(indicator, dates, values, statuses, keys):
+    """
+    Раскладывает ряд с чередующимися точками разрезов на отдельные ряды.
+    
+    Args:
+        indicator: объект Indicator
+        dates: даты точек (date)
+        values: значения точек
+        statuses: статусы точек или None
+        keys: ключ разреза каждой точки
+    
+    Returns:
+        dict в формате get_indicator_breakdown: dates - общая ось дат, groups -
+        ряды {'id': ключ разреза, 'name', 'values', 'statuses'}, выровненные по dates
+    """
+    axis = sorted(set(dates))
+    date_index = {d: i for i, d in enumerate(axis)}
+    dimension_keys = sorted(set(keys))
+    groups = {
+        key: {
+            'id': key,
+            'name': label,
+            'values': [None] * len(axis),
+            'statuses': [None] * len(axis) if statuses is not None else None
+        }
+        for key, label in zip(dimension_keys, get_dimension_labels(indicator, dimension_keys))
+    }
+    for i, (point_date, key) in enumerate(zip(dates, keys)):
+        group = groups[key]
+        group['values'][date_index[point_date]] = values[i]
+        if statuses is not None:
+            group['statuses'][date_index[point_date]] = statuses[i]
+    
+    return {
+        'dates': [d.isoformat() for d in axis],
+        'groups': [groups[key] for key in dimension_keys]
+    }
+
+
+def get_latest_snapshot(indicator, dictionary_filters=None, end_date=None, per_dimension=False):
+    """
+    Получает последнее значение показателя (режим снимка для gauge и pie).
+    
+    Без разбивки выполняется поиск одной строки по индексу (indicator, date),
+    просматриваемому в обратном порядке.
+    С разбивкой берется последнее значение каждой комбинации справочников
+    (ROW_NUMBER() OVER (PARTITION BY dimension_key ORDER BY date DESC)).
+    
+    Args:
+        indicator: объект Indicator
+        dictionary_filters: фильтры по справочникам (dict)
+        end_date: дата, на которую строится снимок (строка ISO или date объект)
+        per_dimension: вернуть последнее значение каждого разреза
+    
+    Returns:
+        dict с ключами:
+            - snapshot: True (признак режима снимка)
+            - date: дата последнего значения (ISO формат)
+            - labels: подписи значений (названия элементов справочников разреза)
+            - values, statuses: значения и их статусы
+            - range: [минимум, максимум] шкалы индикатора
+    """
+    values_query = IndicatorValue.objects.filter(indicator=indicator)
+    if end_date:
+        if isinstance(end_date, str):
+            end_date = date.fromisoformat(end_date)
+        values_query = values_query.filter(date__lte=end_date)
+    if dictionary_filters:
+        values_query = apply_dictionary_filters(values_query, dictionary_filters)
+    
+    if per_dimension:
+        rows = list(values_query.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('dimension_key')],
+                order_by=[F('date').desc(), F('pk').desc()]
+            )
+        ).filter(row_number=1).order_by('dimension_key').values_list('dimension_key', 'date', 'value'))
+    else:
+        latest = values_query.order_by('-date', '-pk').values_list('dimension_key', 'date', 'value').first()
+        rows = [latest] if latest else []
+    
+    labels = get_dimension_labels(indicator, [key for key, _, _ in rows])
+    values_list = [float(value) for _, _, value in rows]
+    
+    # Шкала: границы показателя, иначе пороговые значения, иначе от нуля до значения
+    bounds = [
+        float(v) for v in (indicator.min_value, indicator.max_value,
+                           indicator.unacceptable_value, indicator.good_value)
+        if v is not None
+    ]
+    scale = bounds + values_list
+    value_range = [
+        float(indicator.min_value) if indicator.min_value is not None else min([0.0] + scale),
+        float(indicator.max_value) if indicator.max_value is not None else max([0.0] + scale)
+    ]
+    
+    return {
+        'snapshot': True,
+        'date': max(d for _, d, _ in rows).isoformat() if rows else None,
+        'labels': labels,
         'values': values_list,
-        'statuses': statuses
+        'statuses': get_statuses(indicator, values_list),
+        'range': value_range
     }
 
+
+def get_dimension_ranking(indicator, dictionary_id, func='sum', limit=10, descending=True,
+                          start_date=None, end_date=None, dictionary_filters=None, use_cache=True):
+    """
+    Рейтинг элементов справочника по сумме или среднему значению показателя.
+    
+    Считается одним сгруппированным запросом по таблице связи значений с
+    элементами справочника с ORDER BY и LIMIT в SQL. Результат кэшируется
+    с версией данных показателя в ключе, поэтому запись значений сразу
+    делает кэш неактуальным.
+    
+    Args:
+        indicator: объект Indicator
+        dictionary_id: ID справочника, элементы которого ранжируются
+        func: 'sum' или 'avg'
+        limit: количество элементов в рейтинге
+        descending: True - сначала наибольшие
+        start_date, end_date: период (date, None - без ограничения)
+        dictionary_filters: фильтры по другим справочникам (dict)
+        use_cache: использовать кэш
+    
+    Returns:
+        list: [{'id', 'name', 'value', 'count'}] в порядке рейтинга
+    """
+    cache_key = None
+    if use_cache:
+        version = (get_data_version(indicator.pk) or (0, 0))[0]
+        params = json.dumps(
+            [dictionary_id, func, limit, descending, str(start_date), str(end_date), dictionary_filters],
+            sort_keys=True, default=str
+        )
+        cache_key = 'visualization:ranking:{}:{}:{}'.format(
+            indicator.pk, version, hashlib.md5(params.encode()).hexdigest()
+        )
+        ranking = cache.get(cache_key)
+        if ranking is not None:
+            return ranking
+    
+    values_query = IndicatorValue.objects.filter(indicator=indicator)
+    if start_date:
+        values_query = values_query.filter(date__gte=start_date)
+    if end_date:
+        values_query = values_query.filter(date__lte=end_date)
+    if dictionary_filters:
+        values_query = apply_dictionary_filters(values_query, dictionary_filters)
+    
+    aggregate = Avg if func == 'avg' else Sum
+    rows = IndicatorValue.dictionary_items.through.objects.filter(
+        indicatorvalue__in=values_query.values('pk'),
+        dictionaryitem__dictionary_id=dictionary_id
+    ).values(
+        'dictionaryitem_id', 'dictionaryitem__name'
+    ).annotate(
+        result=Round(aggregate('indicatorvalue__value'), 4, output_field=FloatField()),
+        points=Count('pk')
+    ).order_by(
+        '-result' if descending else 'result', 'dictionaryitem__name'
+    )[:limit]
+    
+    ranking = [
+        {'id': row['dictionaryitem_id'], 'name': row['dictionaryitem__name'],
+         'value': row['result'], 'count': row['points']}
+        for row in rows
+    ]
+    
+    if cache_key:
+        cache.set(cache_key, ranking, RANKING_TIMEOUT)
+    return ranking
+
+
+def get_indicators_matrix(indicators, days_back=30, end_date=None, aggregation_period=None, dictionary_filters=None):
+    """
+    Строит выровненную матрицу значений нескольких показателей (даты x показатели).
+    
+    Все показатели читаются одним сгруппированным запросом: сумма значений по
+    (показатель, дата или начало периода) - разрезы справочников суммируются.
+    
+    Args:
+        indicators: список объектов Indicator (порядок столбцов)
+        days_back, end_date: окно дат, как в get_indicator_data
+        aggregation_period: период ('week', 'month', 'quarter', 'year'; None - по дням)
+        dictionary_filters: фильтры по справочникам (dict)
+    
+    Returns:
+        tuple: (список дат, np.ndarray формы (даты, показатели); NaN - нет значения)
+    """
+    start_date, end_date = get_date_window(days_back, end_date)
+    
+    values_query = IndicatorValue.objects.filter(
+        indicator__in=[indicator.pk for indicator in indicators],
+        date__gte=start_date
+    )
+    if end_date:
+        values_query = values_query.filter(date__lte=end_date)
+    if dictionary_filters:
+        values_query = apply_dictionary_filters(values_query, dictionary_filters)
+    
+    period = aggregation_period if aggregation_period in ('week', 'month', 'quarter', 'year') else 'day'
+    rows = list(values_query.annotate(
+        period=Trunc('date', period, output_field=DateField())
+    ).values_list('indicator_id', 'period').annotate(
+        total=Sum('value')
+    ).order_by())
+    
+    dates = sorted({row[1] for row in rows})
+    matrix = np.full((len(dates), len(indicators)), np.nan)
+    if rows:
+        column_index = {indicator.pk: i for i, indicator in enumerate(indicators)}
+        date_index = {d: i for i, d in enumerate(dates)}
+        row_positions = np.array([date_index[row[1]] for row in rows])
+        column_positions = np.array([column_index[row[0]] for row in rows])
+        matrix[row_positions, column_positions] = [float(row[2]) for row in rows]
+    
+    return dates, matrix
+
+
+def _rank_columns(matrix):
+    """Ранги значений по столбцам (средний ранг для одинаковых значений) для корреляции Спирмена"""
+    ranks = np.empty_like(matrix)
+    for j in range(matrix.shape[1]):
+        column = matrix[:, j]
+        order = np.argsort(column, kind='mergesort')
+        _, inverse, counts = np.unique(column[order], return_inverse=True, return_counts=True)
+        average_ranks = np.cumsum(counts) - (counts - 1) / 2
+        ranks[order, j] = average_ranks[inverse]
+    return ranks
+
+
+def correlation_matrix(matrix, method='pearson'):
+    """
+    Матрица корреляции столбцов по датам, на которые есть значения всех показателей.
+    
+    Args:
+        matrix: np.ndarray (даты x показатели), NaN - нет значения
+        method: 'pearson' или 'spearman'
+    
+    Returns:
+        tuple: (np.ndarray корреляций (NaN - не определена), количество использованных дат)
+    """
+    complete = matrix[~np.isnan(matrix).any(axis=1)]
+    size = matrix.shape[1]
+    if len(complete) < 2:
+        return np.full((size, size), np.nan), len(complete)
+    
+    if method == 'spearman':
+        complete = _rank_columns(complete)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = np.corrcoef(complete, rowvar=False)
+    return np.atleast_2d(correlation), len(complete)
+
+
+def matrix_stats(matrix):
+    """
+    Описательные статистики каждого столбца матрицы (пропуски не учитываются).
+    
+    Returns:
+        dict: {'count', 'mean', 'std', 'min', 'median', 'max'} - списки по показателям
+    """
+    count = (~np.isnan(matrix)).sum(axis=0)
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        # Столбцы без значений дают NaN (и предупреждение numpy)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        stats = {
+            'mean': np.nanmean(matrix, axis=0),
+            'std': np.nanstd(matrix, axis=0),
+            'min': np.nanmin(matrix, axis=0) if len(matrix) else np.full(matrix.shape[1], np.nan),
+            'median': np.nanmedian(matrix, axis=0),
+            'max': np.nanmax(matrix, axis=0) if len(matrix) else np.full(matrix.shape[1], np.nan),
+        }
+    result = {'count': count.tolist()}
+    result.update({key: to_json_list(values) for key, values in stats.items()})
+    return result
+
+
+def to_json_list(array):
+    """Преобразует массив numpy в список для JSON (NaN -> None, округление до 4 знаков)"""
+    return [None if np.isnan(v) else round(float(v), 4) for v in np.ravel(array)]
+
+
+PIVOT_PAGE_SIZE = 100
+PIVOT_MAX_PAGE_SIZE = 1000
+
+
+def get_pivot_page(indicator, aggregation_period='month', group_by=None, dictionary_filters=None,
+                   days_back=30, end_date=None, order_by='period', descending=False,
+                   page_size=PIVOT_PAGE_SIZE, cursor=None):
+    """
+    Страница сводной таблицы показателя: ячейки (период, элемент справочника).
+    
+    Ячейки считаются одним сгруппированным запросом (GROUP BY начало периода,
+    элемент справочника), сортировка и постраничная выборка выполняются в SQL.
+    Страницы выбираются по ключу (keyset): следующая страница начинается после
+    последней ячейки предыдущей, поэтому запрос не зависит от номера страницы.
+    
+    Args:
+        indicator: объект Indicator
+        aggregation_period: период ('day', 'week', 'month', 'quarter', 'year')
+        group_by: ID справочника для столбца элементов (None - без разреза)
+        dictionary_filters: фильтры по справочникам (dict)
+        days_back, end_date: окно дат, как в get_indicator_data
+        order_by: 'period' или 'value' - сортировка ячеек
+        descending: сортировка по убыванию
+        page_size: количество ячеек на странице
+        cursor: ключ последней ячейки предыдущей страницы (из next_cursor)
+    
+    Returns:
+        dict:
+            - rows: список [начало периода (ISO), ID элемента, название элемента, сумма, количество значений]
+            - totals: {'items': итоги по элементам [ID, название, сумма, количество],
+                       'total': общий итог, 'count': количество значений}
+                      (только на первой странице, для следующих - None)
+            - next_cursor: ключ для следующей страницы (None - страница последняя)
+    
+    Raises:
+        ValueError: курсор не соответствует сортировке или поврежден
+    """
+    start_date, end_date = get_date_window(days_back, end_date)
+    period = aggregation_period if aggregation_period in ('day', 'week', 'month', 'quarter', 'year') else 'month'
+    
+    values_query = IndicatorValue.objects.filter(indicator=indicator, date__gte=start_date)
+    if end_date:
+        values_query = values_query.filter(date__lte=end_date)
+    if dictionary_filters:
+        values_query = apply_dictionary_filters(values_query, dictionary_filters)
+    
+    # Ячейки группируются по таблице связи (с разрезом) или по самим значениям
+    if group_by:
+        cells = IndicatorValue.dictionary_items.through.objects.filter(
+            indicatorvalue__in=values_query.values('pk'),
+            dictionaryitem__dictionary_id=group_by
+        )
+        date_field, value_field, item_field = 'indicatorvalue__date', 'indicatorvalue__value', 'dictionaryitem_id'
+    else:
+        cells = values_query
+        date_field, value_field, item_field = 'date', 'value', None
+    
+    group_fields = ['period'] + (['item'] if item_field else [])
+    cells = cells.annotate(
+        period=Trunc(date_field, period, output_field=DateField()),
+        **({'item': F(item_field)} if item_field else {})
+    )
+    
+    # Итоги по элементам (или общий итог без разреза) - второй сгруппированный
+    # запрос, только для первой страницы
+    totals = {
+        'item_total': Round(Sum(value_field), 4, output_field=FloatField()),
+        'item_points': Count('pk')
+    }
+    if cursor:
+        totals_rows = None
+    elif item_field:
+        totals_rows = list(cells.values('item').annotate(**totals).order_by())
+    else:
+        totals_rows = [cells.aggregate(**totals)]
+    
+    cells = cells.values(*group_fields).annotate(
+        total=Round(Sum(value_field), 4, output_field=FloatField()),
+        points=Count('pk')
+    )
+    
+    # Порядок ячеек: ключ сортировки, затем период и элемент для однозначности
+    sort_fields = (['total'] if order_by == 'value' else []) + group_fields
+    cells = cells.order_by(*[f'-{field}' if descending else field for field in sort_fields])
+    
+    if cursor:
+        # Ячейки строго после ключа курсора в порядке сортировки
+        if not isinstance(cursor, list) or len(cursor) != len(sort_fields):
+            raise ValueError('Некорректный курсор страницы')
+        key = dict(zip(sort_fields, cursor))
+        try:
+            key['period'] = date.fromisoformat(key['period'])
+            if 'item' in key:
+                key['item'] = int(key['item'])
+            if 'total' in key:
+                key['total'] = float(key['total'])
+        except (TypeError, ValueError):
+            raise ValueError('Некорректный курсор страницы')
+        lookup = 'lt' if descending else 'gt'
+        condition = Q()
+        for i, field in enumerate(sort_fields):
+            condition |= Q(**{f: key[f] for f in sort_fields[:i]}, **{f'{field}__{lookup}': key[field]})
+        cells = cells.filter(condition)
+    
+    page_size = max(1, min(page_size, PIVOT_MAX_PAGE_SIZE))
+    page = list(cells[:page_size + 1])
+    has_next = len(page) > page_size
+    page = page[:page_size]
+    
+    item_names = {}
+    if item_field:
+        item_ids = {cell['item'] for cell in page} | {row['item'] for row in totals_rows or []}
+        item_names = dict(DictionaryItem.objects.filter(pk__in=item_ids).values_list('pk', 'name'))
+    
+    rows = [
+        [cell['period'].isoformat(), cell.get('item'), item_names.get(cell.get('item')), cell['total'], cell['points']]
+        for cell in page
+    ]
+    next_cursor = None
+    if has_next:
+        last = page[-1]
+        next_cursor = [last['period'].isoformat() if field == 'period' else last[field] for field in sort_fields]
+    
+    if totals_rows is not None:
+        totals_rows = [row for row in totals_rows if row['item_points']]
+        totals = {
+            'items': [
+                [row['item'], item_names.get(row['item']), row['item_total'], row['item_points']]
+                for row in sorted(totals_rows, key=lambda row: item_names.get(row['item'], ''))
+            ] if item_field else [],
+            'total': round(sum(row['item_total'] for row in totals_rows), 4),
+            'count': sum(row['item_points'] for row in totals_rows)
+        }
+    else:
+        totals = None
+    
+    return {
+        'rows': rows,
+        'totals': totals,
+        'next_cursor': next_cursor
+    }
+
+
+def _encode_dates(dates):
+    """
+    Кодирует ось дат как начальную дату и смещения в днях.
+    
+    Если даты идут с постоянным шагом, передается только шаг (step),
+    иначе - список смещений от начальной даты (offsets).
+    """
+    if not dates:
+        return {'start': None, 'step': None, 'offsets': []}
+    
+    ordinals = np.array([date.fromisoformat(d).toordinal() for d in dates])
+    offsets = ordinals - ordinals[0]
+    steps = np.diff(offsets)
+    
+    encoded = {'start': dates[0]}
+    if len(steps) and np.all(steps == steps[0]) and steps[0] > 0:
+        encoded['step'] = int(steps[0])
+        encoded['count'] = len(dates)
+    elif len(dates) == 1:
+        encoded['step'] = 1
+        encoded['count'] = 1
+    else:
+        encoded['offsets'] = offsets.tolist()
+    return encoded
+
+
+def _encode_values(values):
+    """Округляет значения до точности хранения (4 знака) для компактной передачи"""
+    return [round(v, 4) if v is not None else None for v in values]
+
+
+def _encode_statuses(statuses):
+    """Заменяет строковые статусы целочисленными кодами (см. STATUS_CODES)"""
+    if statuses is None:
+        return None
+    return [STATUS_CODES.index(s) if s is not None else None for s in statuses]
+
+
+def encode_compact(data):
+    """
+    Преобразует данные графика в компактный колоночный формат.
+    
+    Даты передаются начальной датой и шагом или смещениями в днях, значения -
+    одним массивом, статусы - небольшими целыми кодами. Подходит и для
+    одиночного ряда (get_indicator_data), и для разбивки (get_indicator_breakdown).
+    
+    Args:
+        data: dict, возвращенный get_indicator_data или get_indicator_breakdown
+    
+    Returns:
+        dict с ключами format, start, step/count или offsets, values/groups,
+        statuses и status_codes
+    """
+    encoded = {'format': 'compact', 'status_codes': STATUS_CODES}
+    encoded.update(_encode_dates(data['dates']))
+    
+    if 'groups' in data:
+        encoded['groups'] = [
+            {
+                'id': group['id'],
+                'name': group['name'],
+                'values': _encode_values(group['values']),
+                'statuses': _encode_statuses(group['statuses'])
+            }
+            for group in data['groups']
+        ]
+    else:
+        encoded['values'] = _encode_values(data['values'])
+        encoded['statuses'] = _encode_statuses(data['statuses'])
+        if 'compare' in data:
+            encoded['compare'] = _encode_values(data['compare'])
+    
+    for key in ('total_points', 'downsampled'):
+        if key in data:
+            encoded[key] = data[key]
+    
+    return encoded
@@ -1,26 +1,34 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.gzip import gzip_page
 from django.db.models import Q
 from .models import Dashboard, DashboardIndicator
 from indicators.models import Indicator, IndicatorDictionary
-from .utils import get_indicator_data
+from .utils import (
+    get_indicator_data, get_indicator_breakdown, get_dashboard_filter_dictionaries, encode_compact,
+    get_changes_since, slice_data_from, get_period_start, get_status_summary, get_latest_snapshot,
+    get_pivot_page, PIVOT_PAGE_SIZE, get_dimension_ranking,
+    get_indicators_matrix, correlation_matrix, matrix_stats, to_json_list
+)
+from indicators.versioning import get_data_version, get_data_versions
+from .events import stream_indicator_changes, get_last_change_id
+from indicators_project.db_routing import read_from_replica
 import json
 
 
+@read_from_replica
 def dashboard_list(request):
     """Список дашбордов"""
     dashboards = Dashboard.objects.all().order_by('order', 'name')
     return render(request, 'visualization/list.html', {'dashboards': dashboards})
 
 
+@read_from_replica
 def dashboard_detail(request, pk):
     """Детальная страница дашборда"""
-    from dictionaries.models import Dictionary, DictionaryItem
-    from indicators.models import IndicatorDictionary
-    
     dashboard = get_object_or_404(Dashboard, pk=pk)
     
     # Проверка доступа
@@ -29,23 +37,13 @@ def dashboard_detail(request, pk):
         return redirect('visualization:dashboard_list')
     
     # Получаем показатели на панели
-    indicators = dashboard.indicators.select_related('indicator', 'indicator__unit').order_by('order')
+    indicators = list(dashboard.indicators.select_related('indicator', 'indicator__unit').order_by('order'))
     
     # Собираем все уникальные справочники из показателей на панели
-    all_dictionaries = {}
-    for dashboard_indicator in indicators:
-        indicator_dicts = IndicatorDictionary.objects.filter(
-            indicator=dashboard_indicator.indicator,
-            dictionary__is_active=True
-        ).select_related('dictionary').prefetch_related('dictionary__items')
-        
-        for ind_dict in indicator_dicts:
-            dict_id = ind_dict.dictionary.id
-            if dict_id not in all_dictionaries:
-                all_dictionaries[dict_id] = {
-                    'dictionary': ind_dict.dictionary,
-                    'items': list(ind_dict.dictionary.items.filter(is_active=True).order_by('name'))
-                }
+    all_dictionaries = get_dashboard_filter_dictionaries(
+        dashboard.pk,
+        [dashboard_indicator.indicator_id for dashboard_indicator in indicators]
+    )
     
     # Получаем выбранные фильтры из GET-параметров
     from datetime import date
@@ -123,11 +121,15 @@ def dashboard_edit(request, pk):
         return redirect('visualization:dashboard_detail', pk=dashboard.pk)
     
     # Получаем показатели на панели
-    indicators = dashboard.indicators.select_related('indicator', 'indicator__unit').order_by('order')
+    indicators = dashboard.indicators.select_related(
+        'indicator', 'indicator__unit', 'indicator__stats'
+    ).order_by('order')
     
     # Получаем все доступные показатели, исключая уже добавленные
     added_indicator_ids = indicators.values_list('indicator_id', flat=True)
-    all_indicators = Indicator.objects.exclude(id__in=added_indicator_ids).select_related('unit').order_by('name')
+    all_indicators = Indicator.objects.exclude(id__in=added_indicator_ids).select_related(
+        'unit', 'stats'
+    ).order_by('name')
     
     return render(request, 'visualization/edit.html', {
         'dashboard': dashboard,
@@ -136,7 +138,9 @@ def dashboard_edit(request, pk):
     })
 
 
+@gzip_page
 @require_http_methods(["GET"])
+@read_from_replica
 def api_indicator_data(request, indicator_id):
     """
     API endpoint для получения данных показателя для визуализации.
@@ -147,11 +151,45 @@ def api_indicator_data(request, indicator_id):
         end_date (str): конечная дата (ISO формат)
         aggregation (str): период агрегации (day/week/month/quarter/year)
         filters (str): JSON строка с фильтрами по справочникам
+        cumulative (bool): нарастающий итог
+        max_points (int): максимальное количество точек (прореживание LTTB)
+        group_by (int): ID справочника - вернуть отдельный ряд для каждого его элемента
+        format (str): 'compact' - компактный колоночный формат (см. encode_compact)
+        compare (str): 'prev_year' или 'prev_period' - добавить ряд сравнения
+            (тот же период год назад или предыдущий период), выровненный по датам
+        snapshot (str): 'latest' - только последнее значение, 'latest_by_dimension' -
+            последнее значение каждого разреза (для gauge и pie, см. get_latest_snapshot)
+        since (str): версия данных (cursor из прошлого ответа) или дата (ISO формат) -
+            вернуть только точки, изменившиеся после нее (см. get_changes_since)
+    
+    Каждый ответ содержит cursor - текущую версию данных показателя. В ответе на
+    запрос с since поле delta описывает, как применить данные к ряду клиента:
+    unchanged - изменений нет, reset - заменить ряд целиком, иначе заменить
+    точки начиная с даты from.
+    
+    Ответ сжимается gzip, если клиент его поддерживает.
     """
     from datetime import date
     
     indicator = get_object_or_404(Indicator, pk=indicator_id)
     
+    # Инкрементальный запрос: если данные не менялись, отвечаем без загрузки ряда
+    since_str = request.GET.get('since', '')
+    changes = None
+    if since_str:
+        try:
+            since = int(since_str) if since_str.isdigit() else date.fromisoformat(since_str)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Некорректный параметр since'}, status=400)
+        
+        changes = get_changes_since(indicator_id, since)
+        if changes['unchanged']:
+            return JsonResponse({
+                'success': True,
+                'cursor': changes['cursor'],
+                'delta': {'unchanged': True}
+            })
+    
     # Параметры из запроса
     days_back = int(request.GET.get('days_back', 30))
     start_date_str = request.GET.get('start_date', '')
@@ -179,18 +217,90 @@ def api_indicator_data(request, indicator_id):
     # Получаем параметр нарастающего итога
     cumulative = request.GET.get('cumulative', 'false').lower() == 'true'
     
+    # Максимальное количество точек для первичной отрисовки
+    try:
+        max_points = int(request.GET.get('max_points', 0)) or None
+    except (ValueError, TypeError):
+        max_points = None
+    
+    # Справочник для разбивки на ряды по его элементам
+    try:
+        group_by = int(request.GET.get('group_by', 0)) or None
+    except (ValueError, TypeError):
+        group_by = None
+    
+    # Версию фиксируем до чтения данных: изменения, сделанные во время чтения,
+    # клиент получит при следующем запросе
+    if changes:
+        cursor = changes['cursor']
+        # Хвост ряда отдаем без прореживания
+        if not changes['reset']:
+            max_points = None
+    else:
+        cursor = (get_data_version(indicator.pk) or (0, 0))[0]
+    
     # Получаем данные
     try:
-        data = get_indicator_data(
-            indicator=indicator,
-            days_back=days_back,
-            aggregation_period=aggregation if aggregation != 'day' else None,
-            dictionary_filters=dictionary_filters,
-            end_date=end_date_str if end_date_str else None,
-            cumulative=cumulative
-        )
+        snapshot = request.GET.get('snapshot', '')
+        if snapshot in ('latest', 'latest_by_dimension'):
+            # Снимок не разбивается на хвосты: при изменениях отдается целиком
+            response = {
+                'success': True,
+                'indicator': {
+                    'id': indicator.id,
+                    'name': indicator.name,
+                    'unit': indicator.unit.symbol,
+                    'description': indicator.description
+                },
+                'data': get_latest_snapshot(
+                    indicator=indicator,
+                    dictionary_filters=dictionary_filters,
+                    end_date=end_date_str if end_date_str else None,
+                    per_dimension=snapshot == 'latest_by_dimension'
+                ),
+                'cursor': cursor
+            }
+            if changes:
+                response['delta'] = {'unchanged': False, 'reset': True, 'from': None}
+            return JsonResponse(response, json_dumps_params={'separators': (',', ':')})
         
-        return JsonResponse({
+        if group_by:
+            data = get_indicator_breakdown(
+                indicator=indicator,
+                group_by=group_by,
+                days_back=days_back,
+                aggregation_period=aggregation if aggregation != 'day' else None,
+                dictionary_filters=dictionary_filters,
+                end_date=end_date_str if end_date_str else None,
+                cumulative=cumulative
+            )
+        else:
+            data = get_indicator_data(
+                indicator=indicator,
+                days_back=days_back,
+                aggregation_period=aggregation if aggregation != 'day' else None,
+                dictionary_filters=dictionary_filters,
+                end_date=end_date_str if end_date_str else None,
+                cumulative=cumulative,
+                max_points=max_points,
+                compare=request.GET.get('compare') if request.GET.get('compare') in ('prev_year', 'prev_period') else None
+            )
+        
+        delta = None
+        if changes:
+            delta = {'unchanged': False, 'reset': changes['reset'], 'from': None}
+            if changes['from_date']:
+                from_date = changes['from_date']
+                if aggregation != 'day':
+                    # Изменение значения меняет агрегат всего периода
+                    from_date = get_period_start(from_date, aggregation)
+                data = slice_data_from(data, from_date)
+                delta['from'] = from_date.isoformat()
+        
+        if request.GET.get('format') == 'compact':
+            data = encode_compact(data)
+        
+        response = {
             'success': True,
             'indicator': {
                 'id': indicator.id,
@@ -198,8 +308,13 @@ def api_indicator_data(request, indicator_id):
                 'unit': indicator.unit.symbol,
                 'description': indicator.description
             },
-            'data': data
-        })
+            'data': data,
+            'cursor': cursor
+        }
+        if delta:
+            response['delta'] = delta
+        
+        return JsonResponse(response, json_dumps_params={'separators': (',', ':')})
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -207,6 +322,285 @@ def api_indicator_data(request, indicator_id):
         }, status=400)
 
 
+@gzip_page
+@require_http_methods(["GET"])
+@read_from_replica
+def api_indicator_pivot(request, indicator_id):
+    """
+    API endpoint сводной таблицы показателя (тип графика "таблица").
+    
+    Параметры:
+        days_back, start_date, end_date, filters: как в api_indicator_data
+        aggregation (str): период строк таблицы (day/week/month/quarter/year)
+        group_by (int): ID справочника для разбивки по элементам
+        sort (str): 'period' или 'value'; префикс '-' - по убыванию
+        page_size (int): количество ячеек на странице
+        cursor (str): next_cursor из предыдущего ответа (JSON)
+    """
+    from datetime import date
+    
+    indicator = get_object_or_404(Indicator, pk=indicator_id)
+    
+    try:
+        days_back = int(request.GET.get('days_back', 30))
+        start_date_str = request.GET.get('start_date', '')
+        if start_date_str:
+            days_back = (date.today() - date.fromisoformat(start_date_str)).days
+        dictionary_filters = json.loads(request.GET.get('filters', '{}') or '{}')
+        group_by = int(request.GET.get('group_by', 0)) or None
+        page_size = int(request.GET.get('page_size', PIVOT_PAGE_SIZE))
+        cursor = json.loads(request.GET['cursor']) if request.GET.get('cursor') else None
+    except (ValueError, TypeError, json.JSONDecodeError):
+        return JsonResponse({'success': False, 'error': 'Некорректные параметры запроса'}, status=400)
+    
+    sort = request.GET.get('sort', 'period')
+    end_date_str = request.GET.get('end_date', '')
+    
+    try:
+        page = get_pivot_page(
+            indicator=indicator,
+            aggregation_period=request.GET.get('aggregation', 'month'),
+            group_by=group_by,
+            dictionary_filters=dictionary_filters,
+            days_back=days_back,
+            end_date=end_date_str if end_date_str else None,
+            order_by=sort.lstrip('-'),
+            descending=sort.startswith('-'),
+            page_size=page_size,
+            cursor=cursor
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'indicator': {
+            'id': indicator.id,
+            'name': indicator.name,
+            'unit': indicator.unit.symbol
+        },
+        'columns': ['period', 'item_id', 'item', 'value', 'count'],
+        **page
+    }, json_dumps_params={'separators': (',', ':')})
+
+
+@require_http_methods(["GET"])
+@read_from_replica
+def api_indicator_ranking(request, indicator_id):
+    """
+    API endpoint рейтинга элементов справочника по показателю ("топ-10 заводов за квартал").
+    
+    Параметры:
+        dictionary (int): ID справочника, элементы которого ранжируются (обязательный)
+        func (str): 'sum' (по умолчанию) или 'avg'
+        limit (int): количество элементов (по умолчанию 10)
+        order (str): 'desc' (по умолчанию) или 'asc'
+        period (str): 'week', 'month', 'quarter' или 'year' - текущий период по сегодня
+        start_date, end_date (str): явный период (ISO формат), приоритет над period
+        filters (str): JSON строка с фильтрами по другим справочникам
+        cache (str): 'false' - не использовать кэш
+    """
+    from datetime import date
+    
+    indicator = get_object_or_404(Indicator, pk=indicator_id)
+    
+    try:
+        dictionary_id = int(request.GET['dictionary'])
+        limit = max(1, min(int(request.GET.get('limit', 10)), 1000))
+        dictionary_filters = json.loads(request.GET.get('filters', '{}') or '{}')
+        start_date_str = request.GET.get('start_date', '')
+        end_date_str = request.GET.get('end_date', '')
+        start_date = date.fromisoformat(start_date_str) if start_date_str else None
+        end_date = date.fromisoformat(end_date_str) if end_date_str else None
+    except (KeyError, ValueError, TypeError, json.JSONDecodeError):
+        return JsonResponse({'success': False, 'error': 'Некорректные параметры запроса'}, status=400)
+    
+    period = request.GET.get('period', '')
+    if not start_date and period in ('week', 'month', 'quarter', 'year'):
+        start_date = get_period_start(date.today(), period)
+    
+    func = 'avg' if request.GET.get('func') == 'avg' else 'sum'
+    ranking = get_dimension_ranking(
+        indicator=indicator,
+        dictionary_id=dictionary_id,
+        func=func,
+        limit=limit,
+        descending=request.GET.get('order', 'desc') != 'asc',
+        start_date=start_date,
+        end_date=end_date,
+        dictionary_filters=dictionary_filters,
+        use_cache=request.GET.get('cache', 'true').lower() != 'false'
+    )
+    
+    return JsonResponse({
+        'success': True,
+        'indicator': {
+            'id': indicator.id,
+            'name': indicator.name,
+            'unit': indicator.unit.symbol
+        },
+        'func': func,
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None,
+        'ranking': ranking
+    })
+
+
+@gzip_page
+@require_http_methods(["GET"])
+@read_from_replica
+def api_indicators_matrix(request):
+    """
+    API endpoint выровненной матрицы значений нескольких показателей.
+    
+    Параметры:
+        ids (str): ID показателей через запятую (столбцы матрицы)
+        days_back, start_date, end_date, filters: как в api_indicator_data
+        aggregation (str): период строк (day/week/month/quarter/year), значения суммируются
+        correlation (str): 'pearson' или 'spearman' - добавить матрицу корреляции
+        stats (bool): добавить описательные статистики столбцов
+    """
+    from datetime import date
+    
+    try:
+        indicator_ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip()]
+        days_back = int(request.GET.get('days_back', 30))
+        start_date_str = request.GET.get('start_date', '')
+        if start_date_str:
+            days_back = (date.today() - date.fromisoformat(start_date_str)).days
+        dictionary_filters = json.loads(request.GET.get('filters', '{}') or '{}')
+    except (ValueError, TypeError, json.JSONDecodeError):
+        return JsonResponse({'success': False, 'error': 'Некорректные параметры запроса'}, status=400)
+    
+    if not indicator_ids:
+        return JsonResponse({'success': False, 'error': 'Не указаны показатели'}, status=400)
+    
+    indicators_by_id = Indicator.objects.select_related('unit').in_bulk(indicator_ids)
+    missing = [pk for pk in indicator_ids if pk not in indicators_by_id]
+    if missing:
+        return JsonResponse({'success': False, 'error': f'Показатели не найдены: {missing}'}, status=404)
+    indicators = [indicators_by_id[pk] for pk in dict.fromkeys(indicator_ids)]
+    
+    end_date_str = request.GET.get('end_date', '')
+    dates, matrix = get_indicators_matrix(
+        indicators=indicators,
+        days_back=days_back,
+        end_date=end_date_str if end_date_str else None,
+        aggregation_period=request.GET.get('aggregation'),
+        dictionary_filters=dictionary_filters
+    )
+    
+    response = {
+        'success': True,
+        'indicators': [
+            {'id': indicator.id, 'name': indicator.name, 'unit': indicator.unit.symbol}
+            for indicator in indicators
+        ],
+        'dates': [d.isoformat() for d in dates],
+        'matrix': [to_json_list(row) for row in matrix]
+    }
+    
+    method = request.GET.get('correlation', '')
+    if method in ('pearson', 'spearman'):
+        correlation, rows_used = correlation_matrix(matrix, method)
+        response['correlation'] = {
+            'method': method,
+            'rows_used': rows_used,
+            'matrix': [to_json_list(row) for row in correlation]
+        }
+    
+    if request.GET.get('stats', 'false').lower() == 'true':
+        response['stats'] = matrix_stats(matrix)
+    
+    return JsonResponse(response, json_dumps_params={'separators': (',', ':')})
+
+
+@gzip_page
+@require_http_methods(["GET"])
+@read_from_replica
+def api_status_summary(request):
+    """
+    API endpoint со сводкой статусов (green/yellow/red) по всем показателям.
+    
+    Параметры:
+        days_back (int): период подсчета красных точек (по умолчанию 30)
+    """
+    try:
+        days_back = int(request.GET.get('days_back', 30))
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Некорректный параметр days_back'}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        **get_status_summary(days_back)
+    }, json_dumps_params={'separators': (',', ':')})
+
+
+@require_http_methods(["GET"])
+@read_from_replica
+def api_data_versions(request):
+    """
+    API endpoint с версиями данных нескольких показателей (один запрос к базе).
+    
+    Клиент сравнивает версии с сохраненными и перезапрашивает данные только
+    изменившихся показателей.
+    
+    Параметры:
+        ids (str): ID показателей через запятую
+    
+    Ответ:
+        versions: {ID: {'version', 'reset_version'}} (для показателей без данных - нули)
+    """
+    try:
+        indicator_ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip()]
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Некорректный параметр ids'}, status=400)
+    
+    if not indicator_ids:
+        return JsonResponse({'success': False, 'error': 'Не указаны показатели'}, status=400)
+    
+    versions = get_data_versions(indicator_ids)
+    return JsonResponse({
+        'success': True,
+        'versions': {
+            str(indicator_id): {'version': version, 'reset_version': reset_version}
+            for indicator_id, (version, reset_version) in versions.items()
+        }
+    })
+
+
+@require_http_methods(["GET"])
+def dashboard_events(request, pk):
+    """
+    Поток Server-Sent Events с изменениями данных показателей панели.
+    
+    События читаются из журнала изменений (IndicatorChangeLog), поэтому
+    работают без брокера сообщений. После переподключения поток продолжается
+    с записи из заголовка Last-Event-ID (или параметра last_event_id).
+    """
+    dashboard = get_object_or_404(Dashboard, pk=pk)
+    
+    # Проверка доступа
+    if not dashboard.is_public and dashboard.created_by != request.user and not request.user.is_superuser:
+        return JsonResponse({'success': False, 'error': 'У вас нет доступа к этой панели'}, status=403)
+    
+    indicator_ids = list(dashboard.indicators.values_list('indicator_id', flat=True))
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id', '')
+    last_id = int(last_event_id) if last_event_id.isdigit() else get_last_change_id()
+    
+    response = StreamingHttpResponse(
+        stream_indicator_changes(indicator_ids, last_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Отключаем буферизацию ответа в nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 @require_http_methods(["POST"])
 def dashboard_indicator_add(request, pk):
@@ -299,6 +693,10 @@ def dashboard_indicator_update(request, pk, indicator_id):
             dashboard_indicator.height = int(data['height'] or 400)
         if 'cumulative' in data:
             dashboard_indicator.cumulative = bool(data['cumulative'])
+        if 'group_by_dictionary' in data:
+            dashboard_indicator.group_by_dictionary_id = int(data['group_by_dictionary'] or 0) or None
+        if 'compare_mode' in data:
+            dashboard_indicator.compare_mode = data['compare_mode'] if data['compare_mode'] in ('prev_year', 'prev_period') else ''
         
         dashboard_indicator.save()
         
@@ -22,15 +22,61 @@ const CHART_COLORS = [
     'rgb(255, 99, 255)'
 ];
 
+// Интервал опроса изменений данных (мс)
+const LIVE_UPDATE_INTERVAL = 30000;
+
+/**
+ * Восстанавливает ось дат и статусы из компактного формата API (format=compact)
+ */
+function decodeCompactData(compact) {
+    const dates = [];
+    if (compact.start) {
+        const [year, month, day] = compact.start.split('-').map(Number);
+        const offsets = compact.offsets
+            || Array.from({ length: compact.count }, (_, i) => i * compact.step);
+        offsets.forEach(offset => {
+            dates.push(new Date(Date.UTC(year, month - 1, day + offset)).toISOString().slice(0, 10));
+        });
+    }
+    
+    const decodeStatuses = codes => codes
+        ? codes.map(code => code === null ? null : compact.status_codes[code])
+        : null;
+    
+    const data = {
+        dates: dates,
+        total_points: compact.total_points,
+        downsampled: compact.downsampled
+    };
+    
+    if (compact.groups) {
+        data.groups = compact.groups.map(group => ({
+            id: group.id,
+            name: group.name,
+            values: group.values,
+            statuses: decodeStatuses(group.statuses)
+        }));
+    } else {
+        data.values = compact.values;
+        data.statuses = decodeStatuses(compact.statuses);
+        if (compact.compare) {
+            data.compare = compact.compare;
+        }
+    }
+    
+    return data;
+}
+
 /**
  * Загружает данные показателя через API
  */
-async function loadIndicatorData(indicatorId, daysBack, aggregation, filters, startDate, endDate, cumulative) {
+async function loadIndicatorData(indicatorId, daysBack, aggregation, filters, startDate, endDate, cumulative, maxPoints, groupBy, snapshot, compare, since) {
     const url = `/visualization/api/indicator/${indicatorId}/data/`;
     const params = new URLSearchParams({
         days_back: daysBack,
         aggregation: aggregation || 'day',
-        filters: JSON.stringify(filters || {})
+        filters: JSON.stringify(filters || {}),
+        format: 'compact'
     });
     
     // Добавляем фильтры по датам если указаны
@@ -46,6 +92,31 @@ async function loadIndicatorData(indicatorId, daysBack, aggregation, filters, st
         params.append('cumulative', 'true');
     }
     
+    // Ограничиваем количество точек (сервер прорежет ряд алгоритмом LTTB)
+    if (maxPoints) {
+        params.append('max_points', maxPoints);
+    }
+    
+    // Отдельный ряд для каждого элемента справочника
+    if (groupBy) {
+        params.append('group_by', groupBy);
+    }
+    
+    // Только последнее значение (режим снимка для gauge и pie)
+    if (snapshot) {
+        params.append('snapshot', snapshot);
+    }
+    
+    // Ряд сравнения (прошлый год или предыдущий период)
+    if (compare) {
+        params.append('compare', compare);
+    }
+    
+    // Только изменения после версии данных из прошлого ответа
+    if (since !== undefined && since !== null) {
+        params.append('since', since);
+    }
+    
     try {
         const fullUrl = `${url}?${params}`;
         console.log('Запрос данных:', fullUrl);
@@ -61,6 +132,9 @@ async function loadIndicatorData(indicatorId, daysBack, aggregation, filters, st
         console.log('Получены данные:', data);
         
         if (data.success) {
+            if (data.data && data.data.format === 'compact') {
+                data.data = decodeCompactData(data.data);
+            }
             return data;
         } else {
             console.error('Ошибка загрузки данных:', data.error);
@@ -72,10 +146,323 @@ async function loadIndicatorData(indicatorId, daysBack, aggregation, filters, st
     }
 }
 
+/**
+ * Применяет ответ инкрементального запроса к ряду: точки начиная с fromDate
+ * заменяются новыми, остальные сохраняются
+ */
+function mergeDeltaData(current, delta, fromDate) {
+    let cut = current.dates.findIndex(d => d >= fromDate);
+    if (cut === -1) {
+        cut = current.dates.length;
+    }
+    
+    const merge = (head, tail) => (head || tail)
+        ? (head || new Array(cut).fill(null)).slice(0, cut).concat(tail || new Array(delta.dates.length).fill(null))
+        : null;
+    
+    const merged = {
+        ...current,
+        dates: current.dates.slice(0, cut).concat(delta.dates)
+    };
+    
+    if (current.groups) {
+        const deltaGroups = new Map(delta.groups.map(group => [group.id, group]));
+        merged.groups = current.groups.map(group => {
+            const tail = deltaGroups.get(group.id) || {};
+            deltaGroups.delete(group.id);
+            return {
+                ...group,
+                values: merge(group.values, tail.values),
+                statuses: merge(group.statuses, tail.statuses)
+            };
+        });
+        // Элементы справочника, впервые появившиеся в новых данных
+        deltaGroups.forEach(group => {
+            merged.groups.push({
+                ...group,
+                values: merge(null, group.values),
+                statuses: merge(null, group.statuses)
+            });
+        });
+    } else {
+        merged.values = merge(current.values, delta.values);
+        merged.statuses = merge(current.statuses, delta.statuses);
+        if (current.compare) {
+            merged.compare = merge(current.compare, delta.compare);
+        }
+    }
+    
+    return merged;
+}
+
+/**
+ * Запрашивает изменения данных графика и дописывает их в уже отрисованный ряд
+ */
+async function refreshChartData(chartCard) {
+    const state = chartCard.liveState;
+    const chart = window.dashboardCharts && window.dashboardCharts[state.chartId];
+    if (!chart) {
+        return;
+    }
+    // Изменения, пришедшие во время запроса, запрашиваются после него
+    if (state.loading) {
+        state.pending = true;
+        return;
+    }
+    
+    state.loading = true;
+    try {
+        const update = await loadIndicatorData(...state.args, state.cursor);
+        if (!update || !update.delta || update.delta.unchanged) {
+            if (update) {
+                state.cursor = update.cursor;
+            }
+            return;
+        }
+        
+        if (update.delta.reset) {
+            // Значения удалялись - перестраиваем график целиком
+            const canvas = document.getElementById(`chart-${state.chartId}`);
+            const [, , , filters, startDate, endDate] = state.args;
+            await renderChartWithFilters(canvas, chartCard, startDate, endDate, filters);
+            return;
+        }
+        
+        state.indicatorData.data = mergeDeltaData(state.indicatorData.data, update.data, update.delta.from);
+        state.cursor = update.cursor;
+        
+        const config = createChartConfig(
+            chartCard.dataset.chartType,
+            state.indicatorData,
+            chartCard.dataset.showLegend === 'true',
+            chartCard.dataset.showGrid === 'true',
+            state.indicatorData.data.statuses
+        );
+        chart.data = config.data;
+        chart.update('none');
+    } finally {
+        state.loading = false;
+        if (state.pending) {
+            state.pending = false;
+            refreshChartData(chartCard);
+        }
+    }
+}
+
+/**
+ * Подписывается на поток изменений данных дашборда (Server-Sent Events)
+ */
+function subscribeDashboardEvents(dashboardId) {
+    const source = new EventSource(`/visualization/${dashboardId}/events/`);
+    
+    source.addEventListener('update', event => {
+        const { changes } = JSON.parse(event.data);
+        changes.forEach(change => {
+            document.querySelectorAll(`.chart-card[data-indicator-id="${change.indicator}"]`).forEach(chartCard => {
+                const state = chartCard.liveState;
+                if (state && state.cursor < change.cursor) {
+                    refreshChartData(chartCard);
+                }
+            });
+        });
+    });
+    
+    return source;
+}
+
+/**
+ * Следит за изменениями данных всех графиков дашборда: через поток событий,
+ * а если он недоступен - периодическим опросом
+ */
+function startLiveUpdates(dashboardId) {
+    if (window.dashboardLiveTimer) {
+        return;
+    }
+    
+    if (dashboardId && typeof EventSource !== 'undefined') {
+        window.dashboardEventSource = subscribeDashboardEvents(dashboardId);
+    }
+    
+    window.dashboardLiveTimer = setInterval(() => {
+        // Скрытая вкладка не опрашивает сервер, при открытом потоке событий опрос не нужен
+        const source = window.dashboardEventSource;
+        if (document.hidden || (source && source.readyState === EventSource.OPEN)) {
+            return;
+        }
+        document.querySelectorAll('.chart-card').forEach(chartCard => {
+            if (chartCard.liveState) {
+                refreshChartData(chartCard);
+            }
+        });
+    }, LIVE_UPDATE_INTERVAL);
+}
+
+/**
+ * Создает конфигурацию графика по снимку последних значений (gauge и pie)
+ */
+function createSnapshotChartConfig(chartType, indicatorData, showLegend) {
+    const snapshot = indicatorData.data;
+    const unit = indicatorData.indicator.unit;
+    const colors = snapshot.statuses
+        ? snapshot.statuses.map(s => STATUS_COLORS[s] || STATUS_COLORS.gray)
+        : snapshot.values.map((_, i) => CHART_COLORS[i % CHART_COLORS.length]);
+    
+    if (chartType === 'gauge') {
+        // Полукруглая шкала: заполненная часть - значение, остаток - до максимума
+        const [min, max] = snapshot.range;
+        const value = snapshot.values[0];
+        const filled = Math.min(Math.max(value - min, 0), max - min);
+        return {
+            type: 'doughnut',
+            data: {
+                labels: [indicatorData.indicator.name, ''],
+                datasets: [{
+                    data: [filled, (max - min) - filled],
+                    backgroundColor: [colors[0], '#eeeeee'],
+                    borderWidth: 0
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: true,
+                rotation: -90,
+                circumference: 180,
+                cutout: '75%',
+                plugins: {
+                    legend: { display: false },
+                    tooltip: { enabled: false },
+                    title: {
+                        display: true,
+                        position: 'bottom',
+                        font: { size: 20 },
+                        text: `${value.toFixed(2)} ${unit}`
+                    },
+                    subtitle: {
+                        display: true,
+                        position: 'bottom',
+                        text: `на ${snapshot.date} (шкала ${min} - ${max})`
+                    }
+                }
+            }
+        };
+    }
+    
+    return {
+        type: 'pie',
+        data: {
+            labels: snapshot.labels,
+            datasets: [{
+                label: indicatorData.indicator.name,
+                data: snapshot.values,
+                backgroundColor: colors,
+                borderColor: '#fff',
+                borderWidth: 1
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: true,
+            plugins: {
+                legend: {
+                    display: showLegend,
+                    position: 'bottom'
+                },
+                subtitle: {
+                    display: true,
+                    text: `Последние значения на ${snapshot.date}`
+                },
+                tooltip: {
+                    enabled: true,
+                    callbacks: {
+                        label: context => `${context.label}: ${context.parsed.toFixed(2)} ${unit}`
+                    }
+                }
+            }
+        }
+    };
+}
+
+/**
+ * Создает конфигурацию графика с несколькими рядами (разбивка по справочнику)
+ */
+function createGroupedChartConfig(chartType, indicatorData, showLegend, showGrid) {
+    const groups = indicatorData.data.groups;
+    const graphType = chartType === 'bar' ? 'bar' : (chartType === 'scatter' ? 'scatter' : 'line');
+    
+    const datasets = groups.map((group, index) => {
+        const color = CHART_COLORS[index % CHART_COLORS.length];
+        return {
+            label: group.name,
+            data: group.values,
+            borderColor: color,
+            backgroundColor: chartType === 'area'
+                ? color.replace('rgb', 'rgba').replace(')', ', 0.2)')
+                : color,
+            fill: chartType === 'area',
+            spanGaps: true,
+            borderWidth: 2
+        };
+    });
+    
+    return {
+        type: graphType,
+        data: {
+            labels: indicatorData.data.dates,
+            datasets: datasets
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: true,
+            plugins: {
+                legend: {
+                    display: showLegend,
+                    position: 'bottom'
+                },
+                tooltip: {
+                    enabled: true,
+                    callbacks: {
+                        label: function(context) {
+                            const value = context.parsed.y !== null ? context.parsed.y.toFixed(2) : '';
+                            return `${context.dataset.label}: ${value} ${indicatorData.indicator.unit}`;
+                        }
+                    }
+                }
+            },
+            scales: {
+                x: {
+                    display: true,
+                    grid: {
+                        display: showGrid
+                    }
+                },
+                y: {
+                    display: true,
+                    title: {
+                        display: true,
+                        text: indicatorData.indicator.unit
+                    },
+                    beginAtZero: false,
+                    grid: {
+                        display: showGrid
+                    }
+                }
+            }
+        }
+    };
+}
+
 /**
  * Создает конфигурацию графика для Chart.js
  */
 function createChartConfig(chartType, indicatorData, showLegend, showGrid, statuses) {
+    if (indicatorData.data.snapshot) {
+        return createSnapshotChartConfig(chartType, indicatorData, showLegend);
+    }
+    
+    if (indicatorData.data.groups) {
+        return createGroupedChartConfig(chartType, indicatorData, showLegend, showGrid);
+    }
+    
     const dates = indicatorData.data.dates;
     const values = indicatorData.data.values;
     
@@ -180,11 +567,29 @@ function createChartConfig(chartType, indicatorData, showLegend, showGrid, statu
             dataset.backgroundColor = 'rgba(75, 192, 192, 0.1)';
     }
     
+    const datasets = [dataset];
+    
+    // Ряд сравнения (прошлый год или предыдущий период) - пунктиром поверх основного
+    if (indicatorData.data.compare) {
+        datasets.push({
+            type: 'line',
+            label: `${indicatorData.indicator.name} (сравнение)`,
+            data: indicatorData.data.compare,
+            borderColor: STATUS_COLORS.gray,
+            backgroundColor: 'transparent',
+            borderDash: [6, 4],
+            borderWidth: 2,
+            pointRadius: 0,
+            spanGaps: true,
+            fill: false
+        });
+    }
+    
     return {
         type: graphType,
         data: {
             labels: dates,
-            datasets: [dataset]
+            datasets: datasets
         },
         options: {
             responsive: true,
@@ -236,6 +641,148 @@ function createChartConfig(chartType, indicatorData, showLegend, showGrid, statu
     };
 }
 
+/**
+ * Загружает страницу сводной таблицы показателя (сортировка и страницы - на сервере)
+ */
+async function loadPivotPage(indicatorId, query, cursor) {
+    const params = new URLSearchParams(query);
+    if (cursor) {
+        params.append('cursor', JSON.stringify(cursor));
+    }
+    
+    try {
+        const response = await fetch(`/visualization/api/indicator/${indicatorId}/pivot/?${params}`);
+        const data = await response.json();
+        if (!data.success) {
+            console.error('Ошибка загрузки таблицы:', data.error);
+            return null;
+        }
+        return data;
+    } catch (error) {
+        console.error('Ошибка при запросе таблицы:', error);
+        return null;
+    }
+}
+
+/**
+ * Рендерит сводную таблицу (тип графика "таблица"): период x элемент справочника.
+ * Следующие страницы подгружаются по кнопке, щелчок по заголовку меняет сортировку.
+ */
+async function renderPivotTable(chartContainer, chartCard, canvasId, startDate, endDate, filters, sort) {
+    const indicatorId = chartCard.dataset.indicatorId;
+    const groupBy = chartCard.dataset.groupBy || '';
+    sort = sort || 'period';
+    
+    const query = {
+        days_back: parseInt(chartCard.dataset.daysBack) || 30,
+        aggregation: chartCard.dataset.aggregation || 'month',
+        filters: JSON.stringify(filters || {}),
+        sort: sort
+    };
+    if (startDate) {
+        query.start_date = startDate;
+    }
+    if (endDate) {
+        query.end_date = endDate;
+    }
+    if (groupBy) {
+        query.group_by = groupBy;
+    }
+    
+    const page = await loadPivotPage(indicatorId, query, null);
+    if (!page) {
+        chartContainer.innerHTML = '<div style="text-align: center; padding: 40px; color: #f44336;">Ошибка загрузки данных</div>';
+        return;
+    }
+    
+    const format = value => value === null ? '' : value.toLocaleString('ru-RU', { maximumFractionDigits: 4 });
+    const cell = (tag, text, style) => {
+        const element = document.createElement(tag);
+        element.textContent = text;
+        element.style.cssText = 'padding: 6px 10px; border-bottom: 1px solid #eee;' + (style || '');
+        return element;
+    };
+    const appendRows = (tbody, rows) => {
+        rows.forEach(([period, , itemName, value, count]) => {
+            const tr = document.createElement('tr');
+            tr.appendChild(cell('td', period));
+            if (groupBy) {
+                tr.appendChild(cell('td', itemName));
+            }
+            tr.appendChild(cell('td', format(value), 'text-align: right;'));
+            tr.appendChild(cell('td', count, 'text-align: right;'));
+            tbody.appendChild(tr);
+        });
+    };
+    
+    const table = document.createElement('table');
+    table.style.cssText = 'width: 100%; border-collapse: collapse; font-size: 14px;';
+    
+    // Заголовок: щелчок по "Период" или "Значение" переключает сортировку
+    const thead = table.createTHead().insertRow();
+    const sortable = { 'Период': 'period', 'Значение': 'value' };
+    ['Период', groupBy ? 'Элемент' : null, 'Значение', 'Количество'].filter(Boolean).forEach(title => {
+        const field = sortable[title];
+        const arrow = field && sort.replace('-', '') === field ? (sort.startsWith('-') ? ' ▼' : ' ▲') : '';
+        const th = cell('th', title + arrow, 'text-align: left; background: #f5f5f5;' + (field ? ' cursor: pointer;' : ''));
+        if (field) {
+            th.onclick = () => renderPivotTable(
+                chartContainer, chartCard, canvasId, startDate, endDate, filters,
+                sort === field ? `-${field}` : field
+            );
+        }
+        thead.appendChild(th);
+    });
+    
+    const tbody = table.createTBody();
+    appendRows(tbody, page.rows);
+    
+    // Итоги: по элементам справочника и общий
+    const tfoot = table.createTFoot();
+    const totalRow = (label, itemName, value, count) => {
+        const tr = tfoot.insertRow();
+        tr.appendChild(cell('th', label, 'text-align: left;'));
+        if (groupBy) {
+            tr.appendChild(cell('th', itemName, 'text-align: left;'));
+        }
+        tr.appendChild(cell('th', format(value), 'text-align: right;'));
+        tr.appendChild(cell('th', count, 'text-align: right;'));
+    };
+    page.totals.items.forEach(([, itemName, value, count]) => totalRow('Итого', itemName, value, count));
+    totalRow('Всего', '', page.totals.total, page.totals.count);
+    
+    const wrapper = document.createElement('div');
+    wrapper.style.cssText = `max-height: ${chartCard.style.minHeight || '400px'}; overflow: auto;`;
+    wrapper.appendChild(table);
+    
+    // Скрытый canvas сохраняется: по нему карточку находят при смене фильтров
+    chartContainer.innerHTML = `<canvas id="${canvasId}" style="display: none;"></canvas>`;
+    chartContainer.appendChild(wrapper);
+    
+    // Следующие страницы дописываются в таблицу
+    let cursor = page.next_cursor;
+    if (cursor) {
+        const more = document.createElement('button');
+        more.className = 'btn btn-secondary';
+        more.textContent = 'Показать еще';
+        more.style.marginTop = '10px';
+        more.onclick = async () => {
+            more.disabled = true;
+            const next = await loadPivotPage(indicatorId, query, cursor);
+            more.disabled = false;
+            if (!next) {
+                return;
+            }
+            appendRows(tbody, next.rows);
+            cursor = next.next_cursor;
+            if (!cursor) {
+                more.remove();
+            }
+        };
+        chartContainer.appendChild(more);
+    }
+}
+
 /**
  * Рендерит график на canvas элементе
  */
@@ -284,17 +831,36 @@ async function renderChartWithFilters(canvasElement, chartCard, startDate, endDa
     const showLegend = chartCard.dataset.showLegend === 'true';
     const showGrid = chartCard.dataset.showGrid === 'true';
     const cumulative = chartCard.dataset.cumulative === 'true';
+    const groupBy = chartCard.dataset.groupBy || '';
+    const compare = chartCard.dataset.compare || '';
     
     // Сохраняем ID canvas перед заменой
     const canvasId = canvasElement.id;
     const chartContainer = canvasElement.parentElement;
     
+    // Первая отрисовка - грубый ряд (не больше точки на пиксель ширины),
+    // полное разрешение загружается по щелчку на графике
+    const fullResolution = chartCard.dataset.fullResolution === 'true';
+    const maxPoints = fullResolution ? null : Math.max(Math.round(chartContainer.clientWidth || 0), 100);
+    
+    // Gauge и pie показывают только последние значения - запрашиваем снимок, а не ряд
+    const snapshot = groupBy ? '' : ({ gauge: 'latest', pie: 'latest_by_dimension' }[chartType] || '');
+    
+    // Пока график перестраивается, изменения не опрашиваются
+    chartCard.liveState = null;
+    
     // Показываем индикатор загрузки
     chartContainer.innerHTML = '<div style="text-align: center; padding: 40px; color: #666;">Загрузка данных...</div>';
     
+    // Таблица строится на сервере постранично, ряд целиком не загружается
+    if (chartType === 'table') {
+        await renderPivotTable(chartContainer, chartCard, canvasId, startDate, endDate, filters);
+        return;
+    }
+    
     try {
         // Загружаем данные с фильтрами
-        const indicatorData = await loadIndicatorData(indicatorId, daysBack, aggregation, filters, startDate, endDate, cumulative);
+        const indicatorData = await loadIndicatorData(indicatorId, daysBack, aggregation, filters, startDate, endDate, cumulative, maxPoints, groupBy, snapshot, compare);
         
         if (!indicatorData) {
             chartContainer.innerHTML = '<div style="text-align: center; padding: 40px; color: #f44336;">Ошибка загрузки данных</div>';
@@ -318,7 +884,8 @@ async function renderChartWithFilters(canvasElement, chartCard, startDate, endDa
             valuesLength: indicatorData.data?.values?.length || 0
         });
         
-        if (!indicatorData.data || !indicatorData.data.dates || indicatorData.data.dates.length === 0) {
+        const points = indicatorData.data && (indicatorData.data.snapshot ? indicatorData.data.values : indicatorData.data.dates);
+        if (!points || points.length === 0) {
             console.warn('Нет данных для отображения');
             chartContainer.innerHTML = '<div style="text-align: center; padding: 40px; color: #999;">Нет данных для отображения</div>';
             return;
@@ -343,6 +910,18 @@ async function renderChartWithFilters(canvasElement, chartCard, startDate, endDa
                 showGrid,
                 indicatorData.data.statuses
             );
+            
+            // Ряд прорежен - подсказываем, как получить полное разрешение
+            if (indicatorData.data.downsampled && config.options) {
+                config.options.plugins.subtitle = {
+                    display: true,
+                    text: `Показано ${indicatorData.data.dates.length} из ${indicatorData.data.total_points} точек - щелкните для полного разрешения`
+                };
+                config.options.onClick = function() {
+                    chartCard.dataset.fullResolution = 'true';
+                    renderChartWithFilters(document.getElementById(canvasId), chartCard, startDate, endDate, filters);
+                };
+            }
             console.log('Конфигурация создана:', config);
         } catch (configError) {
             console.error('Ошибка создания конфигурации:', configError);
@@ -369,6 +948,14 @@ async function renderChartWithFilters(canvasElement, chartCard, startDate, endDa
             }
             window.dashboardCharts[chartId] = chart;
             
+            // Состояние для инкрементального обновления (см. refreshChartData)
+            chartCard.liveState = {
+                chartId: chartId,
+                args: [indicatorId, daysBack, aggregation, filters, startDate, endDate, cumulative, maxPoints, groupBy, snapshot, compare],
+                indicatorData: indicatorData,
+                cursor: indicatorData.cursor
+            };
+            
             console.log('График успешно создан');
         } catch (chartError) {
             console.error('Ошибка создания графика:', chartError);
@@ -385,8 +972,10 @@ async function renderChartWithFilters(canvasElement, chartCard, startDate, endDa
 
 /**
  * Инициализирует все графики на странице дашборда
+ * 
+ * @param {number} dashboardId - ID панели для подписки на поток изменений данных
  */
-function initializeDashboard() {
+function initializeDashboard(dashboardId) {
     console.log('Инициализация дашборда...');
     
     // Проверяем, что Chart.js загружен
@@ -423,6 +1012,8 @@ function initializeDashboard() {
             console.error('Canvas ID не найден в карточке графика');
         }
     });
+    
+    startLiveUpdates(dashboardId);
 }
 
 // Экспортируем функции для использования в других скриптах
@@ -431,7 +1022,13 @@ if (typeof module !== 'undefined' && module.exports) {
         initializeDashboard,
         renderChart,
         renderChartWithFilters,
-        loadIndicatorData
+        loadIndicatorData,
+        decodeCompactData,
+        mergeDeltaData,
+        refreshChartData,
+        startLiveUpdates,
+        subscribeDashboardEvents,
+        renderPivotTable
     };
 }
 
@@ -83,6 +83,8 @@ case $choice in
         gunicorn indicators_project.wsgi:application \
             --bind $HOST:$PORT \
             --workers 3 \
+            --worker-class gthread \
+            --threads 8 \
             --timeout 120 \
             --access-logfile - \
             --error-logfile -